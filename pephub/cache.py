@@ -0,0 +1,284 @@
+import asyncio
+import json
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from cachetools import LRUCache, TTLCache
+from pepdbagent.const import DEFAULT_TAG
+
+
+class GenerationalCache:
+    """
+    Bounded TTL cache, that is invalidated as a whole by bumping a generation number.
+
+    Every entry remembers the generation it was computed in. `invalidate` only increments
+    the counter (O(1), no matter how many entries there are), and entries of older
+    generations are treated as misses, and dropped when they are read or pushed out of
+    the cache.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: int = 300):
+        """
+        :param maxsize: maximum number of entries
+        :param ttl: time (in seconds) after which an entry expires
+        """
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._hits = 0
+        self._misses = 0
+        self._stale = 0
+        self._invalidations = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Get cached value, None on miss
+        """
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[0] != self._generation:
+                del self._cache[key]
+                self._stale += 1
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, generation: int) -> None:
+        """
+        Cache a value.
+
+        :param key: cache key
+        :param value: value to cache
+        :param generation: generation read *before* the value was computed. If the cache
+            was invalidated in the meantime, the value may be outdated and is not stored.
+        """
+        with self._lock:
+            if generation == self._generation:
+                self._cache[key] = (generation, value)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "size": len(self._cache),
+                "maxsize": self._cache.maxsize,
+                "generation": self._generation,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "stale_evictions": self._stale,
+                "invalidations": self._invalidations,
+            }
+
+
+class ProjectVersionCache:
+    """
+    LRU cache of values derived from projects. Entries are keyed by the project and
+    its `last_update_date`, which changes on every write, so values of unchanged
+    projects are served without reading the project.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        """
+        :param maxsize: maximum number of projects
+        """
+        self._cache = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, registry: Hashable, last_update_date: Optional[str]) -> Optional[Any]:
+        """
+        Get the value of the project, None if the project was updated since
+        """
+        with self._lock:
+            entry = self._cache.get(registry)
+            if entry is None or entry[0] != last_update_date:
+                self._misses += 1
+                return None
+            self._hits += 1
+            return entry[1]
+
+    def set(
+        self, registry: Hashable, last_update_date: Optional[str], value: Any
+    ) -> None:
+        with self._lock:
+            self._cache[registry] = (last_update_date, value)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "size": len(self._cache),
+                "maxsize": self._cache.maxsize,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+            }
+
+
+class _CountingTTLCache(TTLCache):
+    def __init__(self, maxsize: int, ttl: float):
+        super().__init__(maxsize=maxsize, ttl=ttl, getsizeof=len)
+        self.evictions = 0
+
+    def popitem(self):
+        self.evictions += 1
+        return super().popitem()
+
+
+class ProjectCache:
+    """
+    LRU cache of raw projects, with a budget on the total size in bytes.
+
+    Projects are stored JSON-encoded: the size of an entry is exact, and every hit
+    returns a new dict, so callers can modify it without corrupting the cache.
+    Entries have to be invalidated on every write of the project (see
+    `dependencies.invalidate_project`). Invalidation is local to the process, so
+    entries also expire after `ttl`: writes made through other workers are served
+    after at most that long.
+    """
+
+    def __init__(self, max_bytes: int = 128 * 1024 * 1024, ttl: float = 60):
+        """
+        :param max_bytes: maximum total size of cached projects
+        :param ttl: time (in seconds) after which a project expires
+        """
+        self._cache = _CountingTTLCache(max_bytes, ttl)
+        self._lock = threading.Lock()
+        self._version = 0
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    @staticmethod
+    def encode(project: Dict[str, Any]) -> bytes:
+        return json.dumps(project, separators=(",", ":")).encode()
+
+    @staticmethod
+    def key(
+        namespace: str, name: str, tag: str, with_id: bool = False
+    ) -> Tuple[str, str, str, bool]:
+        return namespace.lower(), name, tag, with_id
+
+    def get(self, key: Tuple[str, str, str, bool]) -> Optional[Dict[str, Any]]:
+        """
+        Get a copy of cached project, None on miss
+        """
+        blob = self.get_encoded(key)
+        return json.loads(blob) if blob is not None else None
+
+    def get_encoded(self, key: Tuple[str, str, str, bool]) -> Optional[bytes]:
+        """
+        Get cached project as encoded (see `encode`), None on miss
+        """
+        with self._lock:
+            blob = self._cache.get(key)
+            if blob is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+        return blob
+
+    def set(self, key: Tuple[str, str, str, bool], blob: bytes, version: int) -> None:
+        """
+        Cache a project.
+
+        :param key: cache key (see `key`)
+        :param blob: encoded raw project (see `encode`)
+        :param version: version read *before* the project was loaded. If any project
+            was invalidated in the meantime, the project may be outdated and is not stored.
+        """
+        with self._lock:
+            if version == self._version and len(blob) <= self._cache.maxsize:
+                self._cache[key] = blob
+
+    def invalidate(
+        self, namespace: str, name: Optional[str] = None, tag: str = DEFAULT_TAG
+    ) -> None:
+        """
+        Drop cached project, or all projects of the namespace if `name` is None
+        """
+        namespace = namespace.lower()
+        with self._lock:
+            self._version += 1
+            self._invalidations += 1
+            for key in list(self._cache.keys()):
+                if key[0] == namespace and (
+                    name is None or (key[1] == name and key[2] == tag)
+                ):
+                    del self._cache[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "size": len(self._cache),
+                "bytes": self._cache.currsize,
+                "max_bytes": self._cache.maxsize,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "evictions": self._cache.evictions,
+                "invalidations": self._invalidations,
+            }
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical async calls: while a call for a key is in flight,
+    other callers with the same key wait for its result, instead of making their own.
+
+    The call runs as a separate task, so a cancelled caller doesn't cancel it for the
+    others. Exceptions are raised to every caller.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self._calls = 0
+        self._deduplicated = 0
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await `func()`, or the call already in flight for the key
+        """
+        self._calls += 1
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        else:
+            self._deduplicated += 1
+        return await asyncio.shield(task)
+
+    def _done(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            # retrieve the exception, in case all callers were cancelled
+            task.exception()
+
+    def stats(self) -> dict:
+        return {
+            "calls": self._calls,
+            "deduplicated": self._deduplicated,
+            "dedup_rate": self._deduplicated / self._calls if self._calls else 0.0,
+            "in_flight": len(self._in_flight),
+        }
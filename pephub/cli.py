@@ -0,0 +1,138 @@
+import argparse
+import logging
+import os
+from typing import List, Optional
+
+import coloredlogs
+from dotenv import load_dotenv
+
+from .const import (
+    DEFAULT_POSTGRES_DB,
+    DEFAULT_POSTGRES_HOST,
+    DEFAULT_POSTGRES_PASSWORD,
+    DEFAULT_POSTGRES_PORT,
+    DEFAULT_POSTGRES_USER,
+    DEFAULT_QDRANT_COLLECTION_NAME,
+    DEFAULT_QDRANT_HOST,
+    DEFAULT_QDRANT_PORT,
+    DEFAULT_REINDEX_CHECKPOINT_PATH,
+    DEFAULT_REINDEX_ENCODE_BATCH_SIZE,
+    DEFAULT_REINDEX_PAGE_SIZE,
+    DEFAULT_REINDEX_UPSERT_BATCH_SIZE,
+    DENSE_ENCODER_MODEL,
+    PKG_NAME,
+    SPARSE_ENCODER_MODEL,
+)
+
+_LOGGER = logging.getLogger(PKG_NAME)
+
+
+def build_argparser() -> argparse.ArgumentParser:
+    """Build the cli arg parser"""
+    parser = argparse.ArgumentParser(prog="pephub", description="PEPhub server tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    reindex = subparsers.add_parser(
+        "reindex",
+        help="Embed projects and upsert them to the qdrant search collection",
+        description="Embed projects and upsert them to the qdrant search collection. "
+        "Database and qdrant connections are configured with the same environment "
+        "variables as the server (POSTGRES_*, QDRANT_*).",
+    )
+    reindex.add_argument(
+        "--full",
+        action="store_true",
+        help="Ignore the checkpoint: re-embed all projects, and delete removed ones",
+    )
+    reindex.add_argument(
+        "--collection",
+        default=DEFAULT_QDRANT_COLLECTION_NAME,
+        help="Qdrant collection name",
+    )
+    reindex.add_argument(
+        "--checkpoint",
+        default=os.environ.get("REINDEX_CHECKPOINT", DEFAULT_REINDEX_CHECKPOINT_PATH),
+        help="Path to the checkpoint file",
+    )
+    reindex.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of encoder processes, 0 to encode in the main process",
+    )
+    reindex.add_argument(
+        "--page-size",
+        type=int,
+        default=DEFAULT_REINDEX_PAGE_SIZE,
+        help="Number of projects read from the database at once",
+    )
+    reindex.add_argument(
+        "--encode-batch-size",
+        type=int,
+        default=DEFAULT_REINDEX_ENCODE_BATCH_SIZE,
+        help="Number of projects encoded at once by an encoder process",
+    )
+    reindex.add_argument(
+        "--upsert-batch-size",
+        type=int,
+        default=DEFAULT_REINDEX_UPSERT_BATCH_SIZE,
+        help="Number of points upserted to qdrant at once",
+    )
+    return parser
+
+
+def run_reindex(args: argparse.Namespace) -> None:
+    from pepdbagent import PEPDatabaseAgent
+    from qdrant_client import QdrantClient
+
+    from .reindex import BatchEncoder, reindex
+
+    agent = PEPDatabaseAgent(
+        user=os.environ.get("POSTGRES_USER") or DEFAULT_POSTGRES_USER,
+        password=os.environ.get("POSTGRES_PASSWORD") or DEFAULT_POSTGRES_PASSWORD,
+        host=os.environ.get("POSTGRES_HOST") or DEFAULT_POSTGRES_HOST,
+        database=os.environ.get("POSTGRES_DB") or DEFAULT_POSTGRES_DB,
+        port=os.environ.get("POSTGRES_PORT") or DEFAULT_POSTGRES_PORT,
+    )
+    qdrant = QdrantClient(
+        url=os.environ.get("QDRANT_HOST", DEFAULT_QDRANT_HOST),
+        port=os.environ.get("QDRANT_PORT", DEFAULT_QDRANT_PORT),
+        api_key=os.environ.get("QDRANT_API_KEY", None),
+        timeout=60,
+    )
+    encoder = BatchEncoder(
+        dense_model_name=os.getenv("HF_MODEL", DENSE_ENCODER_MODEL),
+        sparse_model_name=os.environ.get("HF_MODEL_SPARSE", SPARSE_ENCODER_MODEL),
+        workers=args.workers,
+    )
+    try:
+        result = reindex(
+            agent,
+            qdrant,
+            encoder,
+            collection=args.collection,
+            checkpoint_path=args.checkpoint,
+            full=args.full,
+            page_size=args.page_size,
+            encode_batch_size=args.encode_batch_size,
+            upsert_batch_size=args.upsert_batch_size,
+        )
+    finally:
+        encoder.close()
+    _LOGGER.info(
+        f"Indexed {result['indexed']} projects, deleted {result['deleted']}, "
+        f"checkpoint: {result['checkpoint']}"
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    load_dotenv()
+    coloredlogs.install(
+        logger=_LOGGER,
+        level=logging.INFO,
+        datefmt="%b %d %Y %H:%M:%S",
+        fmt="[%(levelname)s] [%(asctime)s] [PEPHUB] %(message)s",
+    )
+    args = build_argparser().parse_args(argv)
+    if args.command == "reindex":
+        run_reindex(args)
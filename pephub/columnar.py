@@ -0,0 +1,225 @@
+import json
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Set
+
+from .const import DEFAULT_EXPORT_CHUNK_SIZE
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Arrow IPC stream and Parquet tables of samples, for clients that load them into
+# data frames. Columns get one type for the whole table: booleans, integers or
+# floats if all values are, strings otherwise (lists and mappings as JSON).
+
+# format: (media type, file extension)
+COLUMNAR_FORMATS = {
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+INT64_MIN, INT64_MAX = -(2**63), 2**63 - 1
+
+
+def columnar_available() -> bool:
+    """
+    Arrow and Parquet formats need pyarrow
+    """
+    return pyarrow is not None
+
+
+class ColumnTypes:
+    """
+    Arrow types of table columns, collected over chunks of rows
+    """
+
+    def __init__(self, columns: Optional[List[str]] = None):
+        """
+        :param columns: columns of the table, all keys of the rows if not given
+        """
+        self._fixed = columns is not None
+        self._kinds: Dict[str, Set[str]] = {column: set() for column in columns or []}
+
+    def update(self, rows: List[dict]) -> None:
+        for row in rows:
+            for column, value in row.items():
+                if column not in self._kinds:
+                    if self._fixed:
+                        continue
+                    self._kinds[column] = set()
+                if value is not None:
+                    self._kinds[column].add(_kind(value))
+
+    def schema(self) -> "pyarrow.Schema":
+        return pyarrow.schema(
+            [(column, _arrow_type(kinds)) for column, kinds in self._kinds.items()]
+        )
+
+
+def _kind(value) -> str:
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "int" if INT64_MIN <= value <= INT64_MAX else "str"
+    if isinstance(value, float):
+        return "float"
+    return "str"
+
+
+def _arrow_type(kinds: Set[str]) -> "pyarrow.DataType":
+    if kinds == {"bool"}:
+        return pyarrow.bool_()
+    if kinds == {"int"}:
+        return pyarrow.int64()
+    if kinds and kinds <= {"int", "float"}:
+        return pyarrow.float64()
+    return pyarrow.string()
+
+
+def _string_value(value) -> Optional[str]:
+    # the same as in CSV exports
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    return str(value)
+
+
+def record_batch(rows: List[dict], schema: "pyarrow.Schema") -> "pyarrow.RecordBatch":
+    """
+    Convert rows to a record batch of the schema (see `ColumnTypes`)
+    """
+    arrays = []
+    for field in schema:
+        values = [row.get(field.name) for row in rows]
+        if pyarrow.types.is_string(field.type):
+            values = [_string_value(value) for value in values]
+        elif pyarrow.types.is_floating(field.type):
+            values = [None if value is None else float(value) for value in values]
+        arrays.append(pyarrow.array(values, type=field.type))
+    return pyarrow.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class _Sink:
+    """
+    Write-only file, that collects bytes written by Arrow writers until they are
+    drained.
+    """
+
+    closed = False
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class TableWriter:
+    """
+    Write a table in chunks of rows, as an Arrow IPC stream or a Parquet file (a row
+    group per chunk). Encoded bytes are returned as they are written.
+    """
+
+    def __init__(self, schema: "pyarrow.Schema", format: str):
+        """
+        :param schema: schema of the table, see `ColumnTypes`
+        :param format: "arrow" or "parquet"
+        """
+        if format not in COLUMNAR_FORMATS:
+            raise ValueError(f"Unknown columnar format: '{format}'")
+        self.schema = schema
+        self._sink = _Sink()
+        if format == "arrow":
+            self._writer = pyarrow.ipc.new_stream(self._sink, schema)
+        else:
+            self._writer = pyarrow.parquet.ParquetWriter(self._sink, schema)
+
+    def write(self, rows: List[dict]) -> bytes:
+        if rows:
+            self._writer.write_batch(record_batch(rows, self.schema))
+        return self._sink.drain()
+
+    def close(self) -> bytes:
+        self._writer.close()
+        return self._sink.drain()
+
+
+def iter_columnar(
+    rows: List[dict],
+    format: str,
+    chunk_size: int = DEFAULT_EXPORT_CHUNK_SIZE,
+) -> Iterator[bytes]:
+    """
+    Write a table as Arrow IPC stream or Parquet in chunks of rows (e.g. a member
+    of a zip archive)
+
+    :param rows: table rows
+    :param format: "arrow" or "parquet"
+    :param chunk_size: number of rows in a chunk
+    """
+    types = ColumnTypes()
+    types.update(rows)
+    writer = TableWriter(types.schema(), format)
+    for start in range(0, len(rows), chunk_size):
+        yield writer.write(rows[start : start + chunk_size])
+    yield writer.close()
+
+
+def encode_columnar(rows: List[dict], format: str) -> bytes:
+    return b"".join(iter_columnar(rows, format))
+
+
+async def collect_column_types(
+    read_chunks: Callable[[], AsyncIterator[List[dict]]],
+    columns: Optional[List[str]] = None,
+) -> ColumnTypes:
+    """
+    Collect column types of a table in a pass over its rows
+
+    :param read_chunks: function that starts a pass over chunks of rows
+    :param columns: columns of the table, all keys of the rows if not given
+    """
+    types = ColumnTypes(columns)
+    async for chunk in read_chunks():
+        types.update(chunk)
+    return types
+
+
+async def stream_columnar(
+    read_chunks: Callable[[], AsyncIterator[List[dict]]],
+    format: str,
+    columns: Optional[List[str]] = None,
+    types: Optional[ColumnTypes] = None,
+) -> AsyncIterator[bytes]:
+    """
+    Stream a table as Arrow IPC stream or Parquet. Rows are read twice: first to
+    collect the column types for the schema, then to write them.
+
+    :param read_chunks: function that starts a pass over chunks of rows
+    :param format: "arrow" or "parquet"
+    :param columns: columns of the table, all keys of the rows if not given
+    :param types: column types, if they were already collected (see
+        `collect_column_types`); then rows are read once
+    """
+    if types is None:
+        types = await collect_column_types(read_chunks, columns)
+    writer = TableWriter(types.schema(), format)
+    async for chunk in read_chunks():
+        data = writer.write(chunk)
+        if data:
+            yield data
+    yield writer.close()
@@ -34,6 +34,24 @@ DEFAULT_POSTGRES_DB = "pephub"
 DEFAULT_QDRANT_HOST = "localhost"
 DEFAULT_QDRANT_PORT = 6333
 DEFAULT_QDRANT_COLLECTION_NAME = "pephub"
+DEFAULT_QDRANT_TIMEOUT = 5  # seconds
+DEFAULT_QDRANT_POOL_SIZE = 20  # persistent connections to qdrant
+
+# `python -m pephub reindex`
+DEFAULT_REINDEX_PAGE_SIZE = 1000
+DEFAULT_REINDEX_ENCODE_BATCH_SIZE = 64
+DEFAULT_REINDEX_UPSERT_BATCH_SIZE = 1000
+DEFAULT_REINDEX_CHECKPOINT_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "pephub", "reindex_checkpoint.json"
+)
+
+# size of the thread pool that runs blocking pepdbagent calls
+DEFAULT_DB_EXECUTOR_THREADS = 16
+# process pool that runs CPU-bound peppy/eido work (0 runs it in threads instead)
+DEFAULT_CPU_EXECUTOR_PROCESSES = 2
+# tasks waiting for a free process, before new ones are rejected
+DEFAULT_CPU_EXECUTOR_QUEUE = 16
+DEFAULT_CPU_TASK_TIMEOUT = 60  # seconds
 
 
 BLANK_PEP_CONFIG = {
@@ -67,6 +85,11 @@ BLANK_PEP_SAMPLE_TABLE = pd.DataFrame(
 DENSE_ENCODER_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 SPARSE_ENCODER_MODEL = "prithivida/Splade_PP_en_v2"
 
+DEFAULT_QUERY_EMBEDDING_CACHE_SIZE = 4096  # queries
+DEFAULT_QUERY_EMBEDDING_CACHE_TTL = 24 * 60 * 60  # seconds
+DEFAULT_EMBEDDING_BATCH_SIZE = 32  # queries embedded in one inference call
+DEFAULT_EMBEDDING_BATCH_WAIT_MS = 5
+
 EIDO_TEMPLATES_DIRNAME = "templates/eido"
 EIDO_TEMPLATES_PATH = os.path.join(
     os.path.dirname(os.path.abspath(__file__)), EIDO_TEMPLATES_DIRNAME
@@ -80,6 +103,24 @@ BASE_TEMPLATES_PATH = os.path.join(
 STATICS_DIRNAME = "static"
 STATICS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), STATICS_DIRNAME)
 
+# schemas served by the eido router, see `pephub.schema_cache`
+DEFAULT_EIDO_SCHEMAS_SOURCE = "https://schema.databio.org"
+DEFAULT_EIDO_SCHEMAS_CACHE_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "pephub", "eido_schemas.json"
+)
+DEFAULT_EIDO_SCHEMAS_TTL = 24 * 60 * 60  # seconds
+# wait between refreshes after a failed one (e.g. the schema server is down)
+DEFAULT_EIDO_SCHEMAS_RETRY_INTERVAL = 5 * 60  # seconds
+EIDO_SCHEMAS_SNAPSHOT_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "routers", "schemas.yaml"
+)
+
+# results of eido filters, see `pephub.conversion`
+DEFAULT_CONVERSION_CACHE_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "pephub", "conversions"
+)
+DEFAULT_CONVERSION_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+
 EIDO_DIRNAME = "eido_validator"
 EIDO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), EIDO_DIRNAME)
 
@@ -142,10 +183,47 @@ DEFAULT_TAG = "default"
 
 DEFAULT_QDRANT_SCORE_THRESHOLD = 0.15
 
+# time that search waits for namespace hits, after PEP results are ready
+DEFAULT_SEARCH_LATENCY_BUDGET_MS = 1000
+
+# approximate (HNSW) vector search by default, exact search scans the whole collection
+DEFAULT_SEARCH_EXACT = False
+DEFAULT_SEARCH_HNSW_EF = 128
+DEFAULT_SEARCH_PREFETCH_LIMIT = 100
+
+DEFAULT_SEARCH_CACHE_SIZE = 1024
+DEFAULT_SEARCH_CACHE_TTL = 5 * 60  # seconds
+
 ARCHIVE_URL_PATH = "https://cloud2.databio.org/pephub/"
 
 MAX_PROCESSED_PROJECT_SIZE = 5000
 
+DEFAULT_SAMPLES_PAGE_SIZE = 1000
+MAX_SAMPLES_PAGE_SIZE = 10_000
+# samples read from the database at once by streaming exports
+DEFAULT_EXPORT_CHUNK_SIZE = 1000
+# operators of sample filters, see `samples.parse_filter`
+FILTER_EQUAL = "=="
+FILTER_IN = "=in="
+FILTER_PREFIX = "=prefix="
+
+DEFAULT_DIGEST_CACHE_SIZE = 256
+# digests are computed on write and saved here, see `digest.DigestCache`
+DEFAULT_DIGEST_CACHE_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "pephub", "digests"
+)
+# profiles of sample tables, for processed pages of samples
+DEFAULT_SAMPLE_TABLE_CACHE_SIZE = 64
+
+DEFAULT_PROJECT_CACHE_MAX_BYTES = 128 * 1024 * 1024
+# other workers don't invalidate this worker's cache, so cached projects also expire
+DEFAULT_PROJECT_CACHE_TTL = 60  # seconds
+
+DEFAULT_FAST_JSON_RESPONSES = False
+
+# responses smaller than this (in bytes) are not compressed
+DEFAULT_COMPRESSION_MIN_SIZE = 1024
+
 MAX_STANDARDIZED_PROJECT_SIZE = 100
 
 BEDMS_REPO_URL = "databio/attribute-standardizer-model6"
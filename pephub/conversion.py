@@ -0,0 +1,211 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from eido.conversion import pep_conversion_plugins
+
+from .const import (
+    DEFAULT_CONVERSION_CACHE_MAX_BYTES,
+    DEFAULT_CONVERSION_CACHE_PATH,
+    PKG_NAME,
+)
+from .metrics import Histogram, register_stats
+
+_LOGGER = logging.getLogger(PKG_NAME)
+
+ConversionResult = Dict[str, str]
+
+CONVERSION_TIME_BUCKETS = [0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30]
+
+
+class FilterRegistry:
+    """
+    Eido filter plugins, discovered from entry points once (`eido.run_filter` scans
+    them on every call).
+    """
+
+    def __init__(
+        self,
+        discover: Callable[[], Dict[str, Callable]] = pep_conversion_plugins,
+    ):
+        """
+        :param discover: function that returns filter functions by name
+        """
+        self._discover = discover
+        self._filters: Optional[Dict[str, Callable]] = None
+        self._lock = threading.Lock()
+
+    def load(self) -> None:
+        with self._lock:
+            if self._filters is None:
+                self._filters = self._discover()
+                _LOGGER.info(f"Found eido filters: {list(self._filters)}")
+
+    @property
+    def names(self) -> List[str]:
+        self.load()
+        return list(self._filters)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.names
+
+
+class ConversionCache:
+    """
+    On-disk cache of filter results, keyed by the project content digest and filter
+    name, so results are shared by all formats (plain, json, zip) and by identical
+    projects. When the cache grows over `max_bytes`, least recently used results are
+    deleted.
+    """
+
+    def __init__(
+        self, cache_path: str, max_bytes: int = DEFAULT_CONVERSION_CACHE_MAX_BYTES
+    ):
+        """
+        :param cache_path: directory of the cached results
+        :param max_bytes: maximum total size of the cached results
+        """
+        self.cache_path = cache_path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._conversion_time: Dict[str, Histogram] = {}
+        self._bytes = sum(size for _, size, _ in self._scan())
+
+    def _path(self, digest: str, filter_name: str) -> str:
+        return os.path.join(self.cache_path, f"{digest}-{filter_name}.json")
+
+    def _scan(self) -> List[tuple]:
+        """
+        Get path, size and last access time of cached results
+        """
+        if not os.path.isdir(self.cache_path):
+            return []
+        files = []
+        for entry in os.scandir(self.cache_path):
+            if entry.is_file() and entry.name.endswith(".json"):
+                stat = entry.stat()
+                files.append((entry.path, stat.st_size, stat.st_mtime))
+        return files
+
+    def get(self, digest: str, filter_name: str) -> Optional[ConversionResult]:
+        """
+        Get cached result, None on miss
+        """
+        path = self._path(digest, filter_name)
+        try:
+            with open(path) as f:
+                result = json.load(f)
+            # mtime is the last access time for LRU eviction
+            os.utime(path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            with self._lock:
+                self._misses += 1
+            return None
+        with self._lock:
+            self._hits += 1
+        return result
+
+    def set(self, digest: str, filter_name: str, result: ConversionResult) -> None:
+        os.makedirs(self.cache_path, exist_ok=True)
+        path = self._path(digest, filter_name)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(result, f)
+        size = os.path.getsize(tmp_path)
+        with self._lock:
+            # a result of the same project and filter is overwritten
+            try:
+                size -= os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+            os.replace(tmp_path, path)
+            self._bytes += size
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        files = sorted(self._scan(), key=lambda file: file[2])
+        self._bytes = sum(size for _, size, _ in files)
+        for path, size, _ in files:
+            if self._bytes <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+                self._bytes -= size
+            except FileNotFoundError:
+                pass
+
+    async def convert(
+        self,
+        digest: str,
+        filter_name: str,
+        run_filter: Callable[[], Awaitable[ConversionResult]],
+    ) -> ConversionResult:
+        """
+        Get cached result, or run the filter and cache its result
+
+        :param digest: content digest of the project
+        :param filter_name: name of the filter
+        :param run_filter: coroutine function that runs the filter (only on miss),
+            e.g. in the CPU executor
+        """
+        result = await asyncio.to_thread(self.get, digest, filter_name)
+        if result is not None:
+            return result
+        start = time.perf_counter()
+        result = await run_filter()
+        self._observe(filter_name, time.perf_counter() - start)
+        try:
+            await asyncio.to_thread(self.set, digest, filter_name, result)
+        except OSError as e:
+            _LOGGER.warning(f"Could not cache conversion result: {e}")
+        return result
+
+    def _observe(self, filter_name: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self._conversion_time.setdefault(
+                filter_name, Histogram(CONVERSION_TIME_BUCKETS)
+            )
+        histogram.observe(seconds)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "conversion_seconds": {
+                    name: histogram.stats()
+                    for name, histogram in self._conversion_time.items()
+                },
+            }
+
+
+filter_registry = FilterRegistry()
+
+conversion_cache = ConversionCache(
+    cache_path=os.path.expanduser(
+        os.environ.get("CONVERSION_CACHE", DEFAULT_CONVERSION_CACHE_PATH)
+    ),
+    max_bytes=int(
+        os.environ.get("CONVERSION_CACHE_MAX_BYTES", DEFAULT_CONVERSION_CACHE_MAX_BYTES)
+    ),
+)
+register_stats("conversion_cache", conversion_cache.stats)
+
+
+def get_filter_registry() -> FilterRegistry:
+    return filter_registry
+
+
+def get_conversion_cache() -> ConversionCache:
+    return conversion_cache
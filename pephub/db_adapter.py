@@ -0,0 +1,145 @@
+from typing import Dict, List, Optional, Set
+
+from pepdbagent import PEPDatabaseAgent
+from pepdbagent.const import DEFAULT_TAG, PEPHUB_SAMPLE_ID_KEY
+from pepdbagent.db_utils import Projects, Samples
+from pepdbagent.exceptions import ProjectNotFoundError
+from sqlalchemy import JSON, ColumnElement, Integer, String, and_, select
+from sqlalchemy.orm import Session
+
+from .const import FILTER_IN, FILTER_PREFIX
+
+# Queries on samples that pepdbagent has no public API for (pages, filters, chunked
+# reads), written against its ORM tables. This is the only module that depends on
+# them: the version of pepdbagent is pinned in requirements, and `check_schema` (run
+# by tests) fails if the tables change.
+
+# columns of pepdbagent tables used here, and their types
+EXPECTED_COLUMNS = {
+    Projects: {"id": Integer, "namespace": String, "name": String, "tag": String},
+    # samples of a project are a linked list: `parent_guid` is the previous sample
+    Samples: {
+        "guid": String,
+        "parent_guid": String,
+        "project_id": Integer,
+        "sample": JSON,
+    },
+}
+
+
+def check_schema() -> None:
+    """
+    Check that pepdbagent tables have the columns used by this module
+
+    :raises RuntimeError: if a column is missing or has a different type
+    """
+    for table, columns in EXPECTED_COLUMNS.items():
+        for name, column_type in columns.items():
+            column = table.__table__.columns.get(name)
+            if column is None or not isinstance(column.type, column_type):
+                raise RuntimeError(
+                    f"Unsupported pepdbagent version: table "
+                    f"'{table.__tablename__}' has no {column_type.__name__} "
+                    f"column '{name}'"
+                )
+
+
+def open_session(agent: PEPDatabaseAgent) -> Session:
+    return Session(agent.connection)
+
+
+def get_project_id(
+    session: Session, namespace: str, name: str, tag: str = DEFAULT_TAG
+) -> int:
+    """
+    :raises ProjectNotFoundError: if the project doesn't exist
+    """
+    project_id = session.scalar(
+        select(Projects.id).where(
+            and_(
+                Projects.namespace == namespace.lower(),
+                Projects.name == name,
+                Projects.tag == tag,
+            )
+        )
+    )
+    if project_id is None:
+        raise ProjectNotFoundError(
+            f"No project found for supplied input: '{namespace}/{name}:{tag}'."
+        )
+    return project_id
+
+
+def get_sample_order(session: Session, project_id: int) -> Dict[Optional[str], str]:
+    """
+    Get mapping of sample guid to the guid of the next sample (None maps to the first
+    sample)
+    """
+    rows = session.execute(
+        select(Samples.guid, Samples.parent_guid).where(
+            Samples.project_id == project_id
+        )
+    )
+    return {parent_guid: guid for guid, parent_guid in rows}
+
+
+def _filter_clause(attribute: str, operator: str, values: List[str]) -> ColumnElement:
+    value = Samples.sample[attribute].as_string()
+    if operator == FILTER_IN:
+        return value.in_(values)
+    if operator == FILTER_PREFIX:
+        return value.startswith(values[0], autoescape=True)
+    return value == values[0]
+
+
+def get_matching_guids(
+    session: Session, project_id: int, filters: Optional[list]
+) -> Optional[Set[str]]:
+    """
+    Get guids of samples that match all filters, None if there are no filters
+
+    :param filters: filters, see `samples.SampleFilter`
+    """
+    if not filters:
+        return None
+    return set(
+        session.scalars(
+            select(Samples.guid).where(
+                Samples.project_id == project_id,
+                *[_filter_clause(f.attribute, f.operator, f.values) for f in filters],
+            )
+        )
+    )
+
+
+def read_samples(
+    session: Session,
+    guids: List[str],
+    with_id: bool = False,
+    columns: Optional[List[str]] = None,
+) -> List[dict]:
+    """
+    Read samples by guid, in the order of `guids`. If `columns` are given, only these
+    attributes are read from the database.
+    """
+    samples = {}
+    if guids:
+        if columns:
+            values = [Samples.sample[column] for column in columns]
+            rows = session.execute(
+                select(Samples.guid, *values).where(Samples.guid.in_(guids))
+            )
+            samples = {row[0]: dict(zip(columns, row[1:])) for row in rows}
+        else:
+            rows = session.execute(
+                select(Samples.guid, Samples.sample).where(Samples.guid.in_(guids))
+            )
+            samples = {guid: sample for guid, sample in rows}
+
+    items = []
+    for guid in guids:
+        sample = samples[guid]
+        if with_id:
+            sample[PEPHUB_SAMPLE_ID_KEY] = guid
+        items.append(sample)
+    return items
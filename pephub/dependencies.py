@@ -10,17 +10,16 @@ import jwt
 import pydantic
 import requests
 from dotenv import load_dotenv
-from fastapi import Depends, Header, Query
+from fastapi import Depends, Header, Query, Request, Response
 from fastapi.exceptions import HTTPException
 from fastapi.security import HTTPBearer
-from fastembed.embedding import TextEmbedding as Embedding
 from pepdbagent import PEPDatabaseAgent
 from pepdbagent.const import DEFAULT_TAG
 from pepdbagent.exceptions import ProjectNotFoundError
 from pepdbagent.models import AnnotationModel, Namespace, ListOfNamespaceInfo
 from pydantic import BaseModel
-from qdrant_client import QdrantClient
-from sentence_transformers import SparseEncoder
+import httpx
+from qdrant_client import AsyncQdrantClient, QdrantClient
 from qdrant_client.http.exceptions import ResponseHandlingException
 
 from .const import (
@@ -30,13 +29,33 @@ from .const import (
     DEFAULT_POSTGRES_PASSWORD,
     DEFAULT_POSTGRES_PORT,
     DEFAULT_POSTGRES_USER,
+    DEFAULT_PROJECT_CACHE_MAX_BYTES,
+    DEFAULT_PROJECT_CACHE_TTL,
+    DEFAULT_DIGEST_CACHE_PATH,
+    DEFAULT_DIGEST_CACHE_SIZE,
+    DEFAULT_SAMPLE_TABLE_CACHE_SIZE,
+    DEFAULT_EMBEDDING_BATCH_SIZE,
+    DEFAULT_EMBEDDING_BATCH_WAIT_MS,
+    DEFAULT_FAST_JSON_RESPONSES,
     DEFAULT_QDRANT_HOST,
+    DEFAULT_QDRANT_POOL_SIZE,
     DEFAULT_QDRANT_PORT,
+    DEFAULT_QDRANT_TIMEOUT,
+    DEFAULT_QUERY_EMBEDDING_CACHE_SIZE,
+    DEFAULT_QUERY_EMBEDDING_CACHE_TTL,
+    DEFAULT_SEARCH_CACHE_SIZE,
+    DEFAULT_SEARCH_CACHE_TTL,
     JWT_SECRET,
     SPARSE_ENCODER_MODEL,
     PKG_NAME,
 )
+from .cache import GenerationalCache, ProjectCache, ProjectVersionCache, SingleFlight
+from .digest import DigestCache, update_digests
+from .etag import etag_matches, project_etag
+from .embeddings import EmbeddingBatcher, EmbeddingModels, QueryEmbeddingCache
+from .executor import db_executor, run_db
 from .helpers import jwt_encode_user_data
+from .metrics import Histogram, register_stats
 from .routers.models import ForkRequest
 from .developer_keys import dev_key_handler
 
@@ -91,6 +110,13 @@ class CLIAuthSystem:
         return jwt_encode_user_data(user_data, exp=exp)
 
 
+def parse_boolean_env_var(env_var: str) -> bool:
+    """
+    Helper function to parse a boolean environment variable
+    """
+    return env_var.lower() in ["true", "1", "t", "y", "yes"]
+
+
 # database connection
 agent = PEPDatabaseAgent(
     user=os.environ.get("POSTGRES_USER") or DEFAULT_POSTGRES_USER,
@@ -100,33 +126,100 @@ agent = PEPDatabaseAgent(
     port=os.environ.get("POSTGRES_PORT") or DEFAULT_POSTGRES_PORT,
 )
 
-# sentence_transformer model
-_LOGGER_PEPHUB.info(f"HF MODEL IN USE: {os.getenv('HF_MODEL', DENSE_ENCODER_MODEL)}")
-embedding_model = Embedding(
-    model_name=os.getenv("HF_MODEL", DENSE_ENCODER_MODEL), max_length=512
+# sentence_transformer (dense) and sparse models. They are loaded lazily, or warmed up
+# in the background on startup, see `pephub.main.lifespan`
+embedding_models = EmbeddingModels(
+    dense_model_name=os.getenv("HF_MODEL", DENSE_ENCODER_MODEL),
+    sparse_model_name=os.environ.get("HF_MODEL_SPARSE", SPARSE_ENCODER_MODEL),
+    query_cache=QueryEmbeddingCache(
+        maxsize=int(
+            os.environ.get(
+                "QUERY_EMBEDDING_CACHE_SIZE", DEFAULT_QUERY_EMBEDDING_CACHE_SIZE
+            )
+        ),
+        ttl=int(
+            os.environ.get(
+                "QUERY_EMBEDDING_CACHE_TTL", DEFAULT_QUERY_EMBEDDING_CACHE_TTL
+            )
+        ),
+    ),
 )
-# embedding_model = None
+register_stats("query_embedding_cache", embedding_models.query_cache.stats)
 
-# token = os.environ.get("HF_TOKEN", None)
-# hf_model_sparse = os.environ.get("HF_MODEL_SPARSE", SPARSE_ENCODER_MODEL)
-# if token is None:
-#     sparse_model = None
-#     _LOGGER_PEPHUB.warning("No HF_TOKEN provided, sparse model disabled.")
-# else:
+# concurrent search queries are embedded together, in micro-batches
+embedding_batcher = EmbeddingBatcher(
+    embedding_models,
+    max_batch_size=int(
+        os.environ.get("EMBEDDING_BATCH_SIZE", DEFAULT_EMBEDDING_BATCH_SIZE)
+    ),
+    max_wait_ms=float(
+        os.environ.get("EMBEDDING_BATCH_WAIT_MS", DEFAULT_EMBEDDING_BATCH_WAIT_MS)
+    ),
+)
+register_stats("embedding_batcher", embedding_batcher.stats)
 
-hf_model_sparse = os.environ.get("HF_MODEL_SPARSE", SPARSE_ENCODER_MODEL)
-sparse_model = SparseEncoder(hf_model_sparse)
-_LOGGER_PEPHUB.info(f"Sparse model in use: {hf_model_sparse}")
+# search results, invalidated on every project write, see `invalidate_project`
+search_cache = GenerationalCache(
+    maxsize=int(os.environ.get("SEARCH_CACHE_SIZE", DEFAULT_SEARCH_CACHE_SIZE)),
+    ttl=int(os.environ.get("SEARCH_CACHE_TTL", DEFAULT_SEARCH_CACHE_TTL)),
+)
+register_stats("search_cache", search_cache.stats)
 
+digest_cache = DigestCache(
+    maxsize=int(os.environ.get("DIGEST_CACHE_SIZE", DEFAULT_DIGEST_CACHE_SIZE)),
+    cache_path=os.path.expanduser(
+        os.environ.get("DIGEST_CACHE", DEFAULT_DIGEST_CACHE_PATH)
+    ),
+)
+register_stats("digest_cache", digest_cache.stats)
 
-## Qdrant connection
-def parse_boolean_env_var(env_var: str) -> bool:
+# contexts of sample tables for processed pages, see `processing.sample_table_context`
+sample_table_cache = ProjectVersionCache(
+    maxsize=int(
+        os.environ.get("SAMPLE_TABLE_CACHE_SIZE", DEFAULT_SAMPLE_TABLE_CACHE_SIZE)
+    )
+)
+register_stats("sample_table_cache", sample_table_cache.stats)
+
+# raw projects, invalidated on every project write (see `invalidate_project`), and
+# expired after a TTL
+project_cache = ProjectCache(
+    max_bytes=int(
+        os.environ.get("PROJECT_CACHE_MAX_BYTES", DEFAULT_PROJECT_CACHE_MAX_BYTES)
+    ),
+    ttl=int(os.environ.get("PROJECT_CACHE_TTL", DEFAULT_PROJECT_CACHE_TTL)),
+)
+register_stats("project_cache", project_cache.stats)
+
+# trusted (database) content of large responses is encoded without validation
+FAST_JSON_RESPONSES = parse_boolean_env_var(
+    os.environ.get("FAST_JSON_RESPONSES", str(DEFAULT_FAST_JSON_RESPONSES))
+)
+
+# concurrent reads of the same project share one database fetch
+project_reads = SingleFlight()
+register_stats("project_reads", project_reads.stats)
+
+
+def invalidate_project(
+    namespace: str, name: Optional[str] = None, tag: str = DEFAULT_TAG
+) -> None:
     """
-    Helper function to parse a boolean environment variable
+    Invalidate cached data after a project was created, updated, forked or deleted.
+    Has to be called by every endpoint that writes a project.
+
+    :param namespace: namespace of the project
+    :param name: name of the project, None if all projects of the namespace were written
+    :param tag: tag of the project
     """
-    return env_var.lower() in ["true", "1", "t", "y", "yes"]
+    project_cache.invalidate(namespace, name, tag)
+    search_cache.invalidate()
+    if name is not None:
+        # digests are computed on write, in the background
+        db_executor.submit(update_digests, agent, digest_cache, namespace, name, tag)
 
 
+## Qdrant connection
 def initialize_qdrant_client() -> Union[QdrantClient, None]:
     """
     Initialize Qdrant client if enabled
@@ -152,7 +245,39 @@ def initialize_qdrant_client() -> Union[QdrantClient, None]:
     return None
 
 
+def initialize_async_qdrant_client() -> Union[AsyncQdrantClient, None]:
+    """
+    Initialize async Qdrant client, used by search endpoints, if qdrant is available.
+
+    Client keeps a pool of persistent (keep-alive) connections, so that each search
+    doesn't pay for a new connection to qdrant.
+    """
+    if qdrant is None:
+        return None
+    pool_size = int(os.environ.get("QDRANT_POOL_SIZE", DEFAULT_QDRANT_POOL_SIZE))
+    return AsyncQdrantClient(
+        url=os.environ.get("QDRANT_HOST", DEFAULT_QDRANT_HOST),
+        port=os.environ.get("QDRANT_PORT", DEFAULT_QDRANT_PORT),
+        api_key=os.environ.get("QDRANT_API_KEY", None),
+        timeout=int(os.environ.get("QDRANT_TIMEOUT", DEFAULT_QDRANT_TIMEOUT)),
+        limits=httpx.Limits(
+            max_connections=pool_size, max_keepalive_connections=pool_size
+        ),
+    )
+
+
 qdrant = initialize_qdrant_client()
+async_qdrant = initialize_async_qdrant_client()
+
+# latency of search queries sent to qdrant
+qdrant_query_latency = Histogram([0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5])
+register_stats(
+    "qdrant",
+    lambda: {
+        "enabled": qdrant is not None,
+        "query_seconds": qdrant_query_latency.stats(),
+    },
+)
 
 
 def get_qdrant() -> Union[QdrantClient, None]:
@@ -163,6 +288,14 @@ def get_qdrant() -> Union[QdrantClient, None]:
     return qdrant
 
 
+def get_async_qdrant() -> Union[AsyncQdrantClient, None]:
+    """
+    Return async connection to qdrant client
+    """
+
+    return async_qdrant
+
+
 def generate_random_auth_code() -> str:
     """
     Generate a random 32-digit code.
@@ -255,7 +388,66 @@ def get_namespace_access_list(
         return []
 
 
-def get_project(
+def _read_encoded_project(
+    agent: PEPDatabaseAgent, namespace: str, project: str, tag: str, with_id: bool
+) -> bytes:
+    return ProjectCache.encode(
+        agent.project.get(namespace, project, tag, raw=True, with_id=with_id)
+    )
+
+
+async def load_encoded_project(
+    agent: PEPDatabaseAgent,
+    namespace: str,
+    project: str,
+    tag: Optional[str] = DEFAULT_TAG,
+    with_id: bool = False,
+) -> bytes:
+    """
+    Load encoded raw project (from the project cache, or the database), 404 if it
+    doesn't exist. Encoded projects can be handed off to the CPU executor as they are.
+    """
+    key = project_cache.key(namespace, project, tag, with_id)
+    cached = project_cache.get_encoded(key)
+    if cached is not None:
+        return cached
+
+    version = project_cache.version
+
+    async def read_project() -> bytes:
+        blob = await run_db(
+            _read_encoded_project, agent, namespace, project, tag, with_id
+        )
+        project_cache.set(key, blob, version)
+        return blob
+
+    try:
+        # requests after a write don't join reads started before it
+        return await project_reads.do((key, version), read_project)
+    except ProjectNotFoundError:
+        raise HTTPException(
+            404,
+            f"PEP '{namespace}/{project}:{tag or DEFAULT_TAG}' does not exist in database. Did you spell it correctly?",
+        )
+
+
+async def load_project(
+    agent: PEPDatabaseAgent,
+    namespace: str,
+    project: str,
+    tag: Optional[str] = DEFAULT_TAG,
+    with_id: bool = False,
+) -> Dict[str, Any]:
+    """
+    Load raw project (from the project cache, or the database), 404 if it doesn't exist
+    """
+    # every caller decodes its own copy of the shared, encoded project
+    return json.loads(
+        await load_encoded_project(agent, namespace, project, tag, with_id)
+    )
+
+
+async def get_project(
     namespace: str,
     project: str,
     tag: Optional[str] = DEFAULT_TAG,
@@ -266,24 +458,26 @@ def get_project(
         include_in_schema=False,
     ),
 ) -> Dict[str, Any]:  # type: ignore
-    try:
-        proj = agent.project.get(namespace, project, tag, raw=True, with_id=with_id)
-        yield proj
-    except ProjectNotFoundError:
-        raise HTTPException(
-            404,
-            f"PEP '{namespace}/{project}:{tag or DEFAULT_TAG}' does not exist in database. Did you spell it correctly?",
-        )
+    yield await load_project(agent, namespace, project, tag, with_id=with_id)
+
+
+async def get_encoded_project(
+    namespace: str,
+    project: str,
+    tag: Optional[str] = DEFAULT_TAG,
+    agent: PEPDatabaseAgent = Depends(get_db),
+) -> bytes:  # type: ignore
+    yield await load_encoded_project(agent, namespace, project, tag)
 
 
-def get_config(
+async def get_config(
     namespace: str,
     project: str,
     tag: Optional[str] = DEFAULT_TAG,
     agent: PEPDatabaseAgent = Depends(get_db),
 ) -> Dict[str, Any]:  # type: ignore
     try:
-        config = agent.project.get_config(namespace, project, tag)
+        config = await run_db(agent.project.get_config, namespace, project, tag)
         yield config
     except ProjectNotFoundError:
         raise HTTPException(
@@ -292,14 +486,14 @@ def get_config(
         )
 
 
-def get_subsamples(
+async def get_subsamples(
     namespace: str,
     project: str,
     tag: Optional[str] = DEFAULT_TAG,
     agent: PEPDatabaseAgent = Depends(get_db),
 ) -> Dict[str, Any]:  # type: ignore # type: ignore
     try:
-        subsamples = agent.project.get_subsamples(namespace, project, tag)
+        subsamples = await run_db(agent.project.get_subsamples, namespace, project, tag)
         yield subsamples
     except ProjectNotFoundError:
         raise HTTPException(
@@ -308,7 +502,7 @@ def get_subsamples(
         )
 
 
-def get_project_annotation(
+async def get_project_annotation(
     namespace: str,
     project: str,
     tag: Optional[str] = DEFAULT_TAG,
@@ -316,8 +510,14 @@ def get_project_annotation(
     namespace_access_list: List[str] = Depends(get_namespace_access_list),
 ) -> AnnotationModel:  # type: ignore
     try:
-        anno = agent.annotation.get(
-            namespace, project, tag, admin=namespace_access_list
+        anno = (
+            await run_db(
+                agent.annotation.get,
+                namespace,
+                project,
+                tag,
+                admin=namespace_access_list,
+            )
         ).results[0]
         yield anno
     except ProjectNotFoundError:
@@ -327,6 +527,25 @@ def get_project_annotation(
         )
 
 
+def verify_project_not_modified(
+    request: Request,
+    response: Response,
+    project_annotation: AnnotationModel = Depends(get_project_annotation),
+) -> str:
+    """
+    Conditional GET of a project representation. Sets the `ETag` header of the
+    response, and responds with 304 Not Modified if it matches `If-None-Match`.
+    Only the project annotation is read, so it runs before the project is loaded.
+    """
+    etag = project_etag(
+        project_annotation, request.url.path, request.query_params.multi_items()
+    )
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        raise HTTPException(304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return etag
+
+
 def verify_user_can_write_namespace(
     namespace: str,
     session_info: Union[dict, None] = Depends(read_authorization_header),
@@ -396,21 +615,33 @@ def verify_user_can_fork(
         raise HTTPException(401, "Unauthorized to fork this repo")
 
 
-def get_sentence_transformer() -> Embedding:
+def get_embedding_models() -> EmbeddingModels:
     """
-    Return sentence transformer encoder
+    Return lazily loaded dense and sparse embedding models
     """
-    return embedding_model
+    return embedding_models
 
 
-def get_sparse_model() -> Union[SparseEncoder, None]:
+def get_embedding_batcher() -> EmbeddingBatcher:
     """
-    Return sparse encoder model
+    Return micro-batching scheduler for query embeddings
     """
-    return sparse_model
+    return embedding_batcher
+
+
+def get_search_cache() -> GenerationalCache:
+    return search_cache
+
+
+def get_digest_cache() -> DigestCache:
+    return digest_cache
+
+
+def get_sample_table_cache() -> ProjectVersionCache:
+    return sample_table_cache
 
 
-def get_namespace_info(
+async def get_namespace_info(
     namespace: str,
     agent: PEPDatabaseAgent = Depends(get_db),
     user: str = Depends(get_user_from_session_info),
@@ -420,7 +651,8 @@ def get_namespace_info(
     """
     # TODO: is this the best way to do this? By grabbing the first result?
     try:
-        yield agent.namespace.get(query=namespace, admin=user).results[0]
+        namespaces = await run_db(agent.namespace.get, query=namespace, admin=user)
+        yield namespaces.results[0]
     except IndexError:
         # namespace doesnt exist in database, so we must return a blank namespace
         yield Namespace(
@@ -0,0 +1,220 @@
+import json
+import logging
+import os
+import threading
+from hashlib import md5
+from typing import Any, List, NamedTuple, Optional, Tuple
+
+from pepdbagent import PEPDatabaseAgent
+from pepdbagent.const import DEFAULT_TAG
+from pepdbagent.exceptions import ProjectNotFoundError
+
+from .cache import ProjectVersionCache
+from .const import DEFAULT_EXPORT_CHUNK_SIZE, PKG_NAME
+from .samples import get_sample_guids, get_samples
+
+_LOGGER = logging.getLogger(PKG_NAME)
+
+
+class ProjectDigests(NamedTuple):
+    project: str
+    config: str
+    samples: str
+    subsamples: str
+    # digest of every sample, in project order
+    sample_digests: List[str]
+
+
+def canonical_digest(value: Any) -> str:
+    """
+    MD5 digest of canonical JSON of the value (sorted keys, no whitespace), the same
+    serialization pepdbagent uses for project digests
+    """
+    return md5(
+        json.dumps(
+            value,
+            separators=(",", ":"),
+            ensure_ascii=False,
+            allow_nan=False,
+            sort_keys=True,
+        ).encode("utf-8")
+    ).hexdigest()
+
+
+def combine_digests(digests: List[str]) -> str:
+    return md5("".join(digests).encode("utf-8")).hexdigest()
+
+
+def compute_digests(
+    config: dict, samples: List[dict], subsamples: List[List[dict]]
+) -> ProjectDigests:
+    """
+    Canonical digests of a project.
+
+    Sample table digest is built from digests of the samples (order matters), and
+    project digest from digests of the config, sample table and subsample tables.
+    """
+    sample_digests = [canonical_digest(sample) for sample in samples]
+    return _combine(config, sample_digests, subsamples)
+
+
+def _combine(
+    config: dict, sample_digests: List[str], subsamples: List[List[dict]]
+) -> ProjectDigests:
+    config_digest = canonical_digest(config)
+    samples_digest = combine_digests(sample_digests)
+    subsamples_digest = canonical_digest(subsamples)
+    return ProjectDigests(
+        project=combine_digests([config_digest, samples_digest, subsamples_digest]),
+        config=config_digest,
+        samples=samples_digest,
+        subsamples=subsamples_digest,
+        sample_digests=sample_digests,
+    )
+
+
+def read_digests(
+    agent: PEPDatabaseAgent,
+    namespace: str,
+    name: str,
+    tag: str = DEFAULT_TAG,
+    chunk_size: int = DEFAULT_EXPORT_CHUNK_SIZE,
+) -> ProjectDigests:
+    """
+    Compute digests of a project stored in the database (blocking). Samples are read
+    in chunks, so the whole sample table is never held in memory.
+
+    :raises ProjectNotFoundError: if the project doesn't exist
+    """
+    guids = get_sample_guids(agent, namespace, name, tag)
+    sample_digests = []
+    for start in range(0, len(guids), chunk_size):
+        for sample in get_samples(agent, guids[start : start + chunk_size]):
+            sample_digests.append(canonical_digest(sample))
+    config = agent.project.get_config(namespace, name, tag)
+    subsamples = agent.project.get_subsamples(namespace, name, tag)
+    return _combine(config, sample_digests, subsamples)
+
+
+class DigestCache(ProjectVersionCache):
+    """
+    LRU cache of project digests, see `ProjectVersionCache`.
+
+    With `cache_path`, digests are also saved to disk (a file per project), so they
+    survive restarts and are shared by all workers of the server.
+    """
+
+    def __init__(self, maxsize: int = 256, cache_path: Optional[str] = None):
+        """
+        :param maxsize: maximum number of projects in memory
+        :param cache_path: directory of the saved digests, None to keep them in memory
+        """
+        super().__init__(maxsize=maxsize)
+        self.cache_path = cache_path
+        self._disk_hits = 0
+        self._disk_lock = threading.Lock()
+
+    @staticmethod
+    def key(namespace: str, name: str, tag: str) -> Tuple[str, str, str]:
+        return namespace.lower(), name, tag
+
+    def _path(self, registry: Tuple[str, str, str]) -> str:
+        return os.path.join(self.cache_path, f"{canonical_digest(list(registry))}.json")
+
+    def get(
+        self, registry: Tuple[str, str, str], last_update_date: Optional[str]
+    ) -> Optional[ProjectDigests]:
+        """
+        Get digests of the project, None if the project was updated since
+        """
+        digests = super().get(registry, last_update_date)
+        if digests is not None or self.cache_path is None:
+            return digests
+        try:
+            with open(self._path(registry)) as f:
+                saved = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if saved.get("last_update_date") != last_update_date:
+            return None
+        digests = ProjectDigests(**saved["digests"])
+        super().set(registry, last_update_date, digests)
+        with self._disk_lock:
+            self._disk_hits += 1
+        return digests
+
+    def set(
+        self,
+        registry: Tuple[str, str, str],
+        last_update_date: Optional[str],
+        digests: ProjectDigests,
+    ) -> None:
+        super().set(registry, last_update_date, digests)
+        if self.cache_path is None:
+            return
+        try:
+            os.makedirs(self.cache_path, exist_ok=True)
+            path = self._path(registry)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(
+                    {
+                        "last_update_date": last_update_date,
+                        "digests": digests._asdict(),
+                    },
+                    f,
+                )
+            os.replace(tmp_path, path)
+        except OSError as e:
+            _LOGGER.warning(f"Could not save digests: {e}")
+
+    def discard(self, registry: Tuple[str, str, str]) -> None:
+        """
+        Drop digests of a deleted project
+        """
+        with self._lock:
+            self._cache.pop(registry, None)
+        if self.cache_path is not None:
+            try:
+                os.remove(self._path(registry))
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        with self._disk_lock:
+            stats["disk_hits"] = self._disk_hits
+        return stats
+
+
+def update_digests(
+    agent: PEPDatabaseAgent,
+    cache: DigestCache,
+    namespace: str,
+    name: str,
+    tag: str = DEFAULT_TAG,
+) -> None:
+    """
+    Compute digests of a written project, and cache them for its new
+    `last_update_date` (blocking). Called after every write, so that digests are
+    ready before they are requested.
+    """
+    registry = cache.key(namespace, name, tag)
+    try:
+        # the date is read first: if the project is written again in the meantime,
+        # newer digests are only cached for the older date, never the other way around
+        # (the same query as `dependencies.get_project_annotation`, for the same date)
+        annotations = agent.annotation.get(
+            namespace, name, tag, admin=namespace
+        ).results
+        if not annotations:
+            raise ProjectNotFoundError()
+        last_update_date = annotations[0].last_update_date
+        digests = read_digests(agent, namespace, name, tag)
+    except ProjectNotFoundError:
+        cache.discard(registry)
+        return
+    except Exception as e:
+        _LOGGER.warning(f"Could not compute digests of '{namespace}/{name}:{tag}': {e}")
+        return
+    cache.set(registry, last_update_date, digests)
@@ -0,0 +1,395 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Hashable, List, Optional, Tuple
+
+import numpy as np
+from cachetools import TTLCache
+from qdrant_client.models import SparseVector
+
+from fastapi.concurrency import run_in_threadpool
+
+from .const import (
+    DEFAULT_EMBEDDING_BATCH_SIZE,
+    DEFAULT_EMBEDDING_BATCH_WAIT_MS,
+    DEFAULT_QUERY_EMBEDDING_CACHE_SIZE,
+    DEFAULT_QUERY_EMBEDDING_CACHE_TTL,
+    PKG_NAME,
+)
+from .metrics import Histogram
+
+if TYPE_CHECKING:
+    from fastembed.embedding import TextEmbedding as Embedding
+    from sentence_transformers import SparseEncoder
+
+_LOGGER = logging.getLogger(PKG_NAME)
+
+MODELS_NOT_LOADED = "not_loaded"
+MODELS_LOADING = "loading"
+MODELS_READY = "ready"
+MODELS_FAILED = "failed"
+
+
+def load_dense_model(model_name: str) -> "Embedding":
+    """
+    Load fastembed dense text embedding model
+    """
+    from fastembed.embedding import TextEmbedding as Embedding
+
+    return Embedding(model_name=model_name, max_length=512)
+
+
+def load_sparse_model(model_name: str) -> "SparseEncoder":
+    """
+    Load sentence-transformers sparse (SPLADE) encoder
+    """
+    from sentence_transformers import SparseEncoder
+
+    return SparseEncoder(model_name)
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize search query before embedding, so that equivalent queries share cache entries.
+    Only whitespace is normalized, case is kept since it may matter for a cased model.
+    """
+    return " ".join(query.split())
+
+
+def sparse_vectors_from_tensor(tensor: Any) -> List[SparseVector]:
+    """
+    Convert output of `SparseEncoder.encode` (torch sparse tensor) to qdrant sparse vectors.
+
+    :param tensor: 1D tensor (single text), or 2D tensor (one row per text)
+    :return: list of sparse vectors, one per encoded text
+    """
+    coalesced = tensor.coalesce()
+    indices = coalesced.indices().tolist()
+    values = coalesced.values().tolist()
+    if len(indices) == 1:
+        return [SparseVector(indices=indices[0], values=values)]
+
+    rows = [([], []) for _ in range(coalesced.shape[0])]
+    for row, column, value in zip(indices[0], indices[1], values):
+        rows[row][0].append(column)
+        rows[row][1].append(value)
+    return [SparseVector(indices=i, values=v) for i, v in rows]
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded LRU cache, with time to live, of query embeddings
+    """
+
+    def __init__(
+        self,
+        maxsize: int = DEFAULT_QUERY_EMBEDDING_CACHE_SIZE,
+        ttl: int = DEFAULT_QUERY_EMBEDDING_CACHE_TTL,
+    ):
+        """
+        :param maxsize: maximum number of cached queries
+        :param ttl: time (in seconds) after which cached embedding expires
+        """
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Tuple[np.ndarray, Optional[SparseVector]]]:
+        with self._lock:
+            value = self._cache.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def set(
+        self, key: Hashable, value: Tuple[np.ndarray, Optional[SparseVector]]
+    ) -> None:
+        with self._lock:
+            self._cache[key] = value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "size": len(self._cache),
+                "maxsize": self._cache.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / requests if requests else 0.0,
+            }
+
+
+class EmbeddingModels:
+    """
+    Lazily loaded dense and sparse embedding models used by search.
+
+    Both libraries (and the models themselves) take seconds to import and load, and
+    use hundreds of MB of memory, so nothing is loaded until the models are first
+    requested, or until `warm_up` is started in the background on server startup.
+    """
+
+    def __init__(
+        self,
+        dense_model_name: str,
+        sparse_model_name: Optional[str],
+        dense_loader: Callable[[str], Any] = load_dense_model,
+        sparse_loader: Callable[[str], Any] = load_sparse_model,
+        query_cache: Optional[QueryEmbeddingCache] = None,
+    ):
+        """
+        :param dense_model_name: name of the dense (fastembed) model
+        :param sparse_model_name: name of the sparse model. If None, sparse encoding is disabled
+        :param dense_loader: function that loads the dense model by name
+        :param sparse_loader: function that loads the sparse model by name
+        :param query_cache: cache of query embeddings
+        """
+        self.dense_model_name = dense_model_name
+        self.sparse_model_name = sparse_model_name
+        self._dense_loader = dense_loader
+        self._sparse_loader = sparse_loader
+        self._dense = None
+        self._sparse = None
+        self._lock = threading.Lock()
+        self._state = MODELS_NOT_LOADED
+        self._error: Optional[str] = None
+        self._load_seconds: Optional[float] = None
+        self._warm_up_thread: Optional[threading.Thread] = None
+        self.query_cache = query_cache or QueryEmbeddingCache()
+
+    @property
+    def is_ready(self) -> bool:
+        return self._state == MODELS_READY
+
+    def load(self) -> None:
+        """
+        Load both models (blocking). Safe to call from several threads, models are loaded only once.
+        """
+        if self._state == MODELS_READY:
+            return
+        with self._lock:
+            if self._state == MODELS_READY:
+                return
+            self._state = MODELS_LOADING
+            start = time.perf_counter()
+            try:
+                _LOGGER.info(f"HF MODEL IN USE: {self.dense_model_name}")
+                dense = self._dense_loader(self.dense_model_name)
+                sparse = None
+                if self.sparse_model_name:
+                    sparse = self._sparse_loader(self.sparse_model_name)
+                    _LOGGER.info(f"Sparse model in use: {self.sparse_model_name}")
+            except Exception as e:
+                self._state = MODELS_FAILED
+                self._error = str(e)
+                _LOGGER.error(f"Could not load embedding models: {e}")
+                raise
+            self._dense, self._sparse = dense, sparse
+            self._load_seconds = time.perf_counter() - start
+            self._error = None
+            self._state = MODELS_READY
+            _LOGGER.info(f"Embedding models loaded in {self._load_seconds:.2f}s")
+
+    async def wait_ready(self) -> None:
+        """
+        Load models without blocking the event loop (if they are not loaded yet)
+        """
+        if not self.is_ready:
+            await asyncio.to_thread(self.load)
+
+    def warm_up(self) -> threading.Thread:
+        """
+        Start loading models in a background thread
+        """
+        if self._warm_up_thread is None or not self._warm_up_thread.is_alive():
+            self._warm_up_thread = threading.Thread(
+                target=self._warm_up, name="pephub-model-warm-up", daemon=True
+            )
+            self._warm_up_thread.start()
+        return self._warm_up_thread
+
+    def _warm_up(self) -> None:
+        try:
+            self.load()
+        except Exception:
+            # error is already logged and stored in the status
+            pass
+
+    @property
+    def dense(self) -> "Embedding":
+        self.load()
+        return self._dense
+
+    @property
+    def sparse(self) -> Optional["SparseEncoder"]:
+        self.load()
+        return self._sparse
+
+    def get_cached_query(
+        self, query: str
+    ) -> Optional[Tuple[List[float], Optional[SparseVector]]]:
+        """
+        Get embedding of a normalized query from the cache, None on cache miss.
+        Cache is keyed by model names and the query.
+        """
+        cached = self.query_cache.get(
+            (self.dense_model_name, self.sparse_model_name, query)
+        )
+        if cached is None:
+            return None
+        dense, sparse = cached
+        return dense.tolist(), sparse
+
+    def embed_queries(
+        self, queries: List[str]
+    ) -> List[Tuple[List[float], Optional[SparseVector]]]:
+        """
+        Embed a batch of normalized queries, with one inference call per model (blocking).
+        Results are stored in the cache.
+
+        :param queries: normalized search queries
+        :return: dense vector, and sparse vector (None if sparse model is disabled) of each query
+        """
+        dense_vectors = [
+            np.asarray(vector, dtype=np.float32) for vector in self.dense.embed(queries)
+        ]
+        if self.sparse is not None:
+            sparse_vectors = sparse_vectors_from_tensor(self.sparse.encode(queries))
+        else:
+            sparse_vectors = [None] * len(queries)
+
+        for query, dense, sparse in zip(queries, dense_vectors, sparse_vectors):
+            self.query_cache.set(
+                (self.dense_model_name, self.sparse_model_name, query), (dense, sparse)
+            )
+        return [
+            (dense.tolist(), sparse)
+            for dense, sparse in zip(dense_vectors, sparse_vectors)
+        ]
+
+    def embed_query(self, query: str) -> Tuple[List[float], Optional[SparseVector]]:
+        """
+        Embed search query with dense and sparse models (blocking), using the cache.
+
+        :param query: search query
+        :return: dense vector, and sparse vector (None if sparse model is disabled)
+        """
+        query = normalize_query(query)
+        cached = self.get_cached_query(query)
+        if cached is not None:
+            return cached
+        return self.embed_queries([query])[0]
+
+    def status(self) -> dict:
+        return {
+            "state": self._state,
+            "dense_model": self.dense_model_name,
+            "sparse_model": self.sparse_model_name,
+            "load_seconds": self._load_seconds,
+            "error": self._error,
+        }
+
+
+class EmbeddingBatcher:
+    """
+    Micro-batching scheduler for query embeddings.
+
+    Queries that arrive within `max_wait_ms` of each other are embedded together, with a
+    single batched inference call per model, and the vectors are handed back to each waiting
+    request. Batched inference is much cheaper per text than embedding texts one by one.
+    """
+
+    def __init__(
+        self,
+        models: EmbeddingModels,
+        max_batch_size: int = DEFAULT_EMBEDDING_BATCH_SIZE,
+        max_wait_ms: float = DEFAULT_EMBEDDING_BATCH_WAIT_MS,
+    ):
+        """
+        :param models: embedding models
+        :param max_batch_size: maximum number of queries embedded in one call
+        :param max_wait_ms: how long the first query in a batch waits for others to join
+        """
+        self.models = models
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._batches = 0
+        self._embedded = 0
+        self._batch_size = Histogram([1, 2, 4, 8, 16, 32, 64, 128])
+
+    async def embed(self, query: str) -> Tuple[List[float], Optional[SparseVector]]:
+        """
+        Embed search query, waiting for it to be embedded as part of a batch
+
+        :param query: search query
+        :return: dense vector, and sparse vector (None if sparse model is disabled)
+        """
+        query = normalize_query(query)
+        cached = self.models.get_cached_query(query)
+        if cached is not None:
+            return cached
+
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((query, future))
+        return await future
+
+    def _ensure_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def _collect_batch(self) -> List[Tuple[str, asyncio.Future]]:
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect_batch()
+            # identical queries in one batch are embedded once
+            queries = list(dict.fromkeys(query for query, _ in batch))
+            try:
+                vectors = await run_in_threadpool(self.models.embed_queries, queries)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self._batches += 1
+            self._embedded += len(queries)
+            self._batch_size.observe(len(queries))
+            results = dict(zip(queries, vectors))
+            for query, future in batch:
+                if not future.done():
+                    future.set_result(results[query])
+
+    def stats(self) -> dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self._batches,
+            "embedded_queries": self._embedded,
+            "batch_size": self._batch_size.stats(),
+        }
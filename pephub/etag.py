@@ -0,0 +1,43 @@
+import hashlib
+from typing import Iterable, Optional, Tuple
+
+from pepdbagent.models import AnnotationModel
+
+
+def project_etag(
+    annotation: AnnotationModel,
+    path: str,
+    query: Iterable[Tuple[str, str]] = (),
+) -> str:
+    """
+    Strong ETag of a representation of a project.
+
+    The ETag is derived from the annotation only (digest and update date of the project),
+    so it can be checked without reading the project itself. Path and query parameters
+    are part of the ETag, as every endpoint and format is a different representation.
+
+    :param annotation: project annotation
+    :param path: request path
+    :param query: request query parameters
+    :return: quoted ETag value
+    """
+    parts = [
+        f"{annotation.namespace}/{annotation.name}:{annotation.tag}",
+        annotation.digest or "",
+        annotation.last_update_date or "",
+        path,
+        *[f"{key}={value}" for key, value in sorted(query)],
+    ]
+    return f'"{hashlib.sha256("|".join(parts).encode()).hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Check `If-None-Match` header against the ETag (weak comparison, see RFC 9110)
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return etag in [tag[2:] if tag.startswith("W/") else tag for tag in candidates]
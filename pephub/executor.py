@@ -0,0 +1,416 @@
+import asyncio
+import concurrent.futures
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from .const import (
+    DEFAULT_CPU_EXECUTOR_PROCESSES,
+    DEFAULT_CPU_EXECUTOR_QUEUE,
+    DEFAULT_CPU_TASK_TIMEOUT,
+    DEFAULT_DB_EXECUTOR_THREADS,
+    PKG_NAME,
+)
+from .metrics import Histogram, register_stats
+
+_LOGGER = logging.getLogger(PKG_NAME)
+
+T = TypeVar("T")
+
+
+class DatabaseExecutor:
+    """
+    Bounded thread pool for blocking database (pepdbagent) calls.
+
+    pepdbagent is synchronous, so calling it directly from an `async def` endpoint
+    blocks the event loop for the whole duration of the query. Awaiting `run` instead
+    moves the call to a dedicated pool of threads and keeps the loop free for other
+    requests.
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_DB_EXECUTOR_THREADS):
+        """
+        :param max_workers: maximum number of threads (and concurrent db queries)
+        """
+        self._max_workers = max_workers
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="pephub-db"
+        )
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+        self._peak_active = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._saturated = 0
+        self._wait_time = Histogram([0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5])
+        self._run_time = Histogram([0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30])
+
+    @property
+    def max_workers(self) -> int:
+        return self._max_workers
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        Run a blocking function in the pool, and await its result.
+
+        :param func: blocking function to run
+        :param args: positional arguments of the function
+        :param kwargs: keyword arguments of the function
+        :return: result of the function call
+        """
+        return await asyncio.wrap_future(self.submit(func, *args, **kwargs))
+
+    def submit(
+        self, func: Callable[..., T], *args: Any, **kwargs: Any
+    ) -> concurrent.futures.Future:
+        """
+        Run a blocking function in the pool, without waiting for it (e.g. work that
+        follows a write of a project)
+
+        :param func: blocking function to run
+        :param args: positional arguments of the function
+        :param kwargs: keyword arguments of the function
+        :return: future of the function call
+        """
+        with self._lock:
+            self._submitted += 1
+            self._queued += 1
+            if self._active + self._queued > self._max_workers:
+                self._saturated += 1
+        task = self._executor.submit(
+            self._call, func, time.perf_counter(), args, kwargs
+        )
+        # a call cancelled while queued (e.g. the client disconnected) never starts
+        task.add_done_callback(self._forget_cancelled)
+        return task
+
+    def _forget_cancelled(self, task: concurrent.futures.Future) -> None:
+        if task.cancelled():
+            with self._lock:
+                self._queued -= 1
+
+    def _call(self, func: Callable[..., T], submitted: float, args, kwargs) -> T:
+        started = time.perf_counter()
+        self._wait_time.observe(started - submitted)
+        with self._lock:
+            self._queued -= 1
+            self._active += 1
+            self._peak_active = max(self._peak_active, self._active)
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            with self._lock:
+                self._failed += 1
+            raise
+        finally:
+            self._run_time.observe(time.perf_counter() - started)
+            with self._lock:
+                self._active -= 1
+                self._completed += 1
+
+    def stats(self) -> dict:
+        """
+        Report pool saturation: busy threads, queued calls and wait times
+        """
+        with self._lock:
+            stats = {
+                "max_workers": self._max_workers,
+                "active": self._active,
+                "queued": self._queued,
+                "peak_active": self._peak_active,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "saturated_submissions": self._saturated,
+                "utilization": self._active / self._max_workers,
+            }
+        stats["wait_seconds"] = self._wait_time.stats()
+        stats["run_seconds"] = self._run_time.stats()
+        return stats
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+
+db_executor = DatabaseExecutor(
+    max_workers=int(os.environ.get("DB_EXECUTOR_THREADS", DEFAULT_DB_EXECUTOR_THREADS))
+)
+_LOGGER.info(f"Database executor threads: {db_executor.max_workers}")
+register_stats("db_executor", db_executor.stats)
+
+
+async def run_db(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run a blocking pepdbagent call on the database executor.
+
+    e.g. `await run_db(agent.project.get, namespace, name, tag, raw=True)`
+    """
+    return await db_executor.run(func, *args, **kwargs)
+
+
+class ExecutorBusyError(Exception):
+    """
+    All worker processes are busy, and the queue is full
+    """
+
+
+class ExecutorTimeoutError(Exception):
+    """
+    Task didn't finish in time
+    """
+
+
+class ProcessExecutor:
+    """
+    Managed process pool for CPU-bound work (peppy, eido).
+
+    Processing and converting projects is pure Python, so in a thread it holds the GIL
+    and slows down every other request of the server. Tasks run in worker processes
+    instead, and take and return plain data: projects are handed off as encoded JSON
+    (see `ProjectCache.encode`), never as peppy objects.
+
+    Tasks over `max_workers + max_queue` pending tasks are rejected. Tasks wait in
+    the executor until a worker is free, so that the timeout counts only the time a
+    task runs; a task that waits for a worker longer than its timeout is rejected
+    (the pool is fine, just busy). A task that runs longer than its timeout is
+    abandoned: the pool is replaced by a new one, and the old one is terminated after
+    its other tasks finish. With `max_workers=0`, tasks run in threads (e.g. for
+    development).
+    """
+
+    def __init__(
+        self,
+        max_workers: int = DEFAULT_CPU_EXECUTOR_PROCESSES,
+        max_queue: int = DEFAULT_CPU_EXECUTOR_QUEUE,
+        timeout: float = DEFAULT_CPU_TASK_TIMEOUT,
+    ):
+        """
+        :param max_workers: number of worker processes, 0 to run tasks in threads
+        :param max_queue: maximum number of tasks waiting for a worker
+        :param timeout: default task timeout in seconds
+        """
+        self._max_workers = max_workers
+        self._max_queue = max_queue
+        self._timeout = timeout
+        self._pool: Optional[ProcessPoolExecutor] = None
+        # free workers; a semaphore is bound to an event loop (one in the server)
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._slots_loop: Optional[asyncio.AbstractEventLoop] = None
+        # running tasks of every pool, old pools wait for theirs before termination
+        self._tasks: Dict[concurrent.futures.Future, ProcessPoolExecutor] = {}
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._peak_pending = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._timed_out = 0
+        self._queue_timed_out = 0
+        self._restarts = 0
+        self._run_time = Histogram([0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60])
+
+    @property
+    def max_workers(self) -> int:
+        return self._max_workers
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # spawned workers don't inherit threads and database connections
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self._max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._pool
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._slots_loop is not loop:
+                self._slots = asyncio.Semaphore(self._max_workers)
+                self._slots_loop = loop
+            return self._slots
+
+    async def run(
+        self, func: Callable[..., T], *args: Any, timeout: Optional[float] = None
+    ) -> T:
+        """
+        Run a function in a worker process, and await its result.
+
+        The function must be importable by the worker (defined at module level),
+        and its arguments and result should be plain data.
+
+        :param func: function to run
+        :param args: positional arguments of the function
+        :param timeout: timeout in seconds, defaults to the executor timeout
+        :return: result of the function call
+        :raises ExecutorBusyError: if too many tasks are pending, or the task waits
+            for a worker longer than the timeout
+        :raises ExecutorTimeoutError: if the task doesn't finish in time
+        """
+        with self._lock:
+            if self._pending >= self._max_workers + self._max_queue:
+                self._rejected += 1
+                raise ExecutorBusyError(
+                    f"Too many pending tasks ({self._pending}). Please try again later."
+                )
+            self._pending += 1
+            self._peak_pending = max(self._peak_pending, self._pending)
+            self._submitted += 1
+
+        timeout = timeout if timeout is not None else self._timeout
+        start = time.perf_counter()
+        try:
+            if self._max_workers == 0:
+                future = asyncio.get_running_loop().run_in_executor(None, func, *args)
+                result = await self._wait(future, func, timeout)
+            else:
+                slots = self._get_slots()
+                try:
+                    await asyncio.wait_for(slots.acquire(), timeout)
+                except asyncio.TimeoutError:
+                    with self._lock:
+                        self._queue_timed_out += 1
+                    raise ExecutorBusyError(
+                        f"Task '{func.__name__}' waited for a worker for {timeout} seconds. Please try again later."
+                    )
+                try:
+                    result = await self._run_in_pool(func, args, timeout)
+                finally:
+                    slots.release()
+            with self._lock:
+                self._completed += 1
+            return result
+        except (ExecutorBusyError, ExecutorTimeoutError):
+            raise
+        except Exception:
+            with self._lock:
+                self._failed += 1
+            raise
+        finally:
+            self._run_time.observe(time.perf_counter() - start)
+            with self._lock:
+                self._pending -= 1
+
+    async def _run_in_pool(
+        self, func: Callable[..., T], args: tuple, timeout: float
+    ) -> T:
+        pool = self._get_pool()
+        task = pool.submit(func, *args)
+        with self._lock:
+            self._tasks[task] = pool
+        task.add_done_callback(self._forget)
+        try:
+            return await self._wait(asyncio.wrap_future(task), func, timeout)
+        except ExecutorTimeoutError:
+            self._recycle(pool, task)
+            raise
+        except BrokenProcessPool:
+            # a worker died (e.g. out of memory), the pool can't be used anymore
+            with self._lock:
+                if self._pool is pool:
+                    self._pool = None
+                    self._restarts += 1
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    async def _wait(self, future: Awaitable[T], func: Callable, timeout: float) -> T:
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._timed_out += 1
+            raise ExecutorTimeoutError(
+                f"Task '{func.__name__}' didn't finish in {timeout} seconds"
+            )
+
+    def _forget(self, task: concurrent.futures.Future) -> None:
+        with self._lock:
+            self._tasks.pop(task, None)
+
+    def _recycle(
+        self, pool: ProcessPoolExecutor, stuck: concurrent.futures.Future
+    ) -> None:
+        """
+        Replace the pool of a stuck task, and terminate it in the background
+        """
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+                self._restarts += 1
+            others = [
+                task
+                for task, task_pool in self._tasks.items()
+                if task_pool is pool and task is not stuck
+            ]
+        threading.Thread(
+            target=self._terminate, args=(pool, others), daemon=True
+        ).start()
+
+    def _terminate(self, pool: ProcessPoolExecutor, others: list) -> None:
+        concurrent.futures.wait(others, timeout=self._timeout)
+        pool.shutdown(wait=False, cancel_futures=True)
+        # `ProcessPoolExecutor` can't cancel running tasks, so stop the processes
+        for process in list((getattr(pool, "_processes", None) or {}).values()):
+            process.terminate()
+        _LOGGER.warning("Terminated worker processes of a stuck task")
+
+    def stats(self) -> dict:
+        """
+        Report pool load: pending tasks, rejections, timeouts and task times
+        """
+        with self._lock:
+            capacity = self._max_workers + self._max_queue
+            stats = {
+                "max_workers": self._max_workers,
+                "max_queue": self._max_queue,
+                "timeout": self._timeout,
+                "pending": self._pending,
+                "peak_pending": self._peak_pending,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "timed_out": self._timed_out,
+                "queue_timed_out": self._queue_timed_out,
+                "restarts": self._restarts,
+                "utilization": self._pending / capacity if capacity else 0.0,
+            }
+        stats["run_seconds"] = self._run_time.stats()
+        return stats
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=True)
+
+
+cpu_executor = ProcessExecutor(
+    max_workers=int(
+        os.environ.get("CPU_EXECUTOR_PROCESSES", DEFAULT_CPU_EXECUTOR_PROCESSES)
+    ),
+    max_queue=int(os.environ.get("CPU_EXECUTOR_QUEUE", DEFAULT_CPU_EXECUTOR_QUEUE)),
+    timeout=float(os.environ.get("CPU_TASK_TIMEOUT", DEFAULT_CPU_TASK_TIMEOUT)),
+)
+_LOGGER.info(f"CPU executor processes: {cpu_executor.max_workers}")
+register_stats("cpu_executor", cpu_executor.stats)
+
+
+async def run_cpu(
+    func: Callable[..., T], *args: Any, timeout: Optional[float] = None
+) -> T:
+    """
+    Run CPU-bound work (see `pephub.workers`) on the process executor.
+
+    e.g. `await run_cpu(workers.process_project, ProjectCache.encode(project))`
+    """
+    return await cpu_executor.run(func, *args, timeout=timeout)
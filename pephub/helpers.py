@@ -1,13 +1,15 @@
+import csv
 import io
 import zipfile
 from datetime import date, datetime, timedelta
-from typing import Any, Dict, List, Tuple, Union
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 import jwt
 import pandas as pd
 import yaml
 import json
 from fastapi import Response, UploadFile
+from fastapi.responses import StreamingResponse
 from fastapi.exceptions import HTTPException
 from peppy.const import (
     CFG_SAMPLE_TABLE_KEY,
@@ -17,7 +19,8 @@ from peppy.const import (
     SAMPLE_RAW_DICT_KEY,
     SUBSAMPLE_RAW_LIST_KEY,
 )
-from .const import JWT_EXPIRATION, JWT_SECRET
+from .columnar import COLUMNAR_FORMATS, iter_columnar
+from .const import DEFAULT_EXPORT_CHUNK_SIZE, JWT_EXPIRATION, JWT_SECRET
 
 
 def jwt_encode_user_data(user_data: dict, exp: datetime = None) -> str:
@@ -36,43 +39,55 @@ def jwt_encode_user_data(user_data: dict, exp: datetime = None) -> str:
     return encoded_user_data
 
 
-def zip_pep(project: Dict[str, Any]) -> Response:
+def zip_pep(
+    project: Dict[str, Any], columnar: Optional[str] = None
+) -> StreamingResponse:
     """
-    Zip a project up to download
+    Zip a project up to download. The archive is streamed, and tables are written
+    to it in chunks of rows.
 
     :param project: peppy project to zip
+    :param columnar: also add the tables in a columnar format, "arrow" (IPC stream)
+        or "parquet". The config refers to the CSV tables.
     """
 
-    content_to_zip = {}
+    tables = {}
     config = project[CONFIG_KEY]
     project_name = config[NAME_KEY]
 
     if project[SAMPLE_RAW_DICT_KEY] is not None:
         config[CFG_SAMPLE_TABLE_KEY] = "sample_table.csv"
-        content_to_zip["sample_table.csv"] = pd.DataFrame(
-            project[SAMPLE_RAW_DICT_KEY]
-        ).to_csv(index=False)
+        tables["sample_table"] = project[SAMPLE_RAW_DICT_KEY]
 
     if project[SUBSAMPLE_RAW_LIST_KEY] is not None:
         if not isinstance(project[SUBSAMPLE_RAW_LIST_KEY], list):
             config[CFG_SUBSAMPLE_TABLE_KEY] = ["subsample_table1.csv"]
-            content_to_zip["subsample_table1.csv"] = pd.DataFrame(
+            tables["subsample_table1"] = pd.DataFrame(
                 project[SUBSAMPLE_RAW_LIST_KEY]
-            ).to_csv(index=False)
+            ).to_dict(orient="records")
         else:
             config[CFG_SUBSAMPLE_TABLE_KEY] = []
             for number, file in enumerate(project[SUBSAMPLE_RAW_LIST_KEY]):
-                file_name = f"subsample_table{number + 1}.csv"
-                config[CFG_SUBSAMPLE_TABLE_KEY].append(file_name)
-                content_to_zip[file_name] = pd.DataFrame(file).to_csv(index=False)
+                config[CFG_SUBSAMPLE_TABLE_KEY].append(
+                    f"subsample_table{number + 1}.csv"
+                )
+                tables[f"subsample_table{number + 1}"] = file
 
-    content_to_zip[f"{project_name}_config.yaml"] = yaml.dump(config, indent=4)
+    members = {f"{name}.csv": iter_csv(rows) for name, rows in tables.items()}
+    if columnar:
+        extension = COLUMNAR_FORMATS[columnar][1]
+        for name, rows in tables.items():
+            members[f"{name}.{extension}"] = iter_columnar(rows, columnar)
+
+    members[f"{project_name}_config.yaml"] = [yaml.dump(config, indent=4)]
 
     zip_filename = project_name or f"downloaded_pep_{date.today()}"
-    return zip_conv_result(content_to_zip, filename=zip_filename)
+    return zip_response(members.items(), filename=zip_filename)
 
 
-def zip_conv_result(conv_result: dict, filename: str = "project.zip") -> Response:
+def zip_conv_result(
+    conv_result: dict, filename: str = "project.zip"
+) -> StreamingResponse:
     """
     Given a dictionary of converted results, zip them up and return a response
 
@@ -80,21 +95,98 @@ def zip_conv_result(conv_result: dict, filename: str = "project.zip") -> Respons
     :param filename: name of the zip
     return Response: response object
     """
-    mf = io.BytesIO()
+    return zip_response(
+        ((name, [res]) for name, res in conv_result.items()), filename=filename
+    )
+
 
-    with zipfile.ZipFile(mf, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
-        for name, res in conv_result.items():
-            # Add file, at correct path
-            zf.writestr(name, str.encode(res))
+def zip_response(
+    members: Iterable[Tuple[str, Iterable[Union[str, bytes]]]],
+    filename: str = "project.zip",
+) -> StreamingResponse:
+    """
+    Stream a zip archive
 
-    # Grab ZIP file from in-memory, make response with correct MIME-type
-    resp = Response(
-        mf.getvalue(),
+    :param members: pairs of file name and an iterable of its content parts
+    :param filename: name of the zip
+    """
+    return StreamingResponse(
+        iter_zip(members),
         media_type="application/x-zip-compressed",
         headers={"Content-Disposition": f"attachment;filename={filename}"},
     )
 
-    return resp
+
+class _ZipSink:
+    """
+    Write-only file, that collects bytes written by `ZipFile` until they are drained.
+    `ZipFile` can't seek it, so it writes sizes of members after their data.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_zip(
+    members: Iterable[Tuple[str, Iterable[Union[str, bytes]]]],
+) -> Iterator[bytes]:
+    """
+    Build a zip archive, yielding compressed bytes as members are written, so that
+    the whole archive is never held in memory.
+
+    :param members: pairs of file name and an iterable of its content parts
+    """
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, parts in members:
+            with zf.open(name, mode="w") as member:
+                for part in parts:
+                    member.write(part.encode() if isinstance(part, str) else part)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            yield sink.drain()
+    yield sink.drain()
+
+
+def iter_csv(
+    rows: List[dict], chunk_size: int = DEFAULT_EXPORT_CHUNK_SIZE
+) -> Iterator[str]:
+    """
+    Write a table as CSV in chunks of rows. Columns are all keys of the rows, in order
+    of appearance, and missing values are empty.
+
+    :param rows: table rows
+    :param chunk_size: number of rows in a chunk
+    """
+    columns = {}
+    for row in rows:
+        columns.update(dict.fromkeys(row))
+    columns = list(columns)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(columns)
+    for start in range(0, len(rows), chunk_size):
+        for row in rows[start : start + chunk_size]:
+            writer.writerow([row.get(column) for column in columns])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
 
 
 def download_yaml(content: dict, file_name: str = "unnamed.yaml") -> Response:
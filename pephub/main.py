@@ -1,14 +1,37 @@
 import logging
+import os
+from contextlib import asynccontextmanager
 
 import coloredlogs
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from slowapi.errors import RateLimitExceeded
 
 
 from ._version import __version__ as server_v
-from .const import ALL_VERSIONS, PKG_NAME, TAGS_METADATA
+from .const import (
+    ALL_VERSIONS,
+    DEFAULT_COMPRESSION_MIN_SIZE,
+    PKG_NAME,
+    TAGS_METADATA,
+)
+from .dependencies import (
+    embedding_models,
+    get_async_qdrant,
+    get_qdrant,
+    parse_boolean_env_var,
+)
+from .executor import (
+    ExecutorBusyError,
+    ExecutorTimeoutError,
+    cpu_executor,
+    db_executor,
+)
+from .conversion import filter_registry
+from .schema_cache import schema_cache
 from .limiter import limiter, _custom_rate_limit_exceeded_handler
+from .middleware import CompressionMiddleware
 from .routers.api.v1.base import api as api_base
 from .routers.api.v1.namespace import namespace as api_namespace
 from .routers.api.v1.namespace import namespaces as api_namespaces
@@ -45,6 +68,24 @@ coloredlogs.install(
 )
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # load embedding models in the background, so that the server starts serving
+    # non-search routes right away
+    if get_qdrant() is not None and parse_boolean_env_var(
+        os.environ.get("WARM_UP_MODELS", "true")
+    ):
+        embedding_models.warm_up()
+    if schema_cache.is_stale:
+        schema_cache.refresh_in_background()
+    filter_registry.load()
+    yield
+    if get_async_qdrant() is not None:
+        await get_async_qdrant().close()
+    db_executor.shutdown(wait=False)
+    cpu_executor.shutdown(wait=False)
+
+
 # build server
 app = FastAPI(
     title=PKG_NAME,
@@ -52,6 +93,7 @@ app = FastAPI(
     docs_url="/api/v1/docs",
     version=server_v,
     tags=TAGS_METADATA,
+    lifespan=lifespan,
 )
 
 # import logfire
@@ -67,6 +109,31 @@ app = FastAPI(
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _custom_rate_limit_exceeded_handler)
 
+
+# CPU executor (peppy, eido) is saturated, or a task took too long
+@app.exception_handler(ExecutorBusyError)
+async def executor_busy_handler(request: Request, exc: ExecutorBusyError):
+    return JSONResponse(
+        status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "5"}
+    )
+
+
+@app.exception_handler(ExecutorTimeoutError)
+async def executor_timeout_handler(request: Request, exc: ExecutorTimeoutError):
+    return JSONResponse(
+        status_code=504,
+        content={"detail": f"Processing the project took too long. {exc}"},
+    )
+
+
+# compress large responses (sample tables, history, search results)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(
+        os.environ.get("COMPRESSION_MIN_SIZE", DEFAULT_COMPRESSION_MIN_SIZE)
+    ),
+)
+
 # CORS is required for the validation HTML SPA to work externally
 origins = ["*"]
 app.add_middleware(
@@ -75,6 +142,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 # build routes
@@ -0,0 +1,67 @@
+import threading
+from typing import Callable, Dict, List
+
+_STATS_PROVIDERS: Dict[str, Callable[[], dict]] = {}
+
+
+def register_stats(name: str, provider: Callable[[], dict]) -> None:
+    """
+    Register a callable that reports statistics for a component of the server.
+
+    :param name: name of the component, used as a key in the metrics output
+    :param provider: callable with no arguments, that returns a json serializable dict
+    """
+    _STATS_PROVIDERS[name] = provider
+
+
+def collect_stats() -> Dict[str, dict]:
+    """
+    Collect statistics from all registered components
+    """
+    return {name: provider() for name, provider in _STATS_PROVIDERS.items()}
+
+
+class Histogram:
+    """
+    Thread safe, fixed bucket histogram (in the spirit of a prometheus histogram)
+    """
+
+    def __init__(self, buckets: List[float]):
+        """
+        :param buckets: sorted list of upper bounds of the buckets
+        """
+        self._buckets = sorted(buckets)
+        self._counts = [0] * (len(self._buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        """
+        Record a single observation
+        """
+        with self._lock:
+            self._sum += value
+            self._count += 1
+            for i, bound in enumerate(self._buckets):
+                if value <= bound:
+                    self._counts[i] += 1
+                    return
+            self._counts[-1] += 1
+
+    def stats(self) -> dict:
+        """
+        Return cumulative bucket counts, sum and count of the observations
+        """
+        with self._lock:
+            cumulative = 0
+            buckets = {}
+            for bound, count in zip(self._buckets, self._counts):
+                cumulative += count
+                buckets[str(bound)] = cumulative
+            buckets["+Inf"] = self._count
+            return {
+                "buckets": buckets,
+                "sum": self._sum,
+                "count": self._count,
+            }
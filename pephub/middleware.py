@@ -1,13 +1,26 @@
 import os
+import zlib
 from pathlib import Path
+from typing import Callable, Dict, List, Optional
 
 from fastapi import Request
 from fastapi.responses import FileResponse
 from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import Headers, MutableHeaders
 from starlette.responses import Response
-from starlette.types import Send
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-from .const import SPA_PATH
+from .const import DEFAULT_COMPRESSION_MIN_SIZE, SPA_PATH
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 
 class SPA(BaseHTTPMiddleware):
@@ -60,3 +73,195 @@ class EnvironmentMiddleware(BaseHTTPMiddleware):
             del os.environ[key]
 
         return response
+
+
+class _Compressor:
+    """
+    Streaming compressor with a common interface for all encodings
+    """
+
+    def __init__(self, compress: Callable[[bytes], bytes], flush: Callable[[], bytes]):
+        self.compress = compress
+        self.flush = flush
+
+
+def _gzip() -> _Compressor:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    return _Compressor(compressor.compress, compressor.flush)
+
+
+def _zstd() -> _Compressor:
+    compressor = zstandard.ZstdCompressor(level=3).compressobj()
+    return _Compressor(compressor.compress, compressor.flush)
+
+
+def _brotli() -> _Compressor:
+    compressor = brotli.Compressor(quality=4)
+    return _Compressor(compressor.process, compressor.finish)
+
+
+# supported encodings, in order of preference
+ENCODINGS: Dict[str, Callable[[], _Compressor]] = {
+    **({"zstd": _zstd} if zstandard is not None else {}),
+    **({"br": _brotli} if brotli is not None else {}),
+    "gzip": _gzip,
+}
+
+COMPRESSIBLE_TYPES = [
+    "text/",
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "application/x-yaml",
+    "application/yaml",
+    "image/svg+xml",
+]
+
+
+def negotiate_encoding(
+    accept_encoding: Optional[str], encodings: List[str]
+) -> Optional[str]:
+    """
+    Choose content encoding from `Accept-Encoding` header (RFC 9110). On equal
+    q-values, order of `encodings` decides.
+
+    :param accept_encoding: value of `Accept-Encoding` header
+    :param encodings: supported encodings, in order of preference
+    :return: chosen encoding, None for no compression
+    """
+    if not accept_encoding:
+        return None
+    accepted: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding.strip().lower()] = q
+
+    best, best_q = None, 0.0
+    for encoding in encodings:
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def is_compressible(content_type: Optional[str]) -> bool:
+    if not content_type:
+        return False
+    content_type = content_type.split(";")[0].strip().lower()
+    return content_type.endswith("+json") or any(
+        content_type.startswith(t) for t in COMPRESSIBLE_TYPES
+    )
+
+
+class CompressionMiddleware:
+    """
+    Pure ASGI middleware, that compresses responses with gzip (or zstd and brotli, if
+    installed), negotiated by `Accept-Encoding`.
+
+    Bodies are compressed as they are streamed, they are never buffered whole. Only
+    compressible media types are compressed (so zip files are not), and responses
+    smaller than `minimum_size` are sent as they are. Strong ETags of compressed
+    responses are made weak, as the bytes differ from the uncompressed representation.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = DEFAULT_COMPRESSION_MIN_SIZE,
+        encodings: Optional[List[str]] = None,
+    ):
+        """
+        :param app: ASGI application
+        :param minimum_size: minimum size of the body (in bytes) to compress
+        :param encodings: encodings to offer, in order of preference (default: all
+            supported)
+        """
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encodings = [e for e in (encodings or ENCODINGS) if e in ENCODINGS]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(
+            Headers(scope=scope).get("Accept-Encoding"), self.encodings
+        )
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressedResponder(self, encoding, send).run(scope, receive)
+
+
+class _CompressedResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+        self.start_message: Optional[Message] = None
+        # None until the first body message decides, then True/False
+        self.compressing: Optional[bool] = None
+        self.compressor: Optional[_Compressor] = None
+
+    async def run(self, scope: Scope, receive: Receive) -> None:
+        await self.middleware.app(scope, receive, self.send_wrapper)
+
+    async def send_wrapper(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            length = headers.get("Content-Length")
+            if (
+                "Content-Encoding" in headers
+                or not is_compressible(headers.get("Content-Type"))
+                or message["status"] in (204, 304)
+                or (length is not None and int(length) < self.middleware.minimum_size)
+            ):
+                self.compressing = False
+                await self.send(message)
+            else:
+                # decided on the first body message
+                self.start_message = message
+            return
+
+        if message["type"] != "http.response.body" or self.compressing is False:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.compressing is None:
+            if not more_body and len(body) < self.middleware.minimum_size:
+                self.compressing = False
+                await self.send(self.start_message)
+                await self.send(message)
+                return
+            self.compressing = True
+            self.compressor = ENCODINGS[self.encoding]()
+            await self.send(self._compressed_start(self.start_message))
+
+        chunk = self.compressor.compress(body)
+        if not more_body:
+            chunk += self.compressor.flush()
+        if chunk or not more_body:
+            await self.send(
+                {"type": "http.response.body", "body": chunk, "more_body": more_body}
+            )
+
+    def _compressed_start(self, message: Message) -> Message:
+        headers = MutableHeaders(raw=list(message["headers"]))
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        if "Content-Length" in headers:
+            del headers["Content-Length"]
+        etag = headers.get("ETag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+        return {**message, "headers": headers.raw}
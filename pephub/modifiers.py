@@ -0,0 +1,323 @@
+import glob
+import os
+from collections.abc import Mapping
+from string import Formatter
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from peppy.const import (
+    APPEND_KEY,
+    DERIVED_ATTRS_KEY,
+    DERIVED_KEY,
+    DERIVED_SOURCES_KEY,
+    DUPLICATED_KEY,
+    IMPLIED_IF_KEY,
+    IMPLIED_KEY,
+    IMPLIED_THEN_KEY,
+    REMOVE_KEY,
+    SAMPLE_MODS_KEY,
+    SAMPLE_NAME_ATTR,
+    SAMPLE_TABLE_INDEX_KEY,
+)
+
+
+class Unsupported(Exception):
+    """
+    Samples or config need peppy itself (e.g. to raise its errors)
+    """
+
+
+class SampleColumns:
+    """
+    Sample table as columns of values. Columns of the raw table are set for every
+    sample; columns set by `imply` only for some of them, so every column has a mask
+    of the samples that have it (None if all do).
+    """
+
+    def __init__(self, table: pd.DataFrame):
+        self.size = len(table)
+        self.values: Dict[str, np.ndarray] = {
+            column: table[column].to_numpy(dtype=object, copy=True)
+            for column in table.columns
+        }
+        self.present: Dict[str, Optional[np.ndarray]] = dict.fromkeys(self.values)
+
+    def __contains__(self, column: str) -> bool:
+        return column in self.values
+
+    def mask(self, column: str) -> np.ndarray:
+        """
+        Samples that have the column
+        """
+        if column not in self.values:
+            return np.zeros(self.size, dtype=bool)
+        present = self.present[column]
+        return np.ones(self.size, dtype=bool) if present is None else present
+
+    def set(self, column: str, value: Any, where: Optional[np.ndarray] = None) -> None:
+        """
+        Set column to a constant, or to an array of values, for the masked samples
+        """
+        if where is None:
+            values = np.empty(self.size, dtype=object)
+            if isinstance(value, np.ndarray):
+                values[:] = value
+            else:
+                values.fill(value)
+            self.values[column] = values
+            self.present[column] = None
+            return
+        if column not in self.values:
+            self.values[column] = np.empty(self.size, dtype=object)
+            self.present[column] = np.zeros(self.size, dtype=bool)
+        if isinstance(value, np.ndarray):
+            self.values[column][where] = value[where]
+        else:
+            self.values[column][np.flatnonzero(where)] = [value] * int(where.sum())
+        if self.present[column] is not None:
+            self.present[column] = self.present[column] | where
+            if self.present[column].all():
+                self.present[column] = None
+
+    def drop(self, column: str) -> None:
+        self.values.pop(column, None)
+        self.present.pop(column, None)
+
+    def to_records(self) -> List[dict]:
+        """
+        Samples as `peppy.Sample.to_dict` serializes them
+        """
+        columns = [column for column in self.values if not column.startswith("_")]
+        values = [
+            [_to_plain(value) for value in self.values[column]] for column in columns
+        ]
+        masks = [self.present[column] for column in columns]
+        records = []
+        for i in range(self.size):
+            records.append(
+                {
+                    column: values[c][i]
+                    for c, column in enumerate(columns)
+                    if masks[c] is None or masks[c][i]
+                }
+            )
+        return records
+
+
+def _to_plain(value: Any) -> Any:
+    # the same conversion as `peppy.Sample.to_dict`
+    if isinstance(value, list):
+        return [_to_plain(v) for v in value]
+    if isinstance(value, Mapping):
+        return {k: _to_plain(v) for k, v in value.items() if not k.startswith("_")}
+    if isinstance(value, set):
+        return [_to_plain(v) for v in value]
+    if hasattr(value, "dtype"):
+        return value.item()
+    if pd.isnull(value):
+        return None
+    return value
+
+
+def _remove(columns: SampleColumns, to_remove) -> None:
+    if not isinstance(to_remove, (list, str)):
+        raise Unsupported()
+    for attr in to_remove:
+        columns.drop(attr)
+
+
+def _append(columns: SampleColumns, to_append: dict) -> None:
+    if not isinstance(to_append, dict):
+        raise Unsupported()
+    for attr, value in to_append.items():
+        # raw columns are set for all samples
+        if attr not in columns:
+            columns.set(attr, value)
+
+
+def _duplicate(columns: SampleColumns, synonyms: dict) -> None:
+    if not isinstance(synonyms, dict):
+        raise Unsupported()
+    for attr, new in synonyms.items():
+        if attr in columns:
+            columns.set(new, columns.values[attr].copy(), columns.present[attr])
+
+
+def _isin(values: np.ndarray, options: Any) -> np.ndarray:
+    if isinstance(options, str):
+        # peppy checks for a substring
+        if not all(isinstance(value, str) for value in values):
+            raise Unsupported()
+        return np.fromiter((value in options for value in values), dtype=bool)
+    if not isinstance(options, list):
+        raise Unsupported()
+    try:
+        return pd.Series(values, dtype=object).isin(options).to_numpy()
+    except TypeError:
+        # unhashable values
+        return np.fromiter((value in options for value in values), dtype=bool)
+
+
+def _imply(columns: SampleColumns, implications: list) -> None:
+    if not isinstance(implications, list):
+        raise Unsupported()
+    for implication in implications:
+        if not (
+            isinstance(implication, dict)
+            and isinstance(implication.get(IMPLIED_IF_KEY), dict)
+            and isinstance(implication.get(IMPLIED_THEN_KEY), dict)
+        ):
+            raise Unsupported()
+        matches = np.ones(columns.size, dtype=bool)
+        for attr, options in implication[IMPLIED_IF_KEY].items():
+            present = columns.mask(attr)
+            matches &= present
+            if present.any():
+                matches[present] &= _isin(columns.values[attr][present], options)
+        if matches.any():
+            for attr, value in implication[IMPLIED_THEN_KEY].items():
+                columns.set(attr, value, matches)
+
+
+def _parse_source(source: str) -> Optional[list]:
+    """
+    Parse derived attribute source into literal text and attribute names, None if it
+    can't be formatted (peppy doesn't set the attribute then)
+    """
+    try:
+        parts = list(Formatter().parse(source))
+    except ValueError:
+        return None
+    for _, field, format_spec, conversion in parts:
+        if field is not None and (
+            not field.isidentifier()
+            or field.startswith("_")
+            or format_spec
+            or conversion
+        ):
+            raise Unsupported()
+    return parts
+
+
+def _glob(path: str) -> Any:
+    if "*" in path or "[" in path:
+        paths = sorted(glob.glob(path))
+        if paths:
+            return paths if len(paths) > 1 else paths[0]
+    return path
+
+
+def _derive(columns: SampleColumns, attr: str, sources: dict) -> None:
+    if attr not in columns:
+        return
+    samples = columns.mask(attr)
+    if not sources:
+        return
+    if not isinstance(sources, dict):
+        raise Unsupported()
+    keys = columns.values[attr]
+    derived = np.empty(columns.size, dtype=object)
+    derived.fill("")
+    try:
+        unique_keys = pd.unique(pd.Series(keys[samples], dtype=object))
+    except TypeError:
+        raise Unsupported()
+    for key in unique_keys:
+        source = sources.get(key)
+        if source is None:
+            continue
+        if not isinstance(source, str):
+            raise Unsupported()
+        source = os.path.expandvars(source)
+        parts = _parse_source(source)
+        rows = samples & (keys == key)
+        if parts is None:
+            continue
+        if all(field is None for _, field, _, _ in parts):
+            # peppy doesn't format sources without attributes
+            derived[rows] = _glob(source)
+            continue
+        text = pd.Series("", index=np.flatnonzero(rows), dtype=object)
+        for literal, field, _, _ in parts:
+            text = text + literal
+            if field is None:
+                continue
+            if field in columns:
+                values = columns.values[field][rows]
+                if any(isinstance(value, list) for value in values):
+                    # formatted for every element
+                    raise Unsupported()
+                has_field = columns.mask(field)[rows]
+                text = text + np.where(
+                    has_field, [str(v) for v in values], "{" + field + "}"
+                )
+            else:
+                text = text + ("{" + field + "}")
+        derived[rows] = [_glob(path) for path in text]
+    # empty values are not set
+    update = samples & np.fromiter((bool(v) for v in derived), dtype=bool)
+    columns.set(attr, derived, update)
+
+
+def apply_sample_modifiers(config: dict, samples: List[dict]) -> List[dict]:
+    """
+    Process samples of a project without subsample tables, like
+    `[s.to_dict() for s in peppy.Project.from_dict(...).samples]`.
+
+    Sample modifiers (remove, append, duplicate, imply, derive) are applied to whole
+    columns of the sample table, instead of to every `peppy.Sample`.
+
+    :param config: project config
+    :param samples: raw samples
+    :return: processed samples
+    :raises Unsupported: if the samples have to be processed by peppy
+    """
+    table = pd.DataFrame(samples).replace(np.nan, "")
+    if len(table) and all(
+        pd.api.types.is_numeric_dtype(dtype) or pd.api.types.is_bool_dtype(dtype)
+        for dtype in table.dtypes
+    ):
+        # peppy's rows of numeric tables have one dtype
+        raise Unsupported()
+    columns = SampleColumns(table)
+
+    modifiers = config.get(SAMPLE_MODS_KEY, {})
+    if not isinstance(modifiers, dict):
+        raise Unsupported()
+    if REMOVE_KEY in modifiers:
+        _remove(columns, modifiers[REMOVE_KEY])
+    if APPEND_KEY in modifiers:
+        _append(columns, modifiers[APPEND_KEY])
+    if DUPLICATED_KEY in modifiers:
+        _duplicate(columns, modifiers[DUPLICATED_KEY])
+    if IMPLIED_KEY in modifiers:
+        _imply(columns, modifiers[IMPLIED_KEY])
+
+    derivations, sources = [], {}
+    if DERIVED_KEY in modifiers:
+        try:
+            attrs = modifiers[DERIVED_KEY][DERIVED_ATTRS_KEY]
+            sources = modifiers[DERIVED_KEY][DERIVED_SOURCES_KEY]
+        except (KeyError, TypeError):
+            raise Unsupported()
+        derivations = list(dict.fromkeys(attrs if isinstance(attrs, list) else [attrs]))
+        if SAMPLE_NAME_ATTR in attrs:
+            # names are derived before duplicated names are merged
+            derivations.remove(SAMPLE_NAME_ATTR)
+            _derive(columns, SAMPLE_NAME_ATTR, sources)
+
+    index = config.get(SAMPLE_TABLE_INDEX_KEY, SAMPLE_NAME_ATTR)
+    if columns.size and not columns.mask(index).all():
+        raise Unsupported()
+    if columns.size:
+        try:
+            if pd.Series(columns.values[index], dtype=object).duplicated().any():
+                # merged by peppy
+                raise Unsupported()
+        except TypeError:
+            raise Unsupported()
+
+    for attr in derivations:
+        _derive(columns, attr, sources)
+    return columns.to_records()
@@ -0,0 +1,240 @@
+import json
+from typing import (
+    AsyncGenerator,
+    AsyncIterator,
+    Callable,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+)
+
+from peppy.const import (
+    MAX_PROJECT_SAMPLES_REPR,
+    SAMPLE_NAME_ATTR,
+    SAMPLE_TABLE_INDEX_KEY,
+)
+
+from . import workers
+from .cache import ProjectCache
+from .const import DEFAULT_EXPORT_CHUNK_SIZE
+from .executor import run_cpu
+from .samples import (
+    SampleTableProfile,
+    SubsampleTable,
+    group_subsamples,
+    sample_name,
+)
+
+# function that starts a new pass over raw samples, in chunks
+ChunkReader = Callable[[], AsyncIterator[List[dict]]]
+
+
+class SampleTableContext(NamedTuple):
+    # everything that processing of any subset of samples depends on
+    config: dict
+    subsamples: List[SubsampleTable]
+    profile: SampleTableProfile
+
+
+async def iter_list_chunks(
+    samples: List[dict], chunk_size: int = DEFAULT_EXPORT_CHUNK_SIZE
+) -> AsyncIterator[List[dict]]:
+    for start in range(0, len(samples), chunk_size):
+        yield samples[start : start + chunk_size]
+
+
+async def profile_samples(
+    read_chunks: ChunkReader, config: dict, subsamples: Optional[List[List[dict]]]
+) -> SampleTableProfile:
+    """
+    First pass over raw samples, see `SampleTableProfile`
+
+    :raises ValueError: if samples can't be processed
+    """
+    profile = SampleTableProfile(config.get(SAMPLE_TABLE_INDEX_KEY, SAMPLE_NAME_ATTR))
+    async for chunk in read_chunks():
+        profile.update(chunk)
+    if profile.duplicated_names and subsamples:
+        raise ValueError(
+            f"Duplicated sample names found and subsample tables are specified: "
+            f"{sorted(profile.duplicated_names)[:MAX_PROJECT_SAMPLES_REPR]}"
+        )
+    return profile
+
+
+async def process_chunk(
+    samples: List[dict],
+    config: dict,
+    subsamples: List[SubsampleTable],
+    profile: SampleTableProfile,
+) -> List[dict]:
+    """
+    Process a chunk of samples in the CPU executor, like they are processed in the
+    whole project
+
+    :param samples: raw samples
+    :param config: project config
+    :param subsamples: subsample tables of the project, see `samples.group_subsamples`
+    :param profile: profile of the sample table, see `profile_samples`
+    """
+    names = dict.fromkeys(sample_name(sample, profile.index) for sample in samples)
+    project = {
+        "config": config,
+        "samples": samples,
+        "subsamples": [
+            [row for name in names for row in table.rows.get(name, [])]
+            for table in subsamples
+        ],
+        "columns": profile.columns,
+        "float_columns": profile.float_columns,
+        "object_columns": profile.object_columns,
+        "subsample_columns": [
+            [table.columns, table.object_columns] for table in subsamples
+        ],
+    }
+    return await run_cpu(workers.process_samples, ProjectCache.encode(project))
+
+
+async def iter_processed_samples(
+    read_chunks: ChunkReader,
+    config: dict,
+    subsamples: Optional[List[List[dict]]],
+    profile: SampleTableProfile,
+) -> AsyncIterator[List[dict]]:
+    """
+    Process samples with peppy in chunks, in the CPU executor, so that only one chunk
+    of samples is held in memory at a time (second pass over raw samples).
+
+    The result is the same as of processing the whole project: samples (and subsample
+    rows) get their values and column types in the whole table, and samples with
+    duplicated names are kept aside and merged together at the end, like peppy does.
+
+    :param read_chunks: function that starts a pass over raw samples
+    :param config: project config
+    :param subsamples: subsample tables of the project
+    :param profile: profile of the sample table, see `profile_samples`
+    """
+    index = profile.index
+    grouped = group_subsamples(subsamples, index)
+    duplicated = []
+    async for chunk in read_chunks():
+        if profile.duplicated_names:
+            duplicated.extend(
+                s for s in chunk if sample_name(s, index) in profile.duplicated_names
+            )
+            chunk = [
+                s
+                for s in chunk
+                if sample_name(s, index) not in profile.duplicated_names
+            ]
+        if chunk:
+            yield await process_chunk(chunk, config, grouped, profile)
+    if duplicated:
+        yield await process_chunk(duplicated, config, grouped, profile)
+
+
+async def sample_table_context(
+    read_chunks: ChunkReader,
+    config: dict,
+    subsamples: Optional[List[List[dict]]],
+) -> SampleTableContext:
+    """
+    Profile the sample table (all raw samples are read once), and group subsample
+    rows by sample. The context changes only when the project is written, so it can
+    be cached for pages of the project.
+
+    :param read_chunks: function that starts a pass over all raw samples
+    :param config: project config
+    :param subsamples: subsample tables of the project
+    :raises ValueError: if samples can't be processed
+    """
+    profile = await profile_samples(read_chunks, config, subsamples)
+    grouped = group_subsamples(subsamples, profile.index)
+    return SampleTableContext(config, grouped, profile)
+
+
+async def process_page(samples: List[dict], context: SampleTableContext) -> List[dict]:
+    """
+    Process a page of samples like they are processed in the whole project (see
+    `iter_processed_samples`)
+
+    :param samples: raw samples of the page
+    :param context: context of the sample table, see `sample_table_context`
+    """
+    return await process_chunk(
+        samples, context.config, context.subsamples, context.profile
+    )
+
+
+async def process_first_chunk(
+    chunks: AsyncGenerator[List[dict], None],
+) -> AsyncGenerator[List[dict], None]:
+    """
+    Process the first chunk of samples before a response is started, so that errors
+    (e.g. of an invalid config, or of a busy executor) get their status code, instead
+    of cutting a streamed response short.
+
+    :param chunks: processed samples, see `iter_processed_samples`
+    :return: the same chunks, the first one already processed
+    """
+    try:
+        first = await chunks.__anext__()
+    except StopAsyncIteration:
+        first = None
+    return _prepend_chunk(first, chunks)
+
+
+async def _prepend_chunk(
+    first: Optional[List[dict]], chunks: AsyncIterator[List[dict]]
+) -> AsyncGenerator[List[dict], None]:
+    if first is not None:
+        yield first
+    async for chunk in chunks:
+        yield chunk
+
+
+def _json_default(value):
+    # numpy scalars
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+async def stream_json_samples(
+    chunks: AsyncIterator[List[dict]], prefix: str = "[", suffix: str = "]"
+) -> AsyncIterator[str]:
+    """
+    Stream samples as a JSON array, chunk by chunk
+    """
+    yield prefix
+    separator = ""
+    async for chunk in chunks:
+        if chunk:
+            yield separator + ",".join(
+                json.dumps(sample, default=_json_default) for sample in chunk
+            )
+            separator = ","
+    yield suffix
+
+
+async def describe_samples(
+    chunks: AsyncGenerator[List[dict], None],
+    config: dict,
+    profile: SampleTableProfile,
+) -> Dict[str, str]:
+    """
+    Result of the eido `basic` filter. Only the first processed samples are needed.
+    """
+    names = []
+    try:
+        async for chunk in chunks:
+            names.extend(sample_name(sample, profile.index) for sample in chunk)
+            if len(names) > MAX_PROJECT_SAMPLES_REPR:
+                break
+    finally:
+        await chunks.aclose()
+    names = names[: MAX_PROJECT_SAMPLES_REPR + 1]
+    return await run_cpu(
+        workers.describe_project, config, names, profile.processed_count
+    )
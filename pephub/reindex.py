@@ -0,0 +1,357 @@
+import json
+import logging
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+from pepdbagent import PEPDatabaseAgent
+from pepdbagent.models import AnnotationModel
+from qdrant_client import QdrantClient
+from qdrant_client.models import (
+    Distance,
+    PayloadSchemaType,
+    PointStruct,
+    SparseVector,
+    SparseVectorParams,
+    VectorParams,
+)
+
+from .const import (
+    DEFAULT_REINDEX_CHECKPOINT_PATH,
+    DEFAULT_REINDEX_ENCODE_BATCH_SIZE,
+    DEFAULT_REINDEX_PAGE_SIZE,
+    DEFAULT_REINDEX_UPSERT_BATCH_SIZE,
+    PKG_NAME,
+)
+from .embeddings import load_dense_model, load_sparse_model, sparse_vectors_from_tensor
+
+_LOGGER = logging.getLogger(PKG_NAME)
+
+Embedding = Tuple[List[float], Optional[SparseVector]]
+
+# models of the encoder process, loaded once per process
+_worker_models: Optional[Tuple[Any, Any]] = None
+
+
+def build_text(annotation: AnnotationModel) -> str:
+    """
+    Text of the project, that is embedded for semantic search
+    """
+    return f"{annotation.name}. {annotation.description or ''}".strip()
+
+
+def registry_path(annotation: AnnotationModel) -> str:
+    return f"{annotation.namespace}/{annotation.name}:{annotation.tag}"
+
+
+def point_id(registry: str) -> str:
+    """
+    Stable qdrant point id of the project, so that re-indexing overwrites the old point
+    """
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, registry))
+
+
+def _load_worker_models(
+    dense_model_name: str,
+    sparse_model_name: Optional[str],
+    dense_loader: Callable[[str], Any],
+    sparse_loader: Callable[[str], Any],
+) -> None:
+    global _worker_models
+    _worker_models = (
+        dense_loader(dense_model_name),
+        sparse_loader(sparse_model_name) if sparse_model_name else None,
+    )
+
+
+def _encode(texts: List[str]) -> List[Embedding]:
+    dense_model, sparse_model = _worker_models
+    dense = [
+        np.asarray(vector, dtype=np.float32).tolist()
+        for vector in dense_model.embed(texts)
+    ]
+    if sparse_model is not None:
+        sparse = sparse_vectors_from_tensor(sparse_model.encode(texts))
+    else:
+        sparse = [None] * len(texts)
+    return list(zip(dense, sparse))
+
+
+class BatchEncoder:
+    """
+    Encodes batches of texts with dense and sparse models, in a pool of processes.
+
+    Every process loads its own copy of the models once. With `workers=0` texts are
+    encoded in the calling process.
+    """
+
+    def __init__(
+        self,
+        dense_model_name: str,
+        sparse_model_name: Optional[str],
+        workers: int = 1,
+        dense_loader: Callable[[str], Any] = load_dense_model,
+        sparse_loader: Callable[[str], Any] = load_sparse_model,
+    ):
+        """
+        :param dense_model_name: name of the dense (fastembed) model
+        :param sparse_model_name: name of the sparse model, None to disable sparse vectors
+        :param workers: number of encoder processes
+        :param dense_loader: function that loads dense model by name
+        :param sparse_loader: function that loads sparse model by name
+        """
+        model_args = (dense_model_name, sparse_model_name, dense_loader, sparse_loader)
+        if workers > 0:
+            self._pool = ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_load_worker_models,
+                initargs=model_args,
+            )
+        else:
+            self._pool = None
+            _load_worker_models(*model_args)
+
+    def map(self, batches: Iterable[List[str]]) -> Iterator[List[Embedding]]:
+        """
+        Encode batches of texts, results are returned in order of the batches
+        """
+        if self._pool is None:
+            return map(_encode, batches)
+        return self._pool.map(_encode, batches)
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+
+
+def load_checkpoint(path: str) -> Tuple[Optional[str], Set[str]]:
+    """
+    Get `last_update_date` of the newest indexed project (None if nothing was indexed
+    yet), and registry paths of the indexed projects updated at that time
+    """
+    try:
+        with open(path) as f:
+            checkpoint = json.load(f)
+    except FileNotFoundError:
+        return None, set()
+    return checkpoint["last_update_date"], set(checkpoint.get("registries", []))
+
+
+def save_checkpoint(
+    path: str, last_update_date: str, registries: Iterable[str] = ()
+) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(
+            {"last_update_date": last_update_date, "registries": sorted(registries)}, f
+        )
+    os.replace(tmp_path, path)
+
+
+def _parse_date(date: str) -> datetime:
+    return datetime.fromisoformat(date)
+
+
+def iter_annotations(
+    agent: PEPDatabaseAgent,
+    page_size: int,
+    updated_after: Optional[str] = None,
+    indexed: Set[str] = frozenset(),
+) -> Iterator[List[AnnotationModel]]:
+    """
+    Read annotations of public projects in pages, oldest update first.
+
+    :param agent: pepdbagent connection
+    :param page_size: number of annotations in a page
+    :param updated_after: only return projects updated at or after this date
+    :param indexed: registry paths of projects updated at `updated_after`, that are
+        skipped (already indexed)
+    """
+    date_filter = {}
+    if updated_after:
+        # date filter of pepdbagent has a resolution of a day
+        date_filter = dict(
+            filter_by="last_update_date",
+            filter_start_date=_parse_date(updated_after).strftime("%Y/%m/%d"),
+        )
+
+    offset = 0
+    while True:
+        page = agent.annotation.get(
+            limit=page_size,
+            offset=offset,
+            order_by="update_date",
+            order_desc=False,
+            **date_filter,
+        ).results
+        if not page:
+            return
+        if updated_after:
+            # other projects may share the date of the last indexed one
+            after = _parse_date(updated_after)
+            page = [
+                annotation
+                for annotation in page
+                if _parse_date(annotation.last_update_date) > after
+                or (
+                    _parse_date(annotation.last_update_date) == after
+                    and registry_path(annotation) not in indexed
+                )
+            ]
+        if page:
+            yield page
+        offset += page_size
+
+
+def ensure_collection(
+    qdrant: QdrantClient, collection: str, dense_size: int, sparse: bool
+) -> None:
+    """
+    Create the search collection, if it doesn't exist
+    """
+    if qdrant.collection_exists(collection):
+        return
+    qdrant.create_collection(
+        collection_name=collection,
+        vectors_config={
+            "dense": VectorParams(size=dense_size, distance=Distance.COSINE)
+        },
+        sparse_vectors_config={"sparse": SparseVectorParams()} if sparse else None,
+    )
+    # exact name match prefetch of the search endpoint filters by name
+    qdrant.create_payload_index(
+        collection, field_name="name", field_schema=PayloadSchemaType.KEYWORD
+    )
+    _LOGGER.info(f"Created qdrant collection '{collection}'")
+
+
+def build_point(annotation: AnnotationModel, embedding: Embedding) -> PointStruct:
+    dense, sparse = embedding
+    registry = registry_path(annotation)
+    vector = {"dense": dense}
+    if sparse is not None:
+        vector["sparse"] = sparse
+    return PointStruct(
+        id=point_id(registry),
+        vector=vector,
+        payload={
+            "namespace": annotation.namespace,
+            "name": annotation.name,
+            "tag": annotation.tag,
+            "description": annotation.description,
+            "registry": registry,
+            "last_update_date": annotation.last_update_date,
+        },
+    )
+
+
+def delete_stale_points(qdrant: QdrantClient, collection: str, indexed_ids: set) -> int:
+    """
+    Delete points of projects that were not indexed (deleted, or made private)
+    """
+    stale = []
+    offset = None
+    while True:
+        points, offset = qdrant.scroll(
+            collection, limit=10_000, offset=offset, with_payload=False
+        )
+        stale.extend(p.id for p in points if str(p.id) not in indexed_ids)
+        if offset is None:
+            break
+    if stale:
+        qdrant.delete(collection, points_selector=stale)
+    return len(stale)
+
+
+def reindex(
+    agent: PEPDatabaseAgent,
+    qdrant: QdrantClient,
+    encoder: BatchEncoder,
+    collection: str,
+    checkpoint_path: str = DEFAULT_REINDEX_CHECKPOINT_PATH,
+    full: bool = False,
+    page_size: int = DEFAULT_REINDEX_PAGE_SIZE,
+    encode_batch_size: int = DEFAULT_REINDEX_ENCODE_BATCH_SIZE,
+    upsert_batch_size: int = DEFAULT_REINDEX_UPSERT_BATCH_SIZE,
+) -> dict:
+    """
+    Embed projects and upsert them to the qdrant search collection.
+
+    Incremental runs only embed projects updated after the checkpoint. The checkpoint
+    (`last_update_date` of the newest indexed project, and the projects indexed with
+    that date) is saved after every upsert, so an interrupted run continues where it
+    stopped. Full runs embed all projects, and delete points of projects that no
+    longer exist.
+
+    :param agent: pepdbagent connection
+    :param qdrant: qdrant client
+    :param encoder: encoder of project texts
+    :param collection: name of qdrant collection
+    :param checkpoint_path: path to the checkpoint file
+    :param full: ignore the checkpoint, and re-embed all projects
+    :param page_size: number of annotations read from the database at once
+    :param encode_batch_size: number of texts encoded at once by an encoder process
+    :param upsert_batch_size: number of points upserted to qdrant at once
+    :return: number of indexed and deleted projects
+    """
+    updated_after, indexed_at_checkpoint = (
+        (None, set()) if full else load_checkpoint(checkpoint_path)
+    )
+    if updated_after:
+        _LOGGER.info(f"Indexing projects updated after {updated_after}")
+
+    indexed_ids = set()
+    pending: List[PointStruct] = []
+    newest = updated_after
+    collection_ready = False
+    checkpoint_date, checkpoint_registries = updated_after, set(indexed_at_checkpoint)
+
+    def upsert(points: List[PointStruct]) -> None:
+        nonlocal collection_ready, checkpoint_date, checkpoint_registries
+        if not collection_ready:
+            ensure_collection(
+                qdrant,
+                collection,
+                dense_size=len(points[0].vector["dense"]),
+                sparse="sparse" in points[0].vector,
+            )
+            collection_ready = True
+        qdrant.upsert(collection, points=points, wait=True)
+        # projects are read oldest first, so everything up to here is indexed
+        for point in points:
+            if point.payload["last_update_date"] != checkpoint_date:
+                checkpoint_date = point.payload["last_update_date"]
+                checkpoint_registries = set()
+            checkpoint_registries.add(point.payload["registry"])
+        save_checkpoint(checkpoint_path, checkpoint_date, checkpoint_registries)
+
+    for page in iter_annotations(
+        agent, page_size, updated_after, indexed_at_checkpoint
+    ):
+        batches = [
+            [build_text(a) for a in page[i : i + encode_batch_size]]
+            for i in range(0, len(page), encode_batch_size)
+        ]
+        embeddings = [e for batch in encoder.map(batches) for e in batch]
+        for annotation, embedding in zip(page, embeddings):
+            point = build_point(annotation, embedding)
+            indexed_ids.add(point.id)
+            pending.append(point)
+            newest = annotation.last_update_date
+        while len(pending) >= upsert_batch_size:
+            upsert(pending[:upsert_batch_size])
+            pending = pending[upsert_batch_size:]
+        _LOGGER.info(f"Indexed {len(indexed_ids)} projects (up to {newest})")
+
+    if pending:
+        upsert(pending)
+
+    deleted = 0
+    if full and qdrant.collection_exists(collection):
+        deleted = delete_stale_points(qdrant, collection, indexed_ids)
+
+    return {"indexed": len(indexed_ids), "deleted": deleted, "checkpoint": newest}
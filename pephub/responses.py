@@ -0,0 +1,64 @@
+import json
+from typing import Any, Dict, List, Optional
+
+from fastapi.responses import JSONResponse
+from peppy.const import CONFIG_KEY, SAMPLE_RAW_DICT_KEY, SUBSAMPLE_RAW_LIST_KEY
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response for content that is already trusted (read from the database), so it
+    doesn't have to be validated against a response model. Encoded with orjson, if it
+    is installed.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(
+                content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+            )
+        return json.dumps(
+            content, ensure_ascii=False, separators=(",", ":"), default=str
+        ).encode("utf-8")
+
+
+def raw_project_content(project: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Raw project in the shape of `ProjectRawRequest` (`ProjectRawModel` by field name)
+    """
+    return {
+        "config": project[CONFIG_KEY],
+        "subsample_list": project.get(SUBSAMPLE_RAW_LIST_KEY),
+        "sample_list": project[SAMPLE_RAW_DICT_KEY],
+    }
+
+
+def samples_content(
+    samples: List[dict],
+    total: Optional[int] = None,
+    limit: Optional[int] = None,
+    offset: Optional[int] = None,
+    next_cursor: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Samples in the shape of `SamplesResponseModel`. Like the sample table, every sample
+    has all columns (missing values are None).
+    """
+    columns = {}
+    for sample in samples:
+        columns.update(dict.fromkeys(sample))
+    return {
+        "count": len(samples),
+        "items": [
+            {column: sample.get(column) for column in columns} for sample in samples
+        ],
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+        "next_cursor": next_cursor,
+    }
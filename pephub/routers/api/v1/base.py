@@ -2,6 +2,7 @@ from dotenv import load_dotenv
 from fastapi import APIRouter
 
 from ....const import ALL_VERSIONS
+from ....metrics import collect_stats
 from ...models import BaseEndpointResponseModel, VersionResponseModel
 
 load_dotenv()
@@ -23,3 +24,11 @@ async def api_base():
 @api.get("/_version", response_model=VersionResponseModel)
 async def version():
     return dict(**ALL_VERSIONS)
+
+
+@api.get("/_metrics")
+async def metrics():
+    """
+    Internal server statistics: executor saturation, cache hit ratios, latencies.
+    """
+    return collect_stats()
@@ -1,6 +1,5 @@
 import logging
 
-import eido
 from eido.validation import validate_config
 from eido.exceptions import EidoValidationError
 import peppy
@@ -15,6 +14,9 @@ from peppy.const import (
 from ....dependencies import (
     get_db,
 )
+from ....cache import ProjectCache
+from ....executor import ExecutorBusyError, ExecutorTimeoutError, run_cpu, run_db
+from .... import workers
 
 _LOGGER = logging.getLogger(__name__)
 DEFAULT_SCHEMA_NAMESPACE = "databio"
@@ -26,7 +28,8 @@ async def verify_updated_project(updated_project) -> peppy.Project:
     new_raw_project = {}
 
     agent = get_db()
-    default_schema = agent.schema.get(
+    default_schema = await run_db(
+        agent.schema.get,
         namespace=DEFAULT_SCHEMA_NAMESPACE,
         name=DEFAULT_SCHEMA_NAME,
         version=DEFAULT_SCHEMA_VERSION,
@@ -84,9 +87,17 @@ async def verify_updated_project(updated_project) -> peppy.Project:
         )
 
     try:
-        # validate project (it will also validate samples)
-        eido.validate_project(new_project, default_schema)
+        # validate project (it will also validate samples), in the CPU executor
+        valid = not await run_cpu(
+            workers.validate_project,
+            ProjectCache.encode(new_raw_project),
+            default_schema,
+        )
+    except (ExecutorBusyError, ExecutorTimeoutError):
+        raise
     except Exception as _:
+        valid = False
+    if not valid:
         raise HTTPException(
             status_code=400,
             detail="Could not validate PEP. Please check your PEP and try again.",
@@ -31,13 +31,17 @@ from ....const import (
     ARCHIVE_URL_PATH,
 )
 from ....dependencies import (
+    FAST_JSON_RESPONSES,
     get_db,
     get_namespace_access_list,
     get_namespace_info,
     get_user_from_session_info,
+    invalidate_project,
     verify_user_can_write_namespace,
     get_pepdb_namespace_info,
 )
+from ....executor import run_db
+from ....responses import FastJSONResponse
 from ....helpers import parse_user_file_upload, split_upload_files_on_init_file
 from ...models import (
     FavoriteRequest,
@@ -110,7 +114,8 @@ async def get_namespace_projects(
     # through a namespace for projects doesnt make sense
     # get projects in namespace
     if query is not None:
-        search_result = agent.annotation.get(
+        search_result = await run_db(
+            agent.annotation.get,
             query=query,
             namespace=namespace,
             limit=limit,
@@ -124,7 +129,8 @@ async def get_namespace_projects(
             pep_type=pep_type,
         )
     else:
-        search_result = agent.annotation.get(
+        search_result = await run_db(
+            agent.annotation.get,
             namespace=namespace,
             limit=limit,
             offset=offset,
@@ -137,6 +143,8 @@ async def get_namespace_projects(
             pep_type=pep_type,
         )
 
+    if FAST_JSON_RESPONSES:
+        return FastJSONResponse(search_result.model_dump())
     return search_result
 
 
@@ -187,7 +195,8 @@ async def create_pep(
             p.name = name
             p.description = description
             try:
-                agent.project.create(
+                await run_db(
+                    agent.project.create,
                     p,
                     namespace=namespace,
                     name=name,
@@ -201,6 +210,7 @@ async def create_pep(
                     detail=f"Project '{namespace}/{p.name}:{tag}' already exists in namespace",
                     status_code=400,
                 )
+            invalidate_project(namespace, name, tag)
             return JSONResponse(
                 content={
                     "namespace": namespace,
@@ -266,7 +276,8 @@ async def upload_raw_pep(
             status_code=417,
         )
     try:
-        agent.project.create(
+        await run_db(
+            agent.project.create,
             p_project,
             namespace=namespace,
             name=p_project.namespace,
@@ -282,6 +293,7 @@ async def upload_raw_pep(
             detail=f"Project '{namespace}/{p_project.namespace}:{tag}' already exists in namespace",
             status_code=400,
         )
+    invalidate_project(namespace, p_project.namespace, tag)
     return JSONResponse(
         content={
             "namespace": namespace,
@@ -307,7 +319,7 @@ async def get_user_stars(
     """
     Get information about user favorite projects.
     """
-    return agent.user.get_favorites(namespace=namespace)
+    return await run_db(agent.user.get_favorites, namespace=namespace)
 
 
 @namespace.post(
@@ -326,7 +338,8 @@ async def add_to_stars(
     Add project to favorites
     """
     try:
-        agent.user.add_project_to_favorites(
+        await run_db(
+            agent.user.add_project_to_favorites,
             namespace=namespace,
             project_namespace=project.namespace,
             project_name=project.name,
@@ -361,7 +374,8 @@ async def remove_from_stars(
     Add project to favorites
     """
     try:
-        agent.user.remove_project_from_favorites(
+        await run_db(
+            agent.user.remove_project_from_favorites,
             namespace=namespace,
             project_namespace=project.namespace,
             project_name=project.name,
@@ -396,7 +410,8 @@ async def get_namespace_information(
         "number_of_schemas",
     ] = "number_of_projects",
 ) -> NamespaceInfoReturnModel:
-    results = get_pepdb_namespace_info(
+    results = await run_db(
+        get_pepdb_namespace_info,
         page=page,
         page_size=page_size,
         order_by=order_by,
@@ -416,7 +431,7 @@ async def get_namespace_stats(
     namespace: Optional[str] = None,
 ):
     try:
-        return agent.namespace.stats(namespace=namespace)
+        return await run_db(agent.namespace.stats, namespace=namespace)
     except NamespaceNotFoundError:
         raise HTTPException(
             status_code=404,
@@ -453,6 +468,7 @@ def remove_user(
             status_code=404,
             detail=f"Namespace '{namespace}' not found.",
         )
+    invalidate_project(namespace)
     return JSONResponse(
         content={
             "message": f"Namespace {namespace} has been deleted.",
@@ -468,7 +484,7 @@ def remove_user(
 )
 async def get_archive(namespace: str, agent: PEPDatabaseAgent = Depends(get_db)):
 
-    result = agent.namespace.get_tar_info(namespace)
+    result = await run_db(agent.namespace.get_tar_info, namespace)
 
     for item in result.results:
         item.file_path = os.path.join(ARCHIVE_URL_PATH, item.file_path)
@@ -1,7 +1,7 @@
+import json
 import logging
 from typing import Annotated, Any, Literal, Dict, List, Optional, Union
 
-import eido
 import numpy as np
 import pandas as pd
 import peppy
@@ -9,7 +9,13 @@ import yaml
 from dotenv import load_dotenv
 from fastapi import APIRouter, Body, Depends, Query
 from fastapi.exceptions import HTTPException
-from fastapi.responses import JSONResponse, PlainTextResponse, FileResponse
+from fastapi.responses import (
+    JSONResponse,
+    PlainTextResponse,
+    FileResponse,
+    Response,
+    StreamingResponse,
+)
 from pepdbagent import PEPDatabaseAgent
 from pepdbagent.exceptions import (
     ProjectNotFoundError,
@@ -29,22 +35,75 @@ from pepdbagent.models import (
     ProjectViews,
     HistoryAnnotationModel,
 )
-from peppy.const import SAMPLE_RAW_DICT_KEY
+from peppy.const import CONFIG_KEY, SAMPLE_RAW_DICT_KEY, SUBSAMPLE_RAW_LIST_KEY
 
 # from ....const import SAMPLE_CONVERSION_FUNCTIONS
 from ....dependencies import (
     DEFAULT_TAG,
     get_config,
+    FAST_JSON_RESPONSES,
     get_db,
+    get_digest_cache,
+    get_sample_table_cache,
+    get_encoded_project,
     get_namespace_access_list,
     get_project,
     get_project_annotation,
     get_subsamples,
+    invalidate_project,
+    load_encoded_project,
+    load_project,
     verify_user_can_fork,
     verify_user_can_read_project,
+    verify_project_not_modified,
     get_user_from_session_info,
 )
+from ....conversion import (
+    ConversionCache,
+    FilterRegistry,
+    get_conversion_cache,
+    get_filter_registry,
+)
+from ....cache import ProjectVersionCache
+from ....digest import DigestCache, ProjectDigests, compute_digests, read_digests
+from ....columnar import (
+    COLUMNAR_FORMATS,
+    collect_column_types,
+    columnar_available,
+    encode_columnar,
+    stream_columnar,
+)
+from ....executor import (
+    ExecutorBusyError,
+    ExecutorTimeoutError,
+    run_cpu,
+    run_db,
+)
+from ....processing import (
+    describe_samples,
+    iter_list_chunks,
+    iter_processed_samples,
+    process_first_chunk,
+    process_page,
+    profile_samples,
+    sample_table_context,
+    stream_json_samples,
+)
+from .... import workers
+from ....responses import FastJSONResponse, raw_project_content, samples_content
 from ....helpers import zip_conv_result, zip_pep
+from ....samples import (
+    SampleFilter,
+    decode_cursor,
+    encode_cursor,
+    get_sample_guids,
+    get_samples_page,
+    iter_sample_chunks,
+    parse_filter,
+    select_columns,
+    stream_samples_csv,
+    stream_samples_ndjson,
+)
 from ...models import (
     ForkRequest,
     ProjectOptional,
@@ -53,9 +112,13 @@ from ...models import (
     ProjectHistoryResponse,
     SamplesResponseModel,
     ConfigResponseModel,
+    DigestResponseModel,
+    ProjectAnnotationResponse,
 )
 from ....const import (
+    DEFAULT_SAMPLES_PAGE_SIZE,
     MAX_PROCESSED_PROJECT_SIZE,
+    MAX_SAMPLES_PAGE_SIZE,
 )
 from .helpers import verify_updated_project
 
@@ -92,7 +155,12 @@ async def get_namespace_projects_list(
             status_code=400,
             detail="Please provide a list of registry paths to fetch annotations for.",
         )
-    return agent.annotation.get_by_rp_list(registry_paths=paths, admin=namespace_access)
+    annotations = await run_db(
+        agent.annotation.get_by_rp_list, registry_paths=paths, admin=namespace_access
+    )
+    if FAST_JSON_RESPONSES:
+        return FastJSONResponse(annotations.model_dump())
+    return annotations
 
 
 @project.get(
@@ -102,6 +170,7 @@ async def get_namespace_projects_list(
     response_model_by_alias=False,
 )
 async def get_a_pep(
+    etag: str = Depends(verify_project_not_modified),
     proj: dict = Depends(get_project),
 ):
     """
@@ -115,6 +184,8 @@ async def get_a_pep(
         namespace: databio
 
     """
+    if FAST_JSON_RESPONSES:
+        return FastJSONResponse(raw_project_content(proj), headers={"ETag": etag})
     try:
         raw_project = ProjectRawModel(**proj)
         return raw_project
@@ -175,16 +246,19 @@ async def update_pep(
             new_name = new_project.name = project
     else:
         new_name = project
-    agent.project.update(
+    await run_db(
+        agent.project.update,
         update_dict=update_dict,
         namespace=namespace,
         name=project,
         tag=tag,
         user=user_name,
     )
+    invalidate_project(namespace, project, tag)
 
     # fetch latest name and tag
     tag = updated_project.tag or tag
+    invalidate_project(namespace, new_name, tag)
 
     return JSONResponse(
         content={
@@ -207,7 +281,7 @@ async def delete_a_pep(
     """
     Delete a PEP from a certain namespace
     """
-    proj = agent.project.exists(namespace, project, tag=tag)
+    proj = await run_db(agent.project.exists, namespace, project, tag=tag)
 
     if not proj:
         raise HTTPException(
@@ -215,7 +289,8 @@ async def delete_a_pep(
         )
 
     try:
-        agent.project.delete(namespace, project, tag=tag)
+        await run_db(agent.project.delete, namespace, project, tag=tag)
+        invalidate_project(namespace, project, tag)
         return JSONResponse(
             content={
                 "message": "PEP deleted.",
@@ -231,11 +306,61 @@ async def delete_a_pep(
         )
 
 
+def check_columnar_format(format: Optional[str]) -> None:
+    """
+    Arrow and Parquet formats need pyarrow to be installed
+    """
+    if format in COLUMNAR_FORMATS and not columnar_available():
+        raise HTTPException(
+            status_code=400,
+            detail=f"Format '{format}' is not available on this server.",
+        )
+
+
 @project.get("/samples", response_model=Union[SamplesResponseModel, str, list, dict])
 async def get_pep_samples(
-    proj: dict = Depends(get_project),
-    format: Optional[Union[Literal["basic", "csv", "yaml", "json"], None]] = None,
+    namespace: str,
+    project: str,
+    tag: Optional[str] = DEFAULT_TAG,
+    format: Optional[
+        Union[
+            Literal["basic", "csv", "yaml", "json", "ndjson", "arrow", "parquet"], None
+        ]
+    ] = None,
     raw: Optional[bool] = True,
+    stream: Optional[bool] = Query(
+        False,
+        description="Stream raw samples as csv or ndjson (default), without a limit on the number of samples",
+    ),
+    limit: Optional[int] = Query(
+        None,
+        ge=1,
+        le=MAX_SAMPLES_PAGE_SIZE,
+        description="Return a page of samples of this size",
+    ),
+    offset: Optional[int] = Query(0, ge=0, description="Number of samples to skip"),
+    cursor: Optional[str] = Query(
+        None,
+        description="Return the page that starts after the previous page. Use `next_cursor` of the previous page.",
+    ),
+    columns: Optional[List[str]] = Query(
+        None,
+        description="Return only these sample attributes (repeated, or comma-separated)",
+    ),
+    filters: Optional[List[str]] = Query(
+        None,
+        alias="filter",
+        description="Return only samples that match the filter: `attribute==value`, `attribute=in=value1,value2` or `attribute=prefix=value`. Repeated filters are combined.",
+    ),
+    with_id: Optional[bool] = Query(
+        False,
+        description="Return the project with the samples pephub_id",
+        include_in_schema=False,
+    ),
+    agent: PEPDatabaseAgent = Depends(get_db),
+    project_annotation: AnnotationModel = Depends(get_project_annotation),
+    etag: str = Depends(verify_project_not_modified),
+    sample_table_cache: ProjectVersionCache = Depends(get_sample_table_cache),
 ):
     """
     Get samples from a certain project and namespace
@@ -249,56 +374,353 @@ async def get_pep_samples(
 
 
     To convert project use format parameter. Available formats are: basic, csv, yaml, json
+
+    Samples can be requested in pages with `limit` and `offset`, or `cursor`.
+    Paginated response contains the total number of samples, and `next_cursor`,
+    that points to the next page (null on the last page).
+
+    Raw samples of projects of any size can be downloaded with `stream=true`, as csv
+    (`format=csv`), or newline-delimited json (`format=ndjson`, default).
+
+    Samples can be downloaded as typed tables for pandas, polars etc.: Arrow IPC stream
+    (`format=arrow`) or Parquet (`format=parquet`). Raw samples are streamed, and
+    can be selected with `columns` and `filter`.
+
+    Responses have an `ETag`; send it back in `If-None-Match` to get 304 Not Modified
+    if the project didn't change.
+
+    Sample attributes can be selected with `columns`, and samples filtered with
+    `filter`, e.g. `filter=genome==hg38&filter=sample_name=prefix=ATAC`.
+    Filters are evaluated on raw sample attributes by the database, and values are
+    compared as strings.
     """
 
-    AVALIABLE_FORMATS = ["basic", "csv", "yaml", "json"]
+    AVALIABLE_FORMATS = ["basic", "csv", "yaml", "json", "arrow", "parquet"]
 
-    if format:
+    if columns:
+        columns = [c for value in columns for c in value.split(",") if c]
+    try:
+        filters = [parse_filter(f) for f in filters] if filters else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        if format not in AVALIABLE_FORMATS:
+    check_columnar_format(format)
+    if stream or format == "ndjson" or (raw and format in COLUMNAR_FORMATS):
+        if not raw:
             raise HTTPException(
                 status_code=400,
-                detail=f"Invalid format '{format}'. Valid formats are: {AVALIABLE_FORMATS}",
+                detail="Streaming is supported for raw samples only.",
             )
+        return await stream_pep_samples(
+            agent,
+            namespace,
+            project,
+            tag,
+            format=format or "ndjson",
+            filters=filters,
+            columns=columns,
+            etag=etag,
+        )
 
-        if isinstance(proj, dict):
-            if len(proj["_sample_dict"]) > MAX_PROCESSED_PROJECT_SIZE:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Project is too large. View raw samples, or create a view. Limit is {MAX_PROCESSED_PROJECT_SIZE} samples.",
-                )
-            proj = peppy.Project.from_dict(proj)
-
-        if format == "json":
-            return {
-                "samples": [sample.to_dict() for sample in proj.samples],
-            }
-        elif format == "csv":
-            return PlainTextResponse(eido.convert_project(proj, "csv")["samples"])
-        elif format == "yaml":
-            return PlainTextResponse(
-                eido.convert_project(proj, "yaml-samples")["samples"]
+    paginated = limit is not None or offset or cursor
+    if paginated or columns or filters:
+        if format:
+            raise HTTPException(
+                status_code=400,
+                detail="Pagination, columns and filters are not supported together with format parameter.",
+            )
+        return await get_pep_samples_page(
+            agent,
+            namespace,
+            project,
+            tag,
+            raw=raw,
+            limit=limit or DEFAULT_SAMPLES_PAGE_SIZE if paginated else None,
+            offset=offset,
+            cursor=cursor,
+            with_id=with_id,
+            filters=filters,
+            columns=columns,
+            etag=etag,
+            last_update_date=project_annotation.last_update_date,
+            sample_table_cache=sample_table_cache,
+        )
+
+    if raw and not format:
+        proj = await load_project(agent, namespace, project, tag, with_id=with_id)
+        if FAST_JSON_RESPONSES:
+            return FastJSONResponse(
+                samples_content(proj[SAMPLE_RAW_DICT_KEY]), headers={"ETag": etag}
             )
-        elif format == "basic":
-            return eido.convert_project(proj, "basic")
-
-    if raw:
         df = pd.DataFrame(proj[SAMPLE_RAW_DICT_KEY])
         return SamplesResponseModel(
             count=df.shape[0],
             items=df.replace({np.nan: None}).to_dict(orient="records"),
         )
-    if isinstance(proj, dict):
-        if len(proj["_sample_dict"]) > MAX_PROCESSED_PROJECT_SIZE:
+
+    if format and format not in AVALIABLE_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid format '{format}'. Valid formats are: {AVALIABLE_FORMATS}",
+        )
+    if project_annotation.number_of_samples > MAX_PROCESSED_PROJECT_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Project is too large. View raw samples, or create a view. Limit is {MAX_PROCESSED_PROJECT_SIZE} samples.",
+        )
+    if format in [None, "json", "basic", "arrow", "parquet"]:
+        return await get_processed_samples(
+            agent, namespace, project, tag, format, with_id=with_id, etag=etag
+        )
+
+    # conversion runs in the CPU executor
+    proj = await load_encoded_project(agent, namespace, project, tag, with_id=with_id)
+    if format == "csv":
+        return PlainTextResponse(
+            (await run_cpu(workers.convert_project, proj, "csv"))["samples"],
+            headers={"ETag": etag},
+        )
+    return PlainTextResponse(
+        (await run_cpu(workers.convert_project, proj, "yaml-samples"))["samples"],
+        headers={"ETag": etag},
+    )
+
+
+async def get_processed_samples(
+    agent: PEPDatabaseAgent,
+    namespace: str,
+    project: str,
+    tag: str,
+    format: Optional[str],
+    with_id: bool = False,
+    etag: Optional[str] = None,
+) -> Union[StreamingResponse, dict]:
+    """
+    Process samples in chunks, and stream them as JSON (a list, or `{"samples": [...]}`
+    for `format=json`), Arrow or Parquet, or describe the project (`format=basic`).
+
+    Raw samples are read from the database twice, see `processing.iter_processed_samples`.
+    Arrow and Parquet tables need the column types of processed samples first, so
+    samples are processed twice.
+
+    Processing starts before the response (the first chunk of JSON, the column types
+    of Arrow and Parquet), so that its errors get their status code.
+    """
+    try:
+        guids = await run_db(get_sample_guids, agent, namespace, project, tag)
+        config = await run_db(agent.project.get_config, namespace, project, tag)
+        subsamples = await run_db(agent.project.get_subsamples, namespace, project, tag)
+    except ProjectNotFoundError:
+        raise HTTPException(
+            404,
+            f"PEP '{namespace}/{project}:{tag or DEFAULT_TAG}' does not exist in database. Did you spell it correctly?",
+        )
+
+    def read_chunks():
+        return iter_sample_chunks(agent, guids, with_id=with_id)
+
+    try:
+        profile = await profile_samples(read_chunks, config, subsamples)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Could not process PEP. {e}")
+
+    def process_chunks():
+        return iter_processed_samples(read_chunks, config, subsamples, profile)
+
+    try:
+        if format == "basic":
+            return await describe_samples(process_chunks(), config, profile)
+        if format in COLUMNAR_FORMATS:
+            types = await collect_column_types(process_chunks)
+        else:
+            chunks = await process_first_chunk(process_chunks())
+    except (ExecutorBusyError, ExecutorTimeoutError):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Could not process PEP. {e}")
+
+    if format in COLUMNAR_FORMATS:
+        media_type, extension = COLUMNAR_FORMATS[format]
+        return StreamingResponse(
+            stream_columnar(process_chunks, format, types=types),
+            media_type=media_type,
+            headers={
+                "Content-Disposition": f"attachment; filename={namespace}_{project}_{tag}_samples.{extension}",
+                **({"ETag": etag} if etag else {}),
+            },
+        )
+    prefix, suffix = ('{"samples":[', "]}") if format == "json" else ("[", "]")
+    return StreamingResponse(
+        stream_json_samples(chunks, prefix, suffix),
+        media_type="application/json",
+        headers={"ETag": etag} if etag else None,
+    )
+
+
+async def stream_pep_samples(
+    agent: PEPDatabaseAgent,
+    namespace: str,
+    project: str,
+    tag: str,
+    format: str,
+    filters: Optional[List[SampleFilter]] = None,
+    columns: Optional[List[str]] = None,
+    etag: Optional[str] = None,
+) -> StreamingResponse:
+    """
+    Stream raw samples, reading them from the database in chunks
+    """
+    if format not in ["csv", "ndjson", *COLUMNAR_FORMATS]:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid format '{format}' for streaming. Valid formats are: {['csv', 'ndjson', *COLUMNAR_FORMATS]}",
+        )
+    try:
+        guids = await run_db(get_sample_guids, agent, namespace, project, tag, filters)
+    except ProjectNotFoundError:
+        raise HTTPException(
+            404,
+            f"PEP '{namespace}/{project}:{tag or DEFAULT_TAG}' does not exist in database. Did you spell it correctly?",
+        )
+
+    extension = format
+    if format == "csv":
+        content = stream_samples_csv(agent, guids, columns=columns)
+        media_type = "text/csv"
+    elif format in COLUMNAR_FORMATS:
+        content = stream_columnar(
+            lambda: iter_sample_chunks(agent, guids, columns=columns), format, columns
+        )
+        media_type, extension = COLUMNAR_FORMATS[format]
+    else:
+        content, media_type = (
+            stream_samples_ndjson(agent, guids, columns=columns),
+            "application/x-ndjson",
+        )
+    return StreamingResponse(
+        content,
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f"attachment; filename={namespace}_{project}_{tag}_samples.{extension}",
+            **({"ETag": etag} if etag else {}),
+        },
+    )
+
+
+async def get_pep_samples_page(
+    agent: PEPDatabaseAgent,
+    namespace: str,
+    project: str,
+    tag: str,
+    raw: bool,
+    limit: Optional[int],
+    offset: int,
+    cursor: Optional[str],
+    with_id: bool,
+    filters: Optional[List[SampleFilter]] = None,
+    columns: Optional[List[str]] = None,
+    etag: Optional[str] = None,
+    last_update_date: Optional[str] = None,
+    sample_table_cache: Optional[ProjectVersionCache] = None,
+) -> Union[SamplesResponseModel, FastJSONResponse]:
+    """
+    Get a page of samples (all matching samples, if limit is None), without loading
+    the whole project.
+
+    Columns of raw samples are selected by the database. Processed samples are read
+    whole, as sample modifiers may need other attributes, and columns are selected
+    after processing. They are processed like in the whole project, see
+    `processing.process_page`. The context of the whole sample table is cached until
+    the project is updated, so that a page reads only its own samples.
+    """
+    if not raw and limit is not None and limit > MAX_PROCESSED_PROJECT_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Page is too large. Limit for processed samples is {MAX_PROCESSED_PROJECT_SIZE} samples.",
+        )
+    try:
+        page = await run_db(
+            get_samples_page,
+            agent,
+            namespace,
+            project,
+            tag,
+            # processed samples without a limit: read one more to detect too many
+            limit=limit if raw or limit else MAX_PROCESSED_PROJECT_SIZE + 1,
+            offset=offset,
+            after=decode_cursor(cursor) if cursor else None,
+            with_id=with_id,
+            filters=filters,
+            columns=columns if raw else None,
+        )
+    except ProjectNotFoundError:
+        raise HTTPException(
+            404,
+            f"PEP '{namespace}/{project}:{tag or DEFAULT_TAG}' does not exist in database. Did you spell it correctly?",
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor. {e}")
+
+    next_cursor = encode_cursor(page.next_guid) if page.next_guid else None
+    if raw and FAST_JSON_RESPONSES:
+        return FastJSONResponse(
+            samples_content(page.items, page.total, limit, offset, next_cursor),
+            headers={"ETag": etag} if etag else None,
+        )
+    if raw:
+        df = pd.DataFrame(page.items)
+        items = df.replace({np.nan: None}).to_dict(orient="records")
+    else:
+        if len(page.items) > MAX_PROCESSED_PROJECT_SIZE:
             raise HTTPException(
                 status_code=400,
-                detail=f"Project is too large. View raw samples, or create a view. Limit is {MAX_PROCESSED_PROJECT_SIZE} samples.",
+                detail=f"Too many samples. View raw samples, or use pagination. Limit for processed samples is {MAX_PROCESSED_PROJECT_SIZE} samples.",
+            )
+        registry = (namespace, project, tag, with_id)
+        context = None
+        if sample_table_cache is not None:
+            context = sample_table_cache.get(registry, last_update_date)
+        if context is None:
+            config = await run_db(agent.project.get_config, namespace, project, tag)
+            subsamples = await run_db(
+                agent.project.get_subsamples, namespace, project, tag
             )
-        proj = peppy.Project.from_dict(proj)
-    return [sample.to_dict() for sample in proj.samples]
+            guids = await run_db(get_sample_guids, agent, namespace, project, tag)
 
+            def read_chunks():
+                return iter_sample_chunks(agent, guids, with_id=with_id)
 
-@project.get("/config", summary="Get project configuration file")
+            try:
+                context = await sample_table_context(read_chunks, config, subsamples)
+            except ValueError as e:
+                raise HTTPException(
+                    status_code=400, detail=f"Could not process PEP. {e}"
+                )
+            if sample_table_cache is not None:
+                sample_table_cache.set(registry, last_update_date, context)
+        try:
+            processed = await process_page(page.items, context)
+        except (ExecutorBusyError, ExecutorTimeoutError):
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Could not process PEP. {e}")
+        items = select_columns(processed, columns)
+
+    return SamplesResponseModel(
+        count=len(items),
+        items=items,
+        total=page.total,
+        limit=limit,
+        offset=offset,
+        next_cursor=next_cursor,
+    )
+
+
+@project.get(
+    "/config",
+    summary="Get project configuration file",
+    dependencies=[Depends(verify_project_not_modified)],
+)
 async def get_pep_config(
     config: dict = Depends(get_config),
 ):
@@ -316,6 +738,77 @@ async def get_pep_config(
     )
 
 
+async def load_digests(
+    agent: PEPDatabaseAgent,
+    digests_cache: DigestCache,
+    namespace: str,
+    project: str,
+    tag: str,
+    last_update_date: Optional[str],
+) -> ProjectDigests:
+    """
+    Get digests of the project from the cache, or compute them if the project was
+    not written since the cache was filled (e.g. before digests were computed on write)
+    """
+    registry = digests_cache.key(namespace, project, tag)
+    digests = digests_cache.get(registry, last_update_date)
+    if digests is None:
+        try:
+            digests = await run_db(read_digests, agent, namespace, project, tag)
+        except ProjectNotFoundError:
+            raise HTTPException(
+                404,
+                f"PEP '{namespace}/{project}:{tag or DEFAULT_TAG}' does not exist in database. Did you spell it correctly?",
+            )
+        digests_cache.set(registry, last_update_date, digests)
+    return digests
+
+
+@project.get(
+    "/digest",
+    summary="Get content digests of the project",
+    response_model=DigestResponseModel,
+    dependencies=[Depends(verify_project_not_modified)],
+)
+async def get_pep_digest(
+    namespace: str,
+    project: str,
+    tag: Optional[str] = DEFAULT_TAG,
+    samples: Optional[bool] = Query(
+        False, description="Include digest of every sample, in project order"
+    ),
+    agent: PEPDatabaseAgent = Depends(get_db),
+    project_annotation: AnnotationModel = Depends(get_project_annotation),
+    digests_cache: DigestCache = Depends(get_digest_cache),
+):
+    """
+    Get canonical (MD5) digests of the project config, sample table, subsample tables
+    and the whole project. Digests don't depend on key order or formatting, so they can
+    be used to detect changes, or find duplicate projects (e.g. across forks).
+
+    Digests are computed once after every change of the project (when it is
+    written), and saved until the next change.
+
+    The `project` digest is not the same value as `digest` of the annotation, which
+    pepdbagent computes from the project as stored; see `content_digest` of the
+    annotation.
+    """
+    last_update_date = project_annotation.last_update_date
+    digests = await load_digests(
+        agent, digests_cache, namespace, project, tag, last_update_date
+    )
+
+    return DigestResponseModel(
+        registry=f"{namespace}/{project}:{tag}",
+        last_update_date=last_update_date,
+        project=digests.project,
+        config=digests.config,
+        samples=digests.samples,
+        subsamples=digests.subsamples,
+        sample_digests=digests.sample_digests if samples else None,
+    )
+
+
 @project.get(
     "/samples/{sample_name}",
     summary="Get a particular sample",
@@ -348,13 +841,24 @@ async def get_sample(
         )
     try:
         if raw:
-            sample_dict = agent.sample.get(
-                namespace, project, tag=tag, sample_name=sample_name, raw=True
+            sample_dict = await run_db(
+                agent.sample.get,
+                namespace,
+                project,
+                tag=tag,
+                sample_name=sample_name,
+                raw=True,
             )
         else:
-            sample_dict = agent.sample.get(
-                namespace, project, tag=tag, sample_name=sample_name, raw=False
-            ).to_dict()
+            sample = await run_db(
+                agent.sample.get,
+                namespace,
+                project,
+                tag=tag,
+                sample_name=sample_name,
+                raw=False,
+            )
+            sample_dict = sample.to_dict()
 
         return sample_dict
     except SampleNotFoundError:
@@ -386,13 +890,15 @@ async def update_sample(
             status_code=404,
         )
     try:
-        agent.sample.update(
+        await run_db(
+            agent.sample.update,
             namespace,
             name=project,
             tag=tag,
             sample_name=sample_name,
             update_dict=update_dict,
         )
+        invalidate_project(namespace, project, tag)
         return JSONResponse(
             content={
                 "message": "Sample updated.",
@@ -429,13 +935,15 @@ async def upload_sample(
             status_code=401,
         )
     try:
-        agent.sample.add(
+        await run_db(
+            agent.sample.add,
             namespace,
             name=project,
             tag=tag,
             sample_dict=sample_dict,
             overwrite=overwrite,
         )
+        invalidate_project(namespace, project, tag)
         return JSONResponse(
             content={
                 "message": "Sample uploaded successfully.",
@@ -478,7 +986,14 @@ async def delete_sample(
             status_code=401,
         )
     try:
-        agent.sample.delete(namespace, name=project, tag=tag, sample_name=sample_name)
+        await run_db(
+            agent.sample.delete,
+            namespace,
+            name=project,
+            tag=tag,
+            sample_name=sample_name,
+        )
+        invalidate_project(namespace, project, tag)
         return JSONResponse(
             content={
                 "message": "Sample deleted successfully.",
@@ -502,6 +1017,10 @@ async def delete_sample(
 async def get_subsamples_endpoint(
     subsamples: peppy.Project = Depends(get_subsamples),
     download: bool = False,
+    format: Optional[Literal["arrow", "parquet"]] = Query(
+        None,
+        description="Download subsamples as Arrow IPC stream or Parquet",
+    ),
 ):
     """
     Get subsamples from a certain project and namespace
@@ -513,6 +1032,16 @@ async def get_subsamples_endpoint(
         project: example
         namespace: databio
     """
+    if format:
+        check_columnar_format(format)
+        media_type, extension = COLUMNAR_FORMATS[format]
+        return Response(
+            encode_columnar(subsamples[0] if subsamples else [], format),
+            media_type=media_type,
+            headers={
+                "Content-Disposition": f"attachment; filename=subsample_table.{extension}"
+            },
+        )
 
     if subsamples:
         try:
@@ -538,9 +1067,16 @@ async def get_subsamples_endpoint(
 
 @project.get("/convert")
 async def convert_pep(
-    proj: dict = Depends(get_project),
+    namespace: str,
+    project: str,
+    tag: Optional[str] = DEFAULT_TAG,
+    proj: bytes = Depends(get_encoded_project),
     filter: Optional[str] = "basic",
     format: Optional[str] = "plain",
+    project_annotation: AnnotationModel = Depends(get_project_annotation),
+    digests_cache: DigestCache = Depends(get_digest_cache),
+    filters: FilterRegistry = Depends(get_filter_registry),
+    conversions: ConversionCache = Depends(get_conversion_cache),
 ):
     """
     Convert a PEP to a specific format, f. For a list of available formats/filters,
@@ -556,21 +1092,34 @@ async def convert_pep(
         project: example
         namespace: databio
 
+    Results are cached by project content and filter.
     """
     # default to basic
     if filter is None:
         filter = "basic"  # default to basic
 
     # validate filter exists
-    filter_list = eido.get_available_pep_filters()
-    if filter not in filter_list:
+    if filter not in filters:
         raise HTTPException(
-            400, f"Unknown filter '{filter}'. Available filters: {filter_list}"
-        )
-
-    # generate result
-    peppy_project = peppy.Project.from_dict(proj)
-    conv_result = eido.run_filter(peppy_project, filter, verbose=False)
+            400, f"Unknown filter '{filter}'. Available filters: {filters.names}"
+        )
+
+    # generate result, or get it from the cache
+    registry = digests_cache.key(namespace, project, tag)
+    digests = digests_cache.get(registry, project_annotation.last_update_date)
+    if digests is None:
+        raw_project = json.loads(proj)
+        digests = compute_digests(
+            raw_project[CONFIG_KEY],
+            raw_project[SAMPLE_RAW_DICT_KEY],
+            raw_project.get(SUBSAMPLE_RAW_LIST_KEY) or [],
+        )
+        digests_cache.set(registry, project_annotation.last_update_date, digests)
+    conv_result = await conversions.convert(
+        digests.project,
+        filter,
+        lambda: run_cpu(workers.convert_project, proj, filter),
+    )
 
     if format == "plain":
         return_str = "\n".join([conv_result[k] for k in conv_result])
@@ -584,7 +1133,13 @@ async def convert_pep(
 
 
 @project.get("/zip", response_class=FileResponse)
-async def zip_pep_for_download(proj: Dict[str, Any] = Depends(get_project)):
+async def zip_pep_for_download(
+    proj: Dict[str, Any] = Depends(get_project),
+    columnar: Optional[Literal["arrow", "parquet"]] = Query(
+        None,
+        description="Add sample and subsample tables as Arrow IPC stream or Parquet files",
+    ),
+):
     """
     Zip a pep
 
@@ -596,7 +1151,8 @@ async def zip_pep_for_download(proj: Dict[str, Any] = Depends(get_project)):
         namespace: databio
 
     """
-    return zip_pep(proj)
+    check_columnar_format(columnar)
+    return zip_pep(proj, columnar=columnar)
 
 
 @project.post(
@@ -621,7 +1177,8 @@ async def fork_pep_to_namespace(
     fork_name = fork_request.fork_name
     fork_tag = fork_request.fork_tag
     try:
-        agent.project.fork(
+        await run_db(
+            agent.project.fork,
             original_namespace=proj_annotation.namespace,
             original_name=proj_annotation.name,
             original_tag=proj_annotation.tag,
@@ -637,6 +1194,7 @@ async def fork_pep_to_namespace(
             status_code=400,
             detail=f"Project '{fork_to}/{fork_name}:{fork_tag}' already exists in namespace",
         )
+    invalidate_project(fork_to, fork_name, fork_tag)
 
     return JSONResponse(
         content={
@@ -649,14 +1207,32 @@ async def fork_pep_to_namespace(
     )
 
 
-@project.get("/annotation", response_model=AnnotationModel)
+@project.get("/annotation", response_model=ProjectAnnotationResponse)
 async def get_project_annotation(
+    namespace: str,
+    project: str,
+    tag: Optional[str] = DEFAULT_TAG,
+    agent: PEPDatabaseAgent = Depends(get_db),
     proj_annotation: AnnotationModel = Depends(get_project_annotation),
+    digests_cache: DigestCache = Depends(get_digest_cache),
 ):
     """
-    Get project annotation from a certain project and namespace
+    Get project annotation from a certain project and namespace.
+
+    `content_digest` is the canonical digest of the project (see the /digest
+    endpoint), while `digest` is pepdbagent's digest of the project as stored.
     """
-    return proj_annotation
+    digests = await load_digests(
+        agent,
+        digests_cache,
+        namespace,
+        project,
+        tag,
+        proj_annotation.last_update_date,
+    )
+    return ProjectAnnotationResponse(
+        **proj_annotation.model_dump(), content_digest=digests.project
+    )
 
 
 #### Views ####
@@ -691,31 +1267,50 @@ async def get_view_of_the_project(
 ):
     """
     Fetch a view of the project.
+
+    Processed views (`raw=false`) are processed in chunks and streamed.
     """
     try:
-        if raw:
-            return ProjectRawModel(
-                **agent.view.get(
-                    namespace=namespace,
-                    name=project,
-                    view_name=view,
-                    tag=tag,
-                    raw=raw,
-                )
-            )
-        else:
-            return agent.view.get(
-                namespace=namespace,
-                name=project,
-                view_name=view,
-                tag=tag,
-                raw=raw,
-            ).to_dict()
+        view_project = await run_db(
+            agent.view.get,
+            namespace=namespace,
+            name=project,
+            view_name=view,
+            tag=tag,
+            raw=True,
+        )
     except ViewNotFoundError:
         raise HTTPException(
             status_code=404,
             detail=f"View '{view}' not found in project '{namespace}/{project}:{tag}'",
         )
+    if raw:
+        if FAST_JSON_RESPONSES:
+            return FastJSONResponse(raw_project_content(view_project))
+        return ProjectRawModel(**view_project)
+
+    config = view_project[CONFIG_KEY]
+    samples = view_project[SAMPLE_RAW_DICT_KEY]
+    subsamples = view_project.get(SUBSAMPLE_RAW_LIST_KEY)
+
+    def read_chunks():
+        return iter_list_chunks(samples)
+
+    try:
+        profile = await profile_samples(read_chunks, config, subsamples)
+        chunks = await process_first_chunk(
+            iter_processed_samples(read_chunks, config, subsamples, profile)
+        )
+    except (ExecutorBusyError, ExecutorTimeoutError):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Could not process view. {e}")
+    return StreamingResponse(
+        stream_json_samples(
+            chunks, f'{{"project":{json.dumps(config)},"samples":[', "]}"
+        ),
+        media_type="application/json",
+    )
 
 
 @project.post(
@@ -743,7 +1338,8 @@ async def create_view_of_the_project(
             status_code=401,
         )
     try:
-        agent.view.create(
+        await run_db(
+            agent.view.create,
             view_name=view,
             no_fail=no_fail,
             description=description,
@@ -796,7 +1392,8 @@ async def zip_view_of_the_view(
     Zip a view of the project.
     """
     return zip_pep(
-        agent.view.get(
+        await run_db(
+            agent.view.get,
             namespace=namespace,
             name=project,
             view_name=view,
@@ -826,7 +1423,8 @@ async def add_sample_to_view(
             status_code=401,
         )
     try:
-        agent.view.add_sample(
+        await run_db(
+            agent.view.add_sample,
             namespace=namespace,
             name=project,
             tag=tag,
@@ -997,6 +1595,14 @@ def get_project_history_by_id(
         )
         # convert the config to a yaml string
         project_at_history["_config"] = yaml.dump(project_at_history["_config"])
+        if FAST_JSON_RESPONSES:
+            return FastJSONResponse(
+                {
+                    "_config": project_at_history["_config"],
+                    "_subsample_list": project_at_history.get("_subsample_list"),
+                    "_sample_dict": project_at_history["_sample_dict"],
+                }
+            )
         return project_at_history
 
     except ProjectNotFoundError:
@@ -1078,6 +1684,7 @@ def restore_project_history_by_id(
             history_id=history_id,
             user=user_name,
         )
+        invalidate_project(namespace, project, tag)
         return JSONResponse(
             content={
                 "message": "Project restored.",
@@ -38,6 +38,7 @@ from ....dependencies import (
     get_db,
     verify_user_can_write_namespace,
 )
+from ....executor import run_db
 
 load_dotenv()
 
@@ -58,7 +59,8 @@ async def get_all_schemas(
     Search all schemas throughout the database. Search is performed on schema name, and description.
     """
 
-    result = agent.schema.query_schemas(
+    result = await run_db(
+        agent.schema.query_schemas,
         namespace=None,
         search_str=query,
         page=page,
@@ -85,13 +87,14 @@ async def get_schemas_in_namespace(
     """
     Get schemas for specific endpoint, by providing query parameters to filter the results.
     """
-    if not agent.user.exists(namespace=namespace):
+    if not await run_db(agent.user.exists, namespace=namespace):
         raise HTTPException(
             status_code=404,
             detail=f"Namespace '{namespace}' doesn't exist in the database.",
         )
 
-    result = agent.schema.fetch_schemas(
+    result = await run_db(
+        agent.schema.fetch_schemas,
         namespace=namespace,
         name=name,
         maintainer=maintainer,
@@ -137,7 +140,8 @@ async def create_schema_for_namespace_by_file(
         schema_dict = json.loads(schema_str)
 
     try:
-        agent.schema.create(
+        await run_db(
+            agent.schema.create,
             namespace=namespace,
             name=schema_name,
             version=version,
@@ -176,7 +180,8 @@ async def create_schema_for_namespace_by_json(
     """
 
     try:
-        agent.schema.create(
+        await run_db(
+            agent.schema.create,
             namespace=namespace,
             name=schema_data.schema_name,
             version=schema_data.version,
@@ -212,8 +217,8 @@ async def get_schema(
     """
 
     try:
-        schema_info = agent.schema.get_schema_info(
-            namespace=namespace, name=schema_name
+        schema_info = await run_db(
+            agent.schema.get_schema_info, namespace=namespace, name=schema_name
         )
     except SchemaDoesNotExistError:
         raise HTTPException(
@@ -260,7 +265,7 @@ async def delete_schema(
     """
 
     try:
-        agent.schema.delete_schema(namespace=namespace, name=schema_name)
+        await run_db(agent.schema.delete_schema, namespace=namespace, name=schema_name)
     except SchemaDoesNotExistError:
         raise HTTPException(
             status_code=404, detail=f"Schema {namespace}/{schema_name} not found."
@@ -285,7 +290,8 @@ async def get_schema_versions(
     """
 
     try:
-        schema_info = agent.schema.query_schema_version(
+        schema_info = await run_db(
+            agent.schema.query_schema_version,
             search_str=query,
             namespace=namespace,
             name=schema_name,
@@ -316,8 +322,11 @@ async def get_schema_versions(
     """
 
     try:
-        schema_dict = agent.schema.get(
-            namespace=namespace, name=schema_name, version=semantic_version
+        schema_dict = await run_db(
+            agent.schema.get,
+            namespace=namespace,
+            name=schema_name,
+            version=semantic_version,
         )
     except SchemaDoesNotExistError:
         raise HTTPException(
@@ -348,8 +357,11 @@ async def download_schema(
     """
 
     try:
-        schema_dict = agent.schema.get(
-            namespace=namespace, name=schema_name, version=semantic_version
+        schema_dict = await run_db(
+            agent.schema.get,
+            namespace=namespace,
+            name=schema_name,
+            version=semantic_version,
         )
     except SchemaDoesNotExistError:
         raise HTTPException(
@@ -390,7 +402,8 @@ async def create_schema_version_file(
     schema_name = schema_name or schema_file.filename
 
     try:
-        agent.schema.add_version(
+        await run_db(
+            agent.schema.add_version,
             namespace=namespace,
             name=schema_name,
             version=version,
@@ -426,7 +439,8 @@ async def create_schema_version_json(
     """
 
     try:
-        agent.schema.add_version(
+        await run_db(
+            agent.schema.add_version,
             namespace=namespace,
             name=schema_name,
             version=schema_data.version,
@@ -497,8 +511,11 @@ async def delete_schema_version(
     """
 
     try:
-        agent.schema.delete_version(
-            namespace=namespace, name=schema_name, version=semantic_version
+        await run_db(
+            agent.schema.delete_version,
+            namespace=namespace,
+            name=schema_name,
+            version=semantic_version,
         )
     except SchemaDoesNotExistError:
         raise HTTPException(
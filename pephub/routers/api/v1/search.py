@@ -1,14 +1,16 @@
-from typing import List, Optional
+import asyncio
+import logging
+import os
+import time
+from typing import List, Optional, Tuple
 
 from dotenv import load_dotenv
 from fastapi import APIRouter, Depends
 from fastapi.responses import JSONResponse
-from fastembed.embedding import TextEmbedding as Embedding
 from pepdbagent import PEPDatabaseAgent
 from pepdbagent.models import NamespaceList
-from qdrant_client import QdrantClient
+from qdrant_client import AsyncQdrantClient, QdrantClient
 from qdrant_client.models import (
-    SparseVector,
     Prefetch,
     FusionQuery,
     Fusion,
@@ -17,24 +19,81 @@ from qdrant_client.models import (
     MatchValue,
     Filter,
 )
-from sentence_transformers import SparseEncoder
 
-from ....const import DEFAULT_QDRANT_COLLECTION_NAME
+from ....const import (
+    DEFAULT_QDRANT_COLLECTION_NAME,
+    DEFAULT_SEARCH_EXACT,
+    DEFAULT_SEARCH_HNSW_EF,
+    DEFAULT_SEARCH_LATENCY_BUDGET_MS,
+    DEFAULT_SEARCH_PREFETCH_LIMIT,
+    PKG_NAME,
+)
 from ....dependencies import (
+    get_async_qdrant,
     get_db,
+    get_embedding_batcher,
+    get_embedding_models,
     get_namespace_access_list,
     get_qdrant,
-    get_sentence_transformer,
-    get_sparse_model,
+    get_search_cache,
+    parse_boolean_env_var,
+    qdrant_query_latency,
 )
+from ....cache import GenerationalCache
+from ....embeddings import EmbeddingBatcher, EmbeddingModels, normalize_query
+from ....executor import run_db
+from ....metrics import register_stats
 from ...models import SearchQuery, SearchReturnModel
 from qdrant_client.models import ScoredPoint
 from pepdbagent.models import Namespace
 
 load_dotenv()
 
+_LOGGER = logging.getLogger(PKG_NAME)
+
 search = APIRouter(prefix="/api/v1/search", tags=["search"])
 
+SEARCH_LATENCY_BUDGET = (
+    float(os.environ.get("SEARCH_LATENCY_BUDGET_MS", DEFAULT_SEARCH_LATENCY_BUDGET_MS))
+    / 1000
+)
+
+SEARCH_EXACT = parse_boolean_env_var(
+    os.environ.get("SEARCH_EXACT", str(DEFAULT_SEARCH_EXACT))
+)
+SEARCH_HNSW_EF = int(os.environ.get("SEARCH_HNSW_EF", DEFAULT_SEARCH_HNSW_EF))
+SEARCH_PREFETCH_LIMIT = int(
+    os.environ.get("SEARCH_PREFETCH_LIMIT", DEFAULT_SEARCH_PREFETCH_LIMIT)
+)
+
+
+class SearchStats:
+    """
+    Count searches, and searches returned without namespace hits
+    """
+
+    def __init__(self):
+        self.searches = 0
+        self.partial = 0
+
+    def observe(self, partial: bool) -> None:
+        self.searches += 1
+        self.partial += int(partial)
+
+    def stats(self) -> dict:
+        return {
+            "latency_budget_ms": SEARCH_LATENCY_BUDGET * 1000,
+            "exact": SEARCH_EXACT,
+            "hnsw_ef": SEARCH_HNSW_EF,
+            "prefetch_limit": SEARCH_PREFETCH_LIMIT,
+            "searches": self.searches,
+            "partial": self.partial,
+        }
+
+
+search_stats = SearchStats()
+register_stats("search", search_stats.stats)
+
 
 @search.get(
     "/namespaces", summary="Search for namespaces", response_model=NamespaceList
@@ -45,118 +104,227 @@ async def search_for_namespaces(
     offset: Optional[int] = 0,
     agent: PEPDatabaseAgent = Depends(get_db),
 ) -> NamespaceList:
-    return agent.namespace.get(limit=limit, query=query or "", offset=offset)
+    return await run_db(
+        agent.namespace.get, limit=limit, query=query or "", offset=offset
+    )
+
+
+@search.get("/ready", summary="Check if semantic search is ready to serve requests")
+async def search_ready(
+    qdrant: QdrantClient = Depends(get_qdrant),
+    models: EmbeddingModels = Depends(get_embedding_models),
+):
+    """
+    Readiness of the search endpoint. Semantic search is ready, when qdrant is connected,
+    and the embedding models are loaded. Without qdrant, search falls back to SQL and is
+    always ready.
+    """
+    ready = qdrant is None or models.is_ready
+    return JSONResponse(
+        content={
+            "ready": ready,
+            "qdrant": qdrant is not None,
+            "models": models.status(),
+        },
+        status_code=200 if ready else 503,
+    )
+
+
+async def search_namespaces(
+    agent: PEPDatabaseAgent, query: SearchQuery, namespace_access: List[str]
+) -> List[Namespace]:
+    return (
+        await run_db(
+            agent.namespace.get,
+            query=query.query,
+            admin=namespace_access,
+            limit=query.limit,
+            offset=query.offset,
+        )
+    ).results
+
+
+async def search_qdrant(
+    qdrant: AsyncQdrantClient,
+    models: EmbeddingModels,
+    batcher: EmbeddingBatcher,
+    query: SearchQuery,
+) -> Tuple[List[ScoredPoint], int]:
+    """
+    Hybrid (dense + sparse + exact name match) semantic search in qdrant.
+
+    Dense and sparse candidates are retrieved with approximate (HNSW) search, unless
+    exact search is requested. Exactness, `hnsw_ef` and number of candidates can be set
+    per request, or per deployment with SEARCH_EXACT, SEARCH_HNSW_EF and
+    SEARCH_PREFETCH_LIMIT environment variables.
+    """
+    exact = SEARCH_EXACT if query.exact is None else query.exact
+    search_params = SearchParams(
+        exact=exact,
+        hnsw_ef=None if exact else (query.hnsw_ef or SEARCH_HNSW_EF),
+    )
+    prefetch_limit = query.prefetch_limit or SEARCH_PREFETCH_LIMIT
+
+    await models.wait_ready()
+    # embedded off the event loop, together with concurrent queries
+    dense_query, sparse_embeddings = await batcher.embed(query.query)
+
+    should_statement = [
+        FieldCondition(
+            key="name",
+            match=MatchValue(value=query.query),
+        )
+    ]
+
+    if sparse_embeddings:
+        hybrid_query = [
+            # Dense retrieval: semantic understanding
+            Prefetch(
+                query=dense_query,
+                using="dense",
+                limit=prefetch_limit,
+                params=search_params,
+            ),
+            # Sparse retrieval: exact technical term matching
+            Prefetch(
+                query=sparse_embeddings,
+                using="sparse",
+                limit=prefetch_limit,
+                params=search_params,
+            ),
+            # Exact match retrieval: precise filtering
+            Prefetch(filter=Filter(must=should_statement), limit=10),
+        ]
+    else:
+        hybrid_query = [
+            # Dense retrieval: semantic understanding
+            Prefetch(
+                query=dense_query,
+                using="dense",
+                limit=prefetch_limit,
+                params=search_params,
+            ),
+            # Exact match retrieval: precise filtering
+            Prefetch(filter=Filter(must=should_statement), limit=10),
+        ]
+
+    start = time.perf_counter()
+    query_response = await qdrant.query_points(
+        collection_name=DEFAULT_QDRANT_COLLECTION_NAME,
+        limit=query.limit,
+        offset=query.offset,
+        prefetch=hybrid_query,
+        query=FusionQuery(fusion=Fusion.RRF),
+        with_payload=True,
+        with_vectors=False,
+        search_params=search_params,
+        # query_filter=(
+        #     models.Filter(must=should_statement) if should_statement else None
+        # ),
+    )
+    qdrant_query_latency.observe(time.perf_counter() - start)
+    vector_results = query_response.points
+    return vector_results, len(vector_results)
+
+
+async def search_sql(
+    agent: PEPDatabaseAgent, query: SearchQuery
+) -> Tuple[List[ScoredPoint], int]:
+    """
+    Fallback to SQL search, when qdrant is not available
+    """
+    results = await run_db(
+        agent.annotation.get, query=query.query, limit=query.limit, offset=query.offset
+    )
+
+    # emulate qdrant response from the SQL search
+    # for frontend compatibility
+    parsed_results = [
+        ScoredPoint(
+            id=f"{r.namespace}/{r.name}:{r.tag}",
+            version=0,
+            score=1.0,  # SQL search, so we just set the score to 1.0
+            payload={
+                "description": r.description,
+                "registry": f"{r.namespace}/{r.name}:{r.tag}",
+            },
+            vector=None,
+        )
+        for r in results.results
+    ]
+    return parsed_results, results.count
 
 
 # perform a search
 @search.post("/", summary="Search for a PEP", response_model=SearchReturnModel)
 async def search_for_pep(
     query: SearchQuery,
-    qdrant: QdrantClient = Depends(get_qdrant),
-    model: Embedding = Depends(get_sentence_transformer),
-    model_sparse: SparseEncoder = Depends(get_sparse_model),
+    qdrant: AsyncQdrantClient = Depends(get_async_qdrant),
+    models: EmbeddingModels = Depends(get_embedding_models),
+    batcher: EmbeddingBatcher = Depends(get_embedding_batcher),
     agent: PEPDatabaseAgent = Depends(get_db),
     namespace_access: List[str] = Depends(get_namespace_access_list),
+    cache: GenerationalCache = Depends(get_search_cache),
 ) -> SearchReturnModel:
     """
     Perform a search for PEPs. This can be done using qdrant (semantic search),
     or with basic SQL string matches.
-    """
-    limit = query.limit
-    offset = query.offset
-    score_threshold = query.score_threshold
-
-    # get namespaces:
-    namespaces: list[Namespace] = agent.namespace.get(
-        query=query.query, admin=namespace_access, limit=limit, offset=offset
-    ).results
-
-    if qdrant is not None:
-        dense_query = list(list(model.embed(query.query))[0])
 
-        if model_sparse:
-            sparse_result = model_sparse.encode(query.query).coalesce()
-            sparse_embeddings = SparseVector(
-                indices=sparse_result.indices().tolist()[0],
-                values=sparse_result.values().tolist(),
-            )
-        else:
-            sparse_embeddings = None
+    Results are cached per query, search options and namespace access list, until
+    any project is written.
 
-        should_statement = [
-            FieldCondition(
-                key="name",
-                match=MatchValue(value=query.query),
-            )
-        ]
+    Namespaces and PEPs are searched concurrently. If namespace hits are not ready
+    within the latency budget after PEP results, they are left out, and the response
+    is marked as `partial`.
+    """
+    cache_key = (
+        normalize_query(query.query),
+        tuple(query.model_dump(exclude={"query"}).items()),
+        tuple(sorted(namespace_access)),
+    )
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached.model_copy(update={"query": query.query})
+    generation = cache.generation
 
-        if sparse_embeddings:
-            hybrid_query = [
-                # Dense retrieval: semantic understanding
-                Prefetch(query=dense_query, using="dense", limit=100),
-                # Sparse retrieval: exact technical term matching
-                Prefetch(query=sparse_embeddings, using="sparse", limit=100),
-                # Exact match retrieval: precise filtering
-                Prefetch(filter=Filter(must=should_statement), limit=10),
-            ]
+    namespaces_task = asyncio.create_task(
+        search_namespaces(agent, query, namespace_access)
+    )
+    try:
+        if qdrant is not None:
+            results, total = await search_qdrant(qdrant, models, batcher, query)
         else:
-            hybrid_query = [
-                # Dense retrieval: semantic understanding
-                Prefetch(query=dense_query, using="dense", limit=100),
-                # Exact match retrieval: precise filtering
-                Prefetch(filter=Filter(must=should_statement), limit=10),
-            ]
-
-        vector_results = qdrant.query_points(
-            collection_name=DEFAULT_QDRANT_COLLECTION_NAME,
-            limit=limit,
-            offset=offset,
-            prefetch=hybrid_query,
-            query=FusionQuery(fusion=Fusion.RRF),
-            with_payload=True,
-            with_vectors=False,
-            search_params=SearchParams(
-                exact=True,
-            ),
-            # query_filter=(
-            #     models.Filter(must=should_statement) if should_statement else None
-            # ),
-        ).points
+            results, total = await search_sql(agent, query)
+    except BaseException:
+        namespaces_task.cancel()
+        raise
 
-        return SearchReturnModel(
-            query=query.query,
-            results=vector_results,
-            namespace_hits=namespaces,
-            limit=limit,
-            offset=offset,
-            total=len(vector_results),
+    partial = False
+    try:
+        namespaces = await asyncio.wait_for(
+            asyncio.shield(namespaces_task), timeout=SEARCH_LATENCY_BUDGET
         )
+    except asyncio.TimeoutError:
+        # db query can't be interrupted, let it finish in the background
+        namespaces_task.add_done_callback(_discard_result)
+        namespaces = []
+        partial = True
+    search_stats.observe(partial)
 
-    else:
-        # fallback to SQL search
-        results = agent.annotation.get(query=query.query, limit=limit, offset=offset)
-
-        # emulate qdrant response from the SQL search
-        # for frontend compatibility
-        parsed_results = [
-            ScoredPoint(
-                id=f"{r.namespace}/{r.name}:{r.tag}",
-                version=0,
-                score=1.0,  # SQL search, so we just set the score to 1.0
-                payload={
-                    "description": r.description,
-                    "registry": f"{r.namespace}/{r.name}:{r.tag}",
-                },
-                vector=None,
-            )
-            for r in results.results
-        ]
+    response = SearchReturnModel(
+        query=query.query,
+        results=results,
+        namespace_hits=namespaces,
+        limit=query.limit,
+        offset=query.offset,
+        total=total,
+        partial=partial,
+    )
+    if not partial:
+        cache.set(cache_key, response, generation)
+    return response
 
-        return SearchReturnModel(
-            query=query.query,
-            results=parsed_results,
-            namespace_hits=namespaces,
-            limit=limit,
-            offset=offset,
-            total=results.count,
-        )
+
+def _discard_result(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        _LOGGER.warning(f"Namespace search failed: {task.exception()}")
@@ -3,8 +3,6 @@ import tempfile
 from typing import List, Optional, Tuple
 
 import eido
-import peppy
-import requests
 import yaml
 from fastapi import APIRouter, Depends, Form, UploadFile
 from fastapi.exceptions import HTTPException
@@ -16,35 +14,43 @@ from pepdbagent.const import LATEST_SCHEMA_VERSION
 from starlette.requests import Request
 from starlette.responses import JSONResponse
 
-from ...dependencies import DEFAULT_TAG, get_db
+from ...dependencies import DEFAULT_TAG, get_db, load_encoded_project
+from ...executor import ExecutorBusyError, ExecutorTimeoutError, run_cpu, run_db
+from ... import workers
+from ...schema_cache import SchemaCache, get_schema_cache
 from ...helpers import parse_user_file_upload, split_upload_files_on_init_file
 from ...const import MAX_PROCESSED_PROJECT_SIZE
 
-schemas_url = "https://schema.databio.org/list.json"
-schemas_to_test = requests.get(schemas_url).json()
-
 router = APIRouter(prefix="/api/v1/eido", tags=["eido"])
 
 
 @router.get("/schemas")
-async def status():
-    return JSONResponse(schemas_to_test)
+async def status(schema_cache: SchemaCache = Depends(get_schema_cache)):
+    return JSONResponse(schema_cache.get_schema_list())
 
 
 @router.get("/schemas/{namespace}/{project}")
-async def get_schema(request: Request, namespace: str, project: str):
+async def get_schema(
+    request: Request,
+    namespace: str,
+    project: str,
+    schema_cache: SchemaCache = Depends(get_schema_cache),
+):
     """
     Takes namespace and project values for a schema endpoint
     and returns a custom validator HTML page.
     """
-    # endpoint to schema.databio.org/...
-    # like pipelines/ProseqPEP.yaml
-
-    try:
-        schema = eido.read_schema(
-            f"https://schema.databio.org/{namespace}/{project}.yaml"
-        )[0]
-    except IndexError:
+    # schemas from schema.databio.org/...
+    # like pipelines/ProseqPEP.yaml, served from the local cache
+    schema = schema_cache.get_schema(namespace, project)
+    if schema is None:
+        if schema_cache.has_schema(namespace, project):
+            schema_cache.refresh_in_background()
+            raise HTTPException(
+                status_code=503,
+                detail="Schema is not cached yet. Please try again later.",
+                headers={"Retry-After": "10"},
+            )
         raise HTTPException(status_code=404, detail="Schema not found")
 
     return schema
@@ -88,7 +94,9 @@ async def validate(
         namespace, name, tag = registry_path_converter(pep_registry)
         tag = tag or DEFAULT_TAG
 
-        pep_annot = agent.annotation.get(namespace=namespace, name=name, tag=tag)
+        pep_annot = await run_db(
+            agent.annotation.get, namespace=namespace, name=name, tag=tag
+        )
 
         if pep_annot.results[0].number_of_samples > MAX_PROCESSED_PROJECT_SIZE:
             return {
@@ -97,7 +105,7 @@ async def validate(
                 "errors": ["Project is too large. Can't validate."],
             }
 
-        p = agent.project.get(namespace, name, tag, raw=False)
+        p = await load_encoded_project(agent, namespace, name, tag)
     else:
         init_file = parse_user_file_upload(pep_files)
         init_file, other_files = split_upload_files_on_init_file(pep_files, init_file)
@@ -115,7 +123,9 @@ async def validate(
                     with open(f"{dirpath}/{upload_file.filename}", "wb") as local_tmpf:
                         shutil.copyfileobj(upload_file.file, local_tmpf)
 
-            p = peppy.Project(f"{dirpath}/{init_file.filename}")
+            p = await run_cpu(
+                workers.load_project_files, f"{dirpath}/{init_file.filename}"
+            )
 
     if schema is None and schema_registry is None and schema_file is None:
         raise HTTPException(
@@ -131,7 +141,8 @@ async def validate(
         )
 
         try:
-            schema = agent.schema.get(
+            schema = await run_db(
+                agent.schema.get,
                 namespace=schema_namespace,
                 name=schema_name,
                 version=(
@@ -168,28 +179,26 @@ async def validate(
                     detail={"error": f"Schema is invalid: {str(e)}"},
                 )
 
-    # validate project
+    # validate project (in the CPU executor)
     try:
-        eido.validate_project(
-            p,
-            schema_dict,
-        )
+        errors_by_type = await run_cpu(workers.validate_project, p, schema_dict)
+    except (ExecutorBusyError, ExecutorTimeoutError):
+        raise
+    except Exception as e:
+        errors = [str(e)]
+        return {"valid": False, "error_type": "Schema", "errors": errors}
 
     # while we catch this, its still a 200 response since we want to
     # return the validation errors
-    except eido.exceptions.EidoValidationError as e:
-        error_type, property_names = await eido_error_string_converter(e)
+    if errors_by_type:
+        error_type, property_names = await eido_error_string_converter(
+            eido.exceptions.EidoValidationError("Validation failed", errors_by_type)
+        )
 
         return {"valid": False, "error_type": error_type, "errors": property_names}
 
-    except Exception as e:
-        errors = [str(e)]
-        return {"valid": False, "error_type": "Schema", "errors": errors}
-
     # everything passed, return valid
-    else:
-        # return project is valid
-        return {"valid": True, "errors": None}
+    return {"valid": True, "errors": None}
 
 
 async def eido_error_string_converter(
@@ -1,7 +1,12 @@
 from typing import List, Optional, Dict, Union
 
 from pepdbagent.const import DEFAULT_TAG
-from pepdbagent.models import UpdateItems, ListOfNamespaceInfo, Namespace
+from pepdbagent.models import (
+    AnnotationModel,
+    UpdateItems,
+    ListOfNamespaceInfo,
+    Namespace,
+)
 from pydantic import BaseModel, ConfigDict, Field
 
 from qdrant_client.models import ScoredPoint
@@ -23,6 +28,10 @@ class SearchQuery(BaseModel):
     limit: Optional[int] = 100
     offset: Optional[int] = 0
     score_threshold: Optional[float] = DEFAULT_QDRANT_SCORE_THRESHOLD
+    # vector search tuning, server defaults are used when not set
+    exact: Optional[bool] = None
+    hnsw_ef: Optional[int] = Field(None, ge=1, le=4096)
+    prefetch_limit: Optional[int] = Field(None, ge=1, le=1000)
 
 
 class SearchReturnModel(BaseModel):
@@ -32,6 +41,7 @@ class SearchReturnModel(BaseModel):
     limit: int
     offset: int
     total: int
+    partial: bool = False
 
 
 class RawValidationQuery(BaseModel):
@@ -134,6 +144,30 @@ class BaseEndpointResponseModel(VersionResponseModel):
 class SamplesResponseModel(BaseModel):
     count: int
     items: list
+    # set for paginated requests
+    total: Optional[int] = None
+    limit: Optional[int] = None
+    offset: Optional[int] = None
+    next_cursor: Optional[str] = None
+
+
+class DigestResponseModel(BaseModel):
+    registry: str
+    last_update_date: Optional[str] = None
+    project: str = Field(
+        description="Canonical digest of the project. Not the same value as `digest` of the annotation, which pepdbagent computes from the project as stored."
+    )
+    config: str
+    samples: str
+    subsamples: str
+    sample_digests: Optional[List[str]] = None
+
+
+class ProjectAnnotationResponse(AnnotationModel):
+    content_digest: Optional[str] = Field(
+        None,
+        description="Canonical digest of the project, `project` of the /digest endpoint. `digest` is pepdbagent's digest of the project as stored, a different value.",
+    )
 
 
 class ConfigResponseModel(BaseModel):
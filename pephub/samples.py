@@ -0,0 +1,494 @@
+import base64
+import csv
+import io
+import json
+from itertools import islice
+from typing import AsyncIterator, Dict, Iterator, List, NamedTuple, Optional, Set
+
+import pandas as pd
+import peppy
+from pepdbagent import PEPDatabaseAgent
+from pepdbagent.const import DEFAULT_TAG
+from peppy.const import (
+    CONFIG_KEY,
+    SAMPLE_NAME_ATTR,
+    SAMPLE_RAW_DICT_KEY,
+    SAMPLE_TABLE_INDEX_KEY,
+    SUBSAMPLE_NAME_ATTR,
+    SUBSAMPLE_RAW_LIST_KEY,
+)
+from .const import DEFAULT_EXPORT_CHUNK_SIZE, FILTER_EQUAL, FILTER_IN, FILTER_PREFIX
+from .db_adapter import (
+    get_matching_guids,
+    get_project_id,
+    get_sample_order,
+    open_session,
+    read_samples,
+)
+from .executor import run_db
+from .modifiers import Unsupported, apply_sample_modifiers
+
+
+class SamplesPage(NamedTuple):
+    items: List[dict]
+    total: int
+    # guid of the last sample of the page, None if there are no more samples
+    next_guid: Optional[str]
+
+
+def encode_cursor(guid: str) -> str:
+    """
+    Opaque cursor, that points to the sample after the given one
+    """
+    return base64.urlsafe_b64encode(json.dumps({"after": guid}).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> str:
+    """
+    Get guid of the sample, that the cursor points after
+
+    :raises ValueError: if the cursor is malformed
+    """
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))["after"]
+    except Exception:
+        raise ValueError(f"Invalid cursor: '{cursor}'")
+
+
+class SampleFilter(NamedTuple):
+    """
+    Filter on a sample attribute: `attribute==value`, `attribute=in=value1,value2`
+    or `attribute=prefix=value`. Values are compared as strings.
+    """
+
+    attribute: str
+    operator: str
+    values: List[str]
+
+    def matches(self, sample: dict) -> bool:
+        """
+        Check the condition on an (already loaded or processed) sample
+        """
+        value = sample.get(self.attribute)
+        if value is None:
+            return False
+        value = json.dumps(value) if isinstance(value, bool) else str(value)
+        if self.operator == FILTER_IN:
+            return value in self.values
+        if self.operator == FILTER_PREFIX:
+            return value.startswith(self.values[0])
+        return value == self.values[0]
+
+
+def parse_filter(expression: str) -> SampleFilter:
+    """
+    Parse filter expression, e.g. `genome==hg38`, `genome=in=hg38,mm10`,
+    `sample_name=prefix=ATAC`
+
+    :raises ValueError: if the expression is malformed
+    """
+    for operator in [FILTER_IN, FILTER_PREFIX, FILTER_EQUAL]:
+        attribute, found, value = expression.partition(operator)
+        if found and attribute:
+            values = value.split(",") if operator == FILTER_IN else [value]
+            return SampleFilter(attribute, operator, values)
+    raise ValueError(
+        f"Invalid filter: '{expression}'. Use 'attribute==value', "
+        f"'attribute=in=value1,value2' or 'attribute=prefix=value'"
+    )
+
+
+def iter_ordered_guids(
+    next_sample: Dict[Optional[str], str],
+    after: Optional[str] = None,
+    matching: Optional[Set[str]] = None,
+) -> Iterator[str]:
+    """
+    Walk the samples in project order, starting after the `after` sample.
+    If `matching` is given, only these samples are returned.
+    """
+    guid = next_sample.get(after)
+    while guid is not None:
+        if matching is None or guid in matching:
+            yield guid
+        guid = next_sample.get(guid)
+
+
+def select_columns(samples: List[dict], columns: Optional[List[str]]) -> List[dict]:
+    """
+    Keep only the given attributes of (already loaded or processed) samples
+    """
+    if not columns:
+        return samples
+    return [{column: sample.get(column) for column in columns} for sample in samples]
+
+
+def get_sample_guids(
+    agent: PEPDatabaseAgent,
+    namespace: str,
+    name: str,
+    tag: str = DEFAULT_TAG,
+    filters: Optional[List[SampleFilter]] = None,
+) -> List[str]:
+    """
+    Get guids of samples of a project that match the filters, in project order (blocking)
+
+    :raises ProjectNotFoundError: if the project doesn't exist
+    """
+    with open_session(agent) as session:
+        project_id = get_project_id(session, namespace, name, tag)
+        next_sample = get_sample_order(session, project_id)
+        matching = get_matching_guids(session, project_id, filters)
+    return list(iter_ordered_guids(next_sample, matching=matching))
+
+
+def get_samples(
+    agent: PEPDatabaseAgent,
+    guids: List[str],
+    columns: Optional[List[str]] = None,
+    with_id: bool = False,
+) -> List[dict]:
+    """
+    Read samples by guid, in the order of `guids` (blocking)
+    """
+    with open_session(agent) as session:
+        return read_samples(session, guids, with_id=with_id, columns=columns)
+
+
+async def iter_sample_chunks(
+    agent: PEPDatabaseAgent,
+    guids: List[str],
+    chunk_size: int = DEFAULT_EXPORT_CHUNK_SIZE,
+    columns: Optional[List[str]] = None,
+    with_id: bool = False,
+) -> AsyncIterator[List[dict]]:
+    """
+    Read samples in chunks, so that only one chunk is held in memory at a time
+    """
+    for start in range(0, len(guids), chunk_size):
+        yield await run_db(
+            get_samples, agent, guids[start : start + chunk_size], columns, with_id
+        )
+
+
+async def stream_samples_ndjson(
+    agent: PEPDatabaseAgent,
+    guids: List[str],
+    chunk_size: int = DEFAULT_EXPORT_CHUNK_SIZE,
+    columns: Optional[List[str]] = None,
+) -> AsyncIterator[str]:
+    """
+    Stream raw samples as newline-delimited JSON, one sample per line
+    """
+    async for chunk in iter_sample_chunks(agent, guids, chunk_size, columns):
+        yield "".join(json.dumps(sample) + "\n" for sample in chunk)
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    return value
+
+
+async def stream_samples_csv(
+    agent: PEPDatabaseAgent,
+    guids: List[str],
+    chunk_size: int = DEFAULT_EXPORT_CHUNK_SIZE,
+    columns: Optional[List[str]] = None,
+) -> AsyncIterator[str]:
+    """
+    Stream raw samples as CSV.
+
+    Samples don't have to share attributes, so unless `columns` are given, samples are
+    read twice: first to collect the columns for the header (in order of appearance),
+    then to write the rows.
+    """
+    if not columns:
+        columns = {}
+        async for chunk in iter_sample_chunks(agent, guids, chunk_size):
+            for sample in chunk:
+                columns.update(dict.fromkeys(sample))
+        columns = list(columns)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()
+    async for chunk in iter_sample_chunks(agent, guids, chunk_size, columns):
+        buffer.seek(0)
+        buffer.truncate()
+        for sample in chunk:
+            writer.writerow([_csv_value(sample.get(column)) for column in columns])
+        yield buffer.getvalue()
+
+
+def get_samples_page(
+    agent: PEPDatabaseAgent,
+    namespace: str,
+    name: str,
+    tag: str = DEFAULT_TAG,
+    limit: Optional[int] = 1000,
+    offset: int = 0,
+    after: Optional[str] = None,
+    with_id: bool = False,
+    filters: Optional[List[SampleFilter]] = None,
+    columns: Optional[List[str]] = None,
+) -> SamplesPage:
+    """
+    Get a page of raw samples of a project, in project order (blocking).
+
+    Only the ordering keys of all samples are read; sample data is read just for
+    the samples on the page. Filters and column selection are done by the database.
+
+    :param agent: pepdbagent connection
+    :param namespace: project namespace
+    :param name: project name
+    :param tag: project tag
+    :param limit: maximum number of samples on the page, None for all samples
+    :param offset: number of samples to skip (after the `after` sample, if given)
+    :param after: guid of the sample, after which the page starts (see `decode_cursor`)
+    :param with_id: add sample guid to each sample
+    :param filters: return only samples that match all filters
+    :param columns: return only these sample attributes
+    :raises ProjectNotFoundError: if the project doesn't exist
+    :raises ValueError: if `after` is not a sample of the project
+    """
+    with open_session(agent) as session:
+        project_id = get_project_id(session, namespace, name, tag)
+        next_sample = get_sample_order(session, project_id)
+        if after is not None and after not in next_sample.values():
+            raise ValueError(f"Sample '{after}' is not in the project")
+        matching = get_matching_guids(session, project_id, filters)
+
+        ordered = iter_ordered_guids(next_sample, after, matching)
+        stop = offset + limit if limit is not None else None
+        page_guids = list(islice(ordered, offset, stop))
+        has_more = next(ordered, None) is not None
+
+        items = read_samples(session, page_guids, with_id=with_id, columns=columns)
+
+    return SamplesPage(
+        items=items,
+        total=len(next_sample) if matching is None else len(matching),
+        next_guid=page_guids[-1] if has_more and page_guids else None,
+    )
+
+
+def sample_name(sample: dict, index: str = SAMPLE_NAME_ATTR) -> str:
+    return str(sample.get(index))
+
+
+class SampleTableProfile:
+    """
+    Properties of a whole sample table, that processing of every sample depends on.
+
+    peppy loads the sample table into a data frame: every sample gets every column
+    (missing values become ""), integers of numeric columns with floats or missing
+    values become floats, values of other columns are kept as they are, and samples
+    with the same name are merged. The profile is collected in one pass over the
+    samples, so that chunks of samples can then be processed independently (see
+    `normalize_samples` and `sample_table`).
+    """
+
+    def __init__(self, index: str = SAMPLE_NAME_ATTR):
+        """
+        :param index: sample table index attribute (sample name)
+        """
+        self.index = index
+        self.count = 0
+        self._columns: Dict[str, None] = {}
+        self._missing: Set[str] = set()
+        self._floats: Set[str] = set()
+        self._non_numeric: Set[str] = set()
+        self._names: Set[str] = set()
+        self.duplicated_names: Set[str] = set()
+
+    def update(self, samples: List[dict]) -> None:
+        for sample in samples:
+            for column, value in sample.items():
+                if column not in self._columns:
+                    self._columns[column] = None
+                    if self.count:
+                        self._missing.add(column)
+                if value is None:
+                    self._missing.add(column)
+                elif isinstance(value, float):
+                    self._floats.add(column)
+                elif isinstance(value, bool) or not isinstance(value, int):
+                    self._non_numeric.add(column)
+            if len(sample) < len(self._columns):
+                self._missing.update(c for c in self._columns if c not in sample)
+
+            name = sample_name(sample, self.index)
+            if name in self._names:
+                self.duplicated_names.add(name)
+            self._names.add(name)
+            self.count += 1
+
+    @property
+    def columns(self) -> List[str]:
+        """
+        All attributes, in order of appearance
+        """
+        return list(self._columns)
+
+    @property
+    def float_columns(self) -> List[str]:
+        """
+        Numeric attributes, that pandas stores as floats
+        """
+        return [
+            column
+            for column in self._columns
+            if column not in self._non_numeric
+            and (column in self._floats or column in self._missing)
+        ]
+
+    @property
+    def object_columns(self) -> List[str]:
+        """
+        Attributes with non-numeric values, that pandas stores as objects (a chunk of
+        their values may be numeric only)
+        """
+        return [column for column in self._columns if column in self._non_numeric]
+
+    @property
+    def processed_count(self) -> int:
+        """
+        Number of samples after processing (samples with the same name are merged)
+        """
+        return len(self._names)
+
+
+def normalize_samples(
+    samples: List[dict], columns: List[str], float_columns: List[str]
+) -> List[dict]:
+    """
+    Give samples the values they have in the data frame of the whole sample table
+    (see `SampleTableProfile`), so that any subset of them is processed the same.
+    """
+    float_columns = set(float_columns)
+    normalized = []
+    for sample in samples:
+        row = {}
+        for column in columns:
+            value = sample.get(column)
+            if value is None:
+                value = ""
+            elif column in float_columns and isinstance(value, int):
+                value = float(value)
+            row[column] = value
+        normalized.append(row)
+    return normalized
+
+
+def sample_table(
+    rows: List[dict], columns: List[str], object_columns: List[str]
+) -> pd.DataFrame:
+    """
+    Data frame of normalized rows (see `normalize_samples`), with the column types of
+    the whole table: pandas infers them from the rows, except for `object_columns`.
+    """
+    object_columns = set(object_columns)
+    return pd.DataFrame(
+        {
+            column: pd.Series(
+                [row[column] for row in rows],
+                dtype=object if column in object_columns else None,
+            )
+            for column in columns
+        },
+        columns=columns,
+    )
+
+
+class SubsampleTable(NamedTuple):
+    # normalized rows of a subsample table, by sample name
+    rows: Dict[str, List[dict]]
+    columns: List[str]
+    object_columns: List[str]
+
+
+def group_subsamples(
+    subsamples: Optional[List[List[dict]]], index: str = SAMPLE_NAME_ATTR
+) -> List[SubsampleTable]:
+    """
+    Normalize subsample tables, and group their rows by sample name, so that rows of
+    any subset of samples are processed like the whole table. Rows are named by their
+    number in the whole table, like peppy does, unless the table has subsample names.
+    """
+    tables = []
+    for table in subsamples or []:
+        profile = SampleTableProfile(index)
+        profile.update(table)
+        columns = profile.columns
+        named = SUBSAMPLE_NAME_ATTR in columns
+        if not named:
+            columns = columns + [SUBSAMPLE_NAME_ATTR]
+        rows = {}
+        normalized = normalize_samples(table, profile.columns, profile.float_columns)
+        for number, row in enumerate(normalized):
+            if not named:
+                row[SUBSAMPLE_NAME_ATTR] = str(number)
+            rows.setdefault(sample_name(row, index), []).append(row)
+        tables.append(SubsampleTable(rows, columns, profile.object_columns))
+    return tables
+
+
+def process_samples(
+    config: dict,
+    samples: List[dict],
+    subsamples: list,
+    columns: Optional[List[str]] = None,
+    float_columns: Optional[List[str]] = None,
+    object_columns: Optional[List[str]] = None,
+    subsample_columns: Optional[List[List[str]]] = None,
+) -> List[dict]:
+    """
+    Process a subset of samples of a project (sample modifiers, subsample merge).
+    Samples without subsamples are processed by the columnar engine
+    (`modifiers.apply_sample_modifiers`), others with peppy.
+
+    :param config: project config
+    :param samples: raw samples to process
+    :param subsamples: subsample tables of the project, normalized (see
+        `group_subsamples`) if `subsample_columns` are given
+    :param columns: all attributes of the sample table, see `SampleTableProfile`
+    :param float_columns: float attributes of the sample table
+    :param object_columns: non-numeric attributes of the sample table
+    :param subsample_columns: columns and non-numeric columns of every subsample table
+    :return: processed samples
+    """
+    index = config.get(SAMPLE_TABLE_INDEX_KEY, SAMPLE_NAME_ATTR)
+    names = {sample.get(index) for sample in samples}
+    subsamples = [
+        [row for row in table if row.get(index) in names] for table in subsamples
+    ]
+    if columns is not None:
+        samples = sample_table(
+            normalize_samples(samples, columns, float_columns or []),
+            columns,
+            object_columns or [],
+        )
+    if subsample_columns is not None:
+        subsamples = [
+            sample_table(table, table_columns, table_object_columns) if table else []
+            for table, (table_columns, table_object_columns) in zip(
+                subsamples, subsample_columns
+            )
+        ]
+    if not any(len(table) for table in subsamples):
+        try:
+            return apply_sample_modifiers(config, samples)
+        except Unsupported:
+            pass
+    project = peppy.Project.from_dict(
+        {
+            CONFIG_KEY: config,
+            SAMPLE_RAW_DICT_KEY: samples,
+            SUBSAMPLE_RAW_LIST_KEY: [table for table in subsamples if len(table)],
+        }
+    )
+    return [sample.to_dict() for sample in project.samples]
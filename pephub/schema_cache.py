@@ -0,0 +1,212 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import eido
+import requests
+import yaml
+
+from .const import (
+    DEFAULT_EIDO_SCHEMAS_CACHE_PATH,
+    DEFAULT_EIDO_SCHEMAS_RETRY_INTERVAL,
+    DEFAULT_EIDO_SCHEMAS_SOURCE,
+    DEFAULT_EIDO_SCHEMAS_TTL,
+    EIDO_SCHEMAS_SNAPSHOT_PATH,
+    PKG_NAME,
+)
+
+_LOGGER = logging.getLogger(PKG_NAME)
+
+
+def fetch_schema_list(source: str) -> Dict[str, Any]:
+    """
+    Fetch list of schemas (list.json) from schema server, or from a local mirror of it
+
+    :param source: url of the schema server (e.g. https://schema.databio.org) or path to a local directory
+    """
+    if source.startswith("http://") or source.startswith("https://"):
+        response = requests.get(f"{source}/list.json", timeout=10)
+        response.raise_for_status()
+        return response.json()
+    with open(os.path.join(source, "list.json")) as f:
+        return json.load(f)
+
+
+def fetch_schema(source: str, namespace: str, name: str) -> dict:
+    """
+    Fetch single schema from schema server, or from a local mirror of it
+
+    :param source: url of the schema server or path to a local directory
+    :param namespace: schema namespace (e.g. pipelines)
+    :param name: schema name (e.g. ProseqPEP)
+    """
+    if source.startswith("http://") or source.startswith("https://"):
+        path = f"{source}/{namespace}/{name}.yaml"
+    else:
+        path = os.path.join(source, namespace, f"{name}.yaml")
+    return eido.read_schema(path)[0]
+
+
+class SchemaCache:
+    """
+    On-disk cache of the schemas served by the eido router.
+
+    Requests are always served from the cache. Remote schema server is only contacted by a
+    background refresh, that is started when the cache is older than `ttl`. After a failed
+    refresh, the next one is started no sooner than `retry_interval` later. If there is no
+    cache on disk, the snapshot bundled with pephub is used until the first refresh succeeds.
+    """
+
+    def __init__(
+        self,
+        cache_path: str,
+        ttl: int,
+        list_fetcher: Callable[[], Dict[str, Any]],
+        schema_fetcher: Callable[[str, str], dict],
+        snapshot_path: Optional[str] = EIDO_SCHEMAS_SNAPSHOT_PATH,
+        retry_interval: int = DEFAULT_EIDO_SCHEMAS_RETRY_INTERVAL,
+    ):
+        """
+        :param cache_path: path to the json file with the cached schemas
+        :param ttl: time (in seconds) after which the cache is refreshed
+        :param list_fetcher: function that returns list of available schemas
+        :param schema_fetcher: function that returns schema by namespace and name
+        :param snapshot_path: yaml file with list of schemas, used when there is no cache on disk
+        :param retry_interval: time (in seconds) to wait after a failed refresh
+        """
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self._list_fetcher = list_fetcher
+        self._schema_fetcher = schema_fetcher
+        self._snapshot_path = snapshot_path
+        self.retry_interval = retry_interval
+        self._schema_list: Dict[str, Any] = {}
+        self._schemas: Dict[str, dict] = {}
+        self._fetched_at = 0.0
+        self._failed_at = 0.0
+        self._lock = threading.Lock()
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._load()
+
+    @property
+    def is_stale(self) -> bool:
+        return time.time() - self._fetched_at > self.ttl
+
+    def _load(self) -> None:
+        """
+        Load cache from disk, or from the bundled snapshot
+        """
+        try:
+            with open(self.cache_path) as f:
+                cached = json.load(f)
+            self._schema_list = cached["schema_list"]
+            self._schemas = cached["schemas"]
+            self._fetched_at = cached["fetched_at"]
+            return
+        except FileNotFoundError:
+            pass
+        except (json.JSONDecodeError, KeyError, TypeError) as e:
+            _LOGGER.warning(f"Ignoring corrupted schema cache '{self.cache_path}': {e}")
+
+        if self._snapshot_path and os.path.exists(self._snapshot_path):
+            with open(self._snapshot_path) as f:
+                self._schema_list = yaml.safe_load(f) or {}
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {
+                    "fetched_at": self._fetched_at,
+                    "schema_list": self._schema_list,
+                    "schemas": self._schemas,
+                },
+                f,
+            )
+        os.replace(tmp_path, self.cache_path)
+
+    def refresh(self) -> None:
+        """
+        Fetch list of schemas and every schema in it, and save them to disk (blocking).
+        Schemas that can't be fetched keep their previously cached version.
+        """
+        schema_list = self._list_fetcher()
+        schemas = dict(self._schemas)
+        for registry in schema_list:
+            try:
+                namespace, name = registry.split("/", 1)
+                schemas[registry] = self._schema_fetcher(namespace, name)
+            except Exception as e:
+                _LOGGER.warning(f"Could not fetch schema '{registry}': {e}")
+
+        with self._lock:
+            self._schema_list = schema_list
+            self._schemas = schemas
+            self._fetched_at = time.time()
+            self._save()
+        _LOGGER.info(f"Schema cache refreshed: {len(schemas)} schemas")
+
+    def refresh_in_background(self) -> None:
+        """
+        Start a background refresh, if one is not running already
+        """
+        with self._lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return
+            self._refresh_thread = threading.Thread(
+                target=self._refresh, name="pephub-schema-refresh", daemon=True
+            )
+            self._refresh_thread.start()
+
+    def _refresh(self) -> None:
+        try:
+            self.refresh()
+        except Exception as e:
+            self._failed_at = time.time()
+            _LOGGER.warning(f"Could not refresh schema cache: {e}")
+
+    def _refresh_if_stale(self) -> None:
+        if self.is_stale and time.time() - self._failed_at > self.retry_interval:
+            self.refresh_in_background()
+
+    def get_schema_list(self) -> Dict[str, Any]:
+        """
+        Get list of available schemas
+        """
+        self._refresh_if_stale()
+        return self._schema_list
+
+    def has_schema(self, namespace: str, name: str) -> bool:
+        return f"{namespace}/{name}" in self._schema_list
+
+    def get_schema(self, namespace: str, name: str) -> Optional[dict]:
+        """
+        Get cached schema, None if it's not in the cache (yet)
+        """
+        self._refresh_if_stale()
+        return self._schemas.get(f"{namespace}/{name}")
+
+
+_schemas_source = os.environ.get("EIDO_SCHEMAS_SOURCE", DEFAULT_EIDO_SCHEMAS_SOURCE)
+
+schema_cache = SchemaCache(
+    cache_path=os.environ.get("EIDO_SCHEMAS_CACHE", DEFAULT_EIDO_SCHEMAS_CACHE_PATH),
+    ttl=int(os.environ.get("EIDO_SCHEMAS_TTL", DEFAULT_EIDO_SCHEMAS_TTL)),
+    retry_interval=int(
+        os.environ.get(
+            "EIDO_SCHEMAS_RETRY_INTERVAL", DEFAULT_EIDO_SCHEMAS_RETRY_INTERVAL
+        )
+    ),
+    list_fetcher=lambda: fetch_schema_list(_schemas_source),
+    schema_fetcher=lambda namespace, name: fetch_schema(
+        _schemas_source, namespace, name
+    ),
+)
+
+
+def get_schema_cache() -> SchemaCache:
+    return schema_cache
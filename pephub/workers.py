@@ -0,0 +1,124 @@
+import functools
+import json
+from typing import Callable, Dict, List, Optional
+
+import eido
+import peppy
+from eido.conversion import pep_conversion_plugins
+from eido.exceptions import EidoValidationError
+from peppy.const import (
+    AMENDMENTS_KEY,
+    CONFIG_FILE_KEY,
+    CONFIG_KEY,
+    DESC_KEY,
+    MAX_PROJECT_SAMPLES_REPR,
+    NAME_KEY,
+    PROJ_MODS_KEY,
+    SAMPLE_RAW_DICT_KEY,
+)
+
+from .samples import process_samples as _process_samples
+
+# CPU-bound peppy and eido tasks, run in worker processes (see `executor.run_cpu`).
+# Projects are handed off as encoded raw projects (`ProjectCache.encode`) and results
+# are plain data, so no peppy objects cross the process boundary.
+
+
+@functools.lru_cache(maxsize=1)
+def _filters() -> Dict[str, Callable]:
+    # `eido.convert_project` scans the entry points on every call
+    return pep_conversion_plugins()
+
+
+def _load(project: bytes) -> peppy.Project:
+    return peppy.Project.from_dict(json.loads(project))
+
+
+def process_project(project: bytes) -> List[dict]:
+    """
+    Process samples of a project with peppy
+
+    :param project: encoded raw project
+    :return: processed samples
+    """
+    return [sample.to_dict() for sample in _load(project).samples]
+
+
+def process_samples(project: bytes) -> List[dict]:
+    """
+    Process a subset of samples of a project, see `samples.process_samples`
+
+    :param project: encoded raw project with the subset of samples
+    :return: processed samples
+    """
+    return _process_samples(**json.loads(project))
+
+
+def convert_project(project: bytes, filter_name: str) -> Dict[str, str]:
+    """
+    Run an eido filter on a project
+
+    :param project: encoded raw project
+    :param filter_name: name of the filter
+    :return: filter result, output name mapped to its content
+    """
+    return _filters()[filter_name](_load(project))
+
+
+def describe_project(config: dict, names: List[str], count: int) -> Dict[str, str]:
+    """
+    Result of the eido `basic` filter (`str` of the peppy project), without processing
+    the whole project
+
+    :param config: project config
+    :param names: names of the first processed samples (at least as many as peppy
+        shows, if there are that many samples)
+    :param count: number of processed samples
+    :return: filter result
+    """
+    # the rest of the description depends on the config only
+    project = peppy.Project.from_dict({CONFIG_KEY: config, SAMPLE_RAW_DICT_KEY: []})
+    description = "Project"
+    if project.get(NAME_KEY) is not None:
+        description += f" '{project[NAME_KEY]}'"
+    if project.get(CONFIG_FILE_KEY) is not None:
+        description += f" ({project[CONFIG_FILE_KEY]})"
+    if project.get(DESC_KEY) is not None:
+        description += f"\n{DESC_KEY}: {project[DESC_KEY]}"
+    if count:
+        description += f"\n{count} samples"
+        if count > MAX_PROJECT_SAMPLES_REPR:
+            description += f" (showing first {MAX_PROJECT_SAMPLES_REPR})"
+        description += f": {', '.join(names[:MAX_PROJECT_SAMPLES_REPR])}"
+    else:
+        description += " 0 samples"
+    description += f"\nSections: {', '.join(project[CONFIG_KEY])}"
+    modifiers = project[CONFIG_KEY].get(PROJ_MODS_KEY) or {}
+    if AMENDMENTS_KEY in modifiers:
+        description += f"\nAmendments: {', '.join(modifiers[AMENDMENTS_KEY])}"
+    return {"project": description}
+
+
+def validate_project(project: bytes, schema: dict) -> Optional[dict]:
+    """
+    Validate a project against a schema with eido
+
+    :param project: encoded raw project
+    :param schema: schema to validate against
+    :return: errors by type (see `EidoValidationError`), None if the project is valid
+    """
+    try:
+        eido.validate_project(_load(project), schema)
+    except EidoValidationError as e:
+        return e.errors_by_type
+    return None
+
+
+def load_project_files(path: str) -> bytes:
+    """
+    Load a project from files (e.g. an upload), and encode it as a raw project
+
+    :param path: path to the project config or sample table
+    """
+    project = peppy.Project(path).to_dict(extended=True, orient="records")
+    return json.dumps(project, separators=(",", ":"), default=str).encode()
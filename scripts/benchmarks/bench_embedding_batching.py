@@ -0,0 +1,120 @@
+"""
+Compare throughput of batched and unbatched query embedding.
+
+Sends `--queries` unique search queries, `--concurrency` at a time, and embeds them
+either one by one in a thread pool (how search worked before micro-batching), or
+through `EmbeddingBatcher`. Requires fastembed (and sentence-transformers for the
+sparse model).
+
+Usage:
+
+    python scripts/benchmarks/bench_embedding_batching.py --queries 2000 --concurrency 64
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+
+from fastapi.concurrency import run_in_threadpool
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from pephub.const import DENSE_ENCODER_MODEL, SPARSE_ENCODER_MODEL  # noqa: E402
+from pephub.embeddings import EmbeddingBatcher, EmbeddingModels  # noqa: E402
+
+WORDS = [
+    "ATAC-seq",
+    "ChIP-seq",
+    "RNA",
+    "hg38",
+    "mm10",
+    "K562",
+    "liver",
+    "single cell",
+    "methylation",
+    "tumor",
+    "CTCF",
+    "enhancer",
+]
+
+
+def build_argparser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark query embedding batching")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--wait-ms", type=float, default=5)
+    parser.add_argument("--dense-model", default=DENSE_ENCODER_MODEL)
+    parser.add_argument(
+        "--sparse-model",
+        default=SPARSE_ENCODER_MODEL,
+        help="Sparse model name, 'none' to disable",
+    )
+    return parser
+
+
+def make_queries(n: int) -> list:
+    # unique queries, so that the query embedding cache never hits
+    run_id = uuid.uuid4().hex[:8]
+    return [
+        f"{WORDS[i % len(WORDS)]} {WORDS[(i * 7) % len(WORDS)]} {run_id}-{i}"
+        for i in range(n)
+    ]
+
+
+async def run(embed, queries: list, concurrency: int) -> tuple:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(query: str):
+        async with semaphore:
+            start = time.perf_counter()
+            await embed(query)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one(q) for q in queries])
+    return time.perf_counter() - start, latencies
+
+
+def report(name: str, elapsed: float, latencies: list) -> None:
+    latencies = sorted(latencies)
+    print(
+        f"{name:>10}: {len(latencies) / elapsed:8.1f} queries/s, "
+        f"p50 {statistics.median(latencies) * 1000:7.1f}ms, "
+        f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:7.1f}ms"
+    )
+
+
+async def main():
+    args = build_argparser().parse_args()
+    sparse_model = None if args.sparse_model == "none" else args.sparse_model
+    models = EmbeddingModels(args.dense_model, sparse_model)
+    models.load()
+    models.embed_query("warm up")
+
+    async def unbatched(query: str):
+        return await run_in_threadpool(models.embed_query, query)
+
+    batcher = EmbeddingBatcher(
+        models, max_batch_size=args.batch_size, max_wait_ms=args.wait_ms
+    )
+
+    report(
+        "unbatched",
+        *await run(unbatched, make_queries(args.queries), args.concurrency),
+    )
+    report(
+        "batched",
+        *await run(batcher.embed, make_queries(args.queries), args.concurrency),
+    )
+    stats = batcher.stats()
+    print(f"mean batch size: {stats['embedded_queries'] / stats['batches']:.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
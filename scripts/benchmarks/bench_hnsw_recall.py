@@ -0,0 +1,230 @@
+"""
+Measure recall@k and latency of approximate (HNSW) search against exact search.
+
+Builds a synthetic corpus (clustered dense vectors + random sparse vectors) in a
+qdrant server, and runs the hybrid query of the search endpoint in exact mode, and in
+approximate mode for every `--ef` value. Recall@k is the fraction of exact top-k
+results that approximate search returns.
+
+Start a local qdrant first, e.g.:
+
+    docker run -p 6333:6333 qdrant/qdrant
+
+Usage:
+
+    python scripts/benchmarks/bench_hnsw_recall.py --points 100000 --ef 16 32 64 128 256
+
+In-process qdrant (`--url :memory:`) always searches exhaustively, so it can only be
+used to check that the script works.
+"""
+
+import argparse
+import statistics
+import time
+import warnings
+from typing import List, Optional
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.models import (
+    CollectionStatus,
+    Distance,
+    Fusion,
+    FusionQuery,
+    HnswConfigDiff,
+    PointStruct,
+    Prefetch,
+    SearchParams,
+    SparseVector,
+    SparseVectorParams,
+    VectorParams,
+)
+
+COLLECTION = "pephub_hnsw_benchmark"
+DIM = 384
+VOCAB = 30_000
+CLUSTERS = 200
+
+
+def build_argparser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark HNSW recall and latency")
+    parser.add_argument("--url", default="http://localhost:6333", help="Qdrant url")
+    parser.add_argument("--points", type=int, default=100_000, help="Collection size")
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries")
+    parser.add_argument("-k", type=int, default=10, help="Results per query")
+    parser.add_argument(
+        "--ef", type=int, nargs="+", default=[16, 32, 64, 128, 256], help="hnsw_ef"
+    )
+    parser.add_argument(
+        "--prefetch-limit", type=int, default=100, help="Candidates per prefetch"
+    )
+    parser.add_argument("--m", type=int, default=16, help="HNSW m")
+    parser.add_argument(
+        "--ef-construct", type=int, default=100, help="HNSW ef_construct"
+    )
+    parser.add_argument("--batch-size", type=int, default=1_000, help="Upsert batch")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--keep", action="store_true", help="Reuse collection if it exists"
+    )
+    return parser
+
+
+def random_sparse(rng: np.random.Generator) -> SparseVector:
+    indices = np.sort(rng.choice(VOCAB, size=40, replace=False))
+    return SparseVector(indices=indices.tolist(), values=rng.random(40).tolist())
+
+
+def cluster_centers(seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).normal(0, 1, size=(CLUSTERS, DIM))
+
+
+def dense_vectors(rng: np.random.Generator, centers: np.ndarray, n: int) -> np.ndarray:
+    """
+    Points scattered around cluster centers: real embeddings of PEP descriptions are
+    far from uniform, and uniform random vectors are a misleadingly hard case for HNSW
+    """
+    labels = rng.integers(0, len(centers), size=n)
+    return (centers[labels] + rng.normal(0, 0.5, size=(n, DIM))).astype(np.float32)
+
+
+def build_collection(client: QdrantClient, args: argparse.Namespace) -> None:
+    if client.collection_exists(COLLECTION):
+        if args.keep:
+            return
+        client.delete_collection(COLLECTION)
+    client.create_collection(
+        collection_name=COLLECTION,
+        vectors_config={"dense": VectorParams(size=DIM, distance=Distance.COSINE)},
+        sparse_vectors_config={"sparse": SparseVectorParams()},
+        hnsw_config=HnswConfigDiff(m=args.m, ef_construct=args.ef_construct),
+    )
+
+    rng = np.random.default_rng(args.seed)
+    centers = cluster_centers(args.seed)
+    start = time.perf_counter()
+    for offset in range(0, args.points, args.batch_size):
+        n = min(args.batch_size, args.points - offset)
+        vectors = dense_vectors(rng, centers, n)
+        client.upsert(
+            COLLECTION,
+            points=[
+                PointStruct(
+                    id=offset + i,
+                    vector={"dense": vectors[i].tolist(), "sparse": random_sparse(rng)},
+                    payload={"name": f"project_{offset + i}"},
+                )
+                for i in range(n)
+            ],
+            # only the last batch waits, so that all points are stored before indexing
+            wait=offset + n >= args.points,
+        )
+    print(f"uploaded {args.points} points in {time.perf_counter() - start:.1f}s")
+
+
+def wait_for_index(client: QdrantClient, timeout: float = 3600) -> None:
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        info = client.get_collection(COLLECTION)
+        if info.status == CollectionStatus.GREEN:
+            print(
+                f"index ready in {time.perf_counter() - start:.1f}s "
+                f"({info.indexed_vectors_count} indexed vectors)"
+            )
+            return
+        time.sleep(1)
+    raise TimeoutError("Collection was not indexed in time")
+
+
+def search(
+    client: QdrantClient,
+    dense: List[float],
+    sparse: SparseVector,
+    params: SearchParams,
+    args: argparse.Namespace,
+) -> List[int]:
+    """
+    Hybrid query of the search endpoint (without the exact name match prefetch)
+    """
+    response = client.query_points(
+        collection_name=COLLECTION,
+        prefetch=[
+            Prefetch(
+                query=dense, using="dense", limit=args.prefetch_limit, params=params
+            ),
+            Prefetch(
+                query=sparse, using="sparse", limit=args.prefetch_limit, params=params
+            ),
+        ],
+        query=FusionQuery(fusion=Fusion.RRF),
+        limit=args.k,
+        with_payload=False,
+    )
+    return [point.id for point in response.points]
+
+
+def run_mode(
+    client: QdrantClient,
+    queries: list,
+    params: SearchParams,
+    args: argparse.Namespace,
+    exact_results: Optional[List[List[int]]] = None,
+) -> List[List[int]]:
+    results, latencies = [], []
+    for dense, sparse in queries:
+        start = time.perf_counter()
+        results.append(search(client, dense, sparse, params, args))
+        latencies.append(time.perf_counter() - start)
+
+    latencies.sort()
+    p99 = latencies[max(int(len(latencies) * 0.99) - 1, 0)]
+    if exact_results is None:
+        name, recall = "exact", 1.0
+    else:
+        name = f"ef={params.hnsw_ef}"
+        recall = statistics.mean(
+            len(set(found) & set(expected)) / max(len(expected), 1)
+            for found, expected in zip(results, exact_results)
+        )
+    print(
+        f"{name:>8}: recall@{args.k} {recall:.4f}, "
+        f"p50 {statistics.median(latencies) * 1000:7.2f}ms, p99 {p99 * 1000:7.2f}ms"
+    )
+    return results
+
+
+def main():
+    args = build_argparser().parse_args()
+    if args.url == ":memory:":
+        # in-process qdrant warns that it ignores search params
+        warnings.filterwarnings("ignore", message="Local mode")
+        client = QdrantClient(":memory:")
+    else:
+        client = QdrantClient(url=args.url, timeout=60)
+
+    build_collection(client, args)
+    if args.url != ":memory:":
+        wait_for_index(client)
+
+    # queries come from the same clusters as the corpus
+    rng = np.random.default_rng(args.seed + 1)
+    centers = cluster_centers(args.seed)
+    queries = [
+        (vector.tolist(), random_sparse(rng))
+        for vector in dense_vectors(rng, centers, args.queries)
+    ]
+
+    print(
+        f"{args.queries} queries, k={args.k}, prefetch limit {args.prefetch_limit}, "
+        f"{args.points} points ({args.url})"
+    )
+    exact_results = run_mode(client, queries, SearchParams(exact=True), args)
+    for ef in args.ef:
+        run_mode(client, queries, SearchParams(hnsw_ef=ef), args, exact_results)
+
+    if not args.keep:
+        client.delete_collection(COLLECTION)
+
+
+if __name__ == "__main__":
+    main()
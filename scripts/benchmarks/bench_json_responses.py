@@ -0,0 +1,98 @@
+"""
+Compare response time of the standard (validated) and fast (FAST_JSON_RESPONSES)
+paths of `GET /api/v1/projects/{namespace}/{project}`, for a large raw project.
+
+Serves a synthetic project from an in-process app, with the same response handling
+as `get_a_pep`: `ProjectRawModel`, validated against `ProjectRawRequest` and encoded
+by FastAPI, vs trusted dict encoded by `FastJSONResponse`.
+
+Usage:
+
+    python scripts/benchmarks/bench_json_responses.py --samples 50000 --runs 10
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from pephub.responses import FastJSONResponse, raw_project_content  # noqa: E402
+from pephub.routers.models import ProjectRawModel, ProjectRawRequest  # noqa: E402
+
+
+def build_argparser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark JSON response paths")
+    parser.add_argument("--samples", type=int, default=50_000)
+    parser.add_argument("--attributes", type=int, default=10)
+    parser.add_argument("--runs", type=int, default=10)
+    return parser
+
+
+def make_project(n_samples: int, n_attributes: int) -> dict:
+    return {
+        "_config": {"pep_version": "2.1.0", "name": "benchmark"},
+        "_sample_dict": [
+            {
+                "sample_name": f"sample_{i}",
+                "read_count": i * 1000,
+                **{f"attribute_{j}": f"value_{i}_{j}" for j in range(n_attributes)},
+            }
+            for i in range(n_samples)
+        ],
+        "_subsample_list": [],
+    }
+
+
+def build_app(project: dict) -> FastAPI:
+    app = FastAPI()
+
+    @app.get(
+        "/standard", response_model=ProjectRawRequest, response_model_by_alias=False
+    )
+    async def standard():
+        return ProjectRawModel(**project)
+
+    @app.get("/fast", response_model=ProjectRawRequest, response_model_by_alias=False)
+    async def fast():
+        return FastJSONResponse(raw_project_content(project))
+
+    return app
+
+
+def measure(client: TestClient, path: str, runs: int) -> list:
+    client.get(path)
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        response = client.get(path)
+        timings.append(time.perf_counter() - start)
+        response.raise_for_status()
+    return timings
+
+
+def main():
+    args = build_argparser().parse_args()
+    project = make_project(args.samples, args.attributes)
+    client = TestClient(build_app(project))
+
+    assert client.get("/standard").json() == client.get("/fast").json()
+
+    results = {}
+    for name in ["standard", "fast"]:
+        timings = measure(client, f"/{name}", args.runs)
+        results[name] = statistics.median(timings)
+        print(
+            f"{name:>10}: median {results[name] * 1000:8.1f}ms, "
+            f"min {min(timings) * 1000:8.1f}ms"
+        )
+    print(f"speedup: {results['standard'] / results['fast']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
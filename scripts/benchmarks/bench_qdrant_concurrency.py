@@ -0,0 +1,188 @@
+"""
+Measure search throughput of the blocking (sync) and async qdrant clients under
+concurrent load, using the hybrid (dense + sparse + filter) query of the search endpoint.
+
+By default an in-process qdrant (`:memory:`) is used. In-process qdrant runs in the same
+python process, so it can't show the gains of non-blocking network I/O. Use `--url`
+to benchmark against a running qdrant server.
+
+Usage:
+
+    python scripts/benchmarks/bench_qdrant_concurrency.py --concurrency 64
+    python scripts/benchmarks/bench_qdrant_concurrency.py --url http://localhost:6333
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import warnings
+from typing import List
+
+import httpx
+from qdrant_client import AsyncQdrantClient, QdrantClient
+from qdrant_client.models import (
+    Distance,
+    FieldCondition,
+    Filter,
+    Fusion,
+    FusionQuery,
+    MatchValue,
+    PointStruct,
+    Prefetch,
+    SearchParams,
+    SparseVector,
+    SparseVectorParams,
+    VectorParams,
+)
+
+COLLECTION = "pephub_benchmark"
+DIM = 384
+VOCAB = 30_000
+
+
+def build_argparser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark concurrent qdrant search")
+    parser.add_argument("--url", default=None, help="Qdrant url (default: in-process)")
+    parser.add_argument("--points", type=int, default=5_000, help="Collection size")
+    parser.add_argument("--queries", type=int, default=500, help="Number of queries")
+    parser.add_argument(
+        "--concurrency", type=int, default=64, help="Concurrent searches"
+    )
+    parser.add_argument("--pool-size", type=int, default=20, help="Connection pool")
+    return parser
+
+
+def random_dense() -> List[float]:
+    return [random.gauss(0, 1) for _ in range(DIM)]
+
+
+def random_sparse() -> SparseVector:
+    indices = sorted(random.sample(range(VOCAB), 40))
+    return SparseVector(indices=indices, values=[random.random() for _ in indices])
+
+
+def build_points(n: int) -> List[PointStruct]:
+    return [
+        PointStruct(
+            id=i,
+            vector={"dense": random_dense(), "sparse": random_sparse()},
+            payload={"name": f"project_{i}", "registry": f"bench/project_{i}:default"},
+        )
+        for i in range(n)
+    ]
+
+
+def hybrid_query(name: str) -> dict:
+    return dict(
+        collection_name=COLLECTION,
+        prefetch=[
+            Prefetch(query=random_dense(), using="dense", limit=100),
+            Prefetch(query=random_sparse(), using="sparse", limit=100),
+            Prefetch(
+                filter=Filter(
+                    must=[FieldCondition(key="name", match=MatchValue(value=name))]
+                ),
+                limit=10,
+            ),
+        ],
+        query=FusionQuery(fusion=Fusion.RRF),
+        limit=10,
+        with_payload=True,
+        search_params=SearchParams(exact=True),
+    )
+
+
+COLLECTION_CONFIG = dict(
+    collection_name=COLLECTION,
+    vectors_config={"dense": VectorParams(size=DIM, distance=Distance.COSINE)},
+    sparse_vectors_config={"sparse": SparseVectorParams()},
+)
+
+
+def report(name: str, latencies: List[float], elapsed: float) -> None:
+    latencies = sorted(latencies)
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(
+        f"{name:>6}: {len(latencies) / elapsed:8.1f} queries/s, "
+        f"p50 {statistics.median(latencies) * 1000:7.1f}ms, p99 {p99 * 1000:7.1f}ms"
+    )
+
+
+async def bench_sync(client: QdrantClient, args: argparse.Namespace) -> None:
+    """
+    Old behaviour: blocking client called from `async def` endpoints
+    """
+
+    async def one_search(i: int) -> float:
+        start = time.perf_counter()
+        client.query_points(**hybrid_query(f"project_{i}"))
+        return time.perf_counter() - start
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def limited(i: int) -> float:
+        async with semaphore:
+            return await one_search(i)
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*[limited(i) for i in range(args.queries)])
+    report("sync", latencies, time.perf_counter() - start)
+
+
+async def bench_async(client: AsyncQdrantClient, args: argparse.Namespace) -> None:
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one_search(i: int) -> float:
+        async with semaphore:
+            start = time.perf_counter()
+            await client.query_points(**hybrid_query(f"project_{i}"))
+            return time.perf_counter() - start
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*[one_search(i) for i in range(args.queries)])
+    report("async", latencies, time.perf_counter() - start)
+
+
+async def main():
+    args = build_argparser().parse_args()
+    # in-process qdrant warns that it ignores search params
+    warnings.filterwarnings("ignore", message="Local mode")
+    points = build_points(args.points)
+
+    if args.url:
+        sync_client = QdrantClient(url=args.url)
+        async_client = AsyncQdrantClient(
+            url=args.url,
+            limits=httpx.Limits(
+                max_connections=args.pool_size,
+                max_keepalive_connections=args.pool_size,
+            ),
+        )
+    else:
+        sync_client = QdrantClient(":memory:")
+        async_client = AsyncQdrantClient(":memory:")
+
+    if sync_client.collection_exists(COLLECTION):
+        sync_client.delete_collection(COLLECTION)
+    sync_client.create_collection(**COLLECTION_CONFIG)
+    sync_client.upsert(COLLECTION, points=points)
+    # in-process clients don't share storage, so both are populated
+    if not args.url:
+        await async_client.create_collection(**COLLECTION_CONFIG)
+        await async_client.upsert(COLLECTION, points=points)
+
+    print(
+        f"{args.queries} hybrid searches, {args.concurrency} concurrent, "
+        f"{args.points} points ({args.url or 'in-process'})"
+    )
+    await bench_sync(sync_client, args)
+    await bench_async(async_client, args)
+
+    sync_client.delete_collection(COLLECTION)
+    await async_client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
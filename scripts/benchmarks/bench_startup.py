@@ -0,0 +1,84 @@
+"""
+Measure cold start time of the pephub server.
+
+Each run starts a fresh python interpreter, imports the app, and sends the first
+request to a non-search route (`/api/v1/_version`). Time to `/api/v1/search/ready`
+is measured as well, when qdrant is enabled.
+
+Usage:
+
+    python scripts/benchmarks/bench_startup.py --runs 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+STARTUP_SCRIPT = """
+import json, time
+start = time.perf_counter()
+from fastapi.testclient import TestClient
+import pephub.main
+imported = time.perf_counter()
+with TestClient(pephub.main.app) as client:
+    assert client.get("/api/v1/_version").status_code == 200
+    first_response = time.perf_counter()
+    search_ready = None
+    if {wait_for_search}:
+        while client.get("/api/v1/search/ready").status_code != 200:
+            time.sleep(0.05)
+        search_ready = time.perf_counter() - start
+print(json.dumps({{
+    "import": imported - start,
+    "first_response": first_response - start,
+    "search_ready": search_ready,
+}}))
+"""
+
+
+def build_argparser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark pephub cold start")
+    parser.add_argument("--runs", type=int, default=5, help="Number of cold starts")
+    parser.add_argument(
+        "--wait-for-search",
+        action="store_true",
+        help="Also measure time until embedding models are loaded",
+    )
+    return parser
+
+
+def cold_start(wait_for_search: bool) -> dict:
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            STARTUP_SCRIPT.format(wait_for_search=wait_for_search),
+        ],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    args = build_argparser().parse_args()
+    runs = [cold_start(args.wait_for_search) for _ in range(args.runs)]
+
+    for key in ["import", "first_response", "search_ready"]:
+        values = [run[key] for run in runs if run[key] is not None]
+        if values:
+            print(
+                f"{key:>15}: median {statistics.median(values):.3f}s, "
+                f"max {max(values):.3f}s ({len(values)} runs)"
+            )
+
+
+if __name__ == "__main__":
+    main()
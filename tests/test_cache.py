@@ -0,0 +1,188 @@
+import asyncio
+import os
+import sys
+import time
+
+myPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, myPath + "/../")
+
+import pytest
+
+from pephub.cache import GenerationalCache, ProjectCache, SingleFlight
+
+
+def test_cache_hit_and_miss_are_counted():
+    cache = GenerationalCache()
+    assert cache.get("atac") is None
+
+    cache.set("atac", [1, 2], cache.generation)
+    assert cache.get("atac") == [1, 2]
+
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+
+
+def test_invalidate_evicts_all_entries():
+    cache = GenerationalCache()
+    for i in range(3):
+        cache.set(i, i, cache.generation)
+
+    cache.invalidate()
+
+    assert all(cache.get(i) is None for i in range(3))
+    assert cache.stats()["stale_evictions"] == 3
+    assert cache.stats()["size"] == 0
+
+
+def test_value_computed_before_invalidation_is_not_cached():
+    cache = GenerationalCache()
+    generation = cache.generation
+
+    # project written while the value was computed
+    cache.invalidate()
+    cache.set("atac", "outdated", generation)
+
+    assert cache.get("atac") is None
+
+
+def test_cache_is_bounded():
+    cache = GenerationalCache(maxsize=2)
+    for i in range(3):
+        cache.set(i, i, cache.generation)
+
+    assert cache.stats()["size"] == 2
+
+
+def project(name: str, n_samples: int = 10) -> dict:
+    return {
+        "_config": {"pep_version": "2.1.0", "name": name},
+        "_sample_dict": [{"sample_name": f"s{i}"} for i in range(n_samples)],
+        "_subsample_list": [],
+    }
+
+
+def test_project_cache_returns_copies():
+    cache = ProjectCache()
+    key = ProjectCache.key("Databio", "example", "default")
+    cache.set(key, ProjectCache.encode(project("example")), cache.version)
+
+    cached = cache.get(key)
+    cached["_sample_dict"].clear()
+
+    assert cache.get(ProjectCache.key("databio", "example", "default")) == project(
+        "example"
+    )
+    assert cache.stats()["hits"] == 2
+
+
+def test_project_cache_evicts_by_size():
+    size = len(ProjectCache.encode(project("p0")))
+    cache = ProjectCache(max_bytes=size * 2)
+    for name in ["p0", "p1", "p2"]:
+        cache.set(
+            ProjectCache.key("databio", name, "default"),
+            ProjectCache.encode(project(name)),
+            0,
+        )
+    cache.set(
+        ProjectCache.key("databio", "huge", "default"),
+        ProjectCache.encode(project("huge", 100)),
+        0,
+    )
+
+    assert cache.get(ProjectCache.key("databio", "p0", "default")) is None
+    assert cache.get(ProjectCache.key("databio", "p2", "default")) is not None
+    assert cache.get(ProjectCache.key("databio", "huge", "default")) is None
+    assert cache.stats()["bytes"] == size * 2
+    assert cache.stats()["evictions"] == 1
+
+
+def test_project_cache_invalidation():
+    cache = ProjectCache()
+    keys = [
+        ProjectCache.key("databio", "p0", "default"),
+        ProjectCache.key("databio", "p0", "default", with_id=True),
+        ProjectCache.key("databio", "p1", "default"),
+        ProjectCache.key("other", "p0", "default"),
+    ]
+    for key in keys:
+        cache.set(key, ProjectCache.encode(project(key[1])), cache.version)
+
+    cache.invalidate("databio", "p0", "default")
+    assert [cache.get(key) is not None for key in keys] == [False, False, True, True]
+
+    cache.invalidate("databio")
+    assert [cache.get(key) is not None for key in keys] == [False, False, False, True]
+
+
+def test_project_cache_invalidation_defaults_to_default_tag():
+    cache = ProjectCache()
+    key = ProjectCache.key("databio", "p0", "default")
+    cache.set(key, ProjectCache.encode(project("p0")), cache.version)
+
+    cache.invalidate("Databio", "p0")
+    assert cache.get(key) is None
+
+
+def test_project_cache_entries_expire():
+    cache = ProjectCache(ttl=0.1)
+    key = ProjectCache.key("databio", "p0", "default")
+    cache.set(key, ProjectCache.encode(project("p0")), cache.version)
+    assert cache.get(key) is not None
+
+    time.sleep(0.2)
+    assert cache.get(key) is None
+
+
+def test_project_loaded_before_invalidation_is_not_cached():
+    cache = ProjectCache()
+    key = ProjectCache.key("databio", "p0", "default")
+    version = cache.version
+
+    # project is written while it is being loaded
+    cache.invalidate("databio", "p0", "default")
+    cache.set(key, ProjectCache.encode(project("p0")), version)
+
+    assert cache.get(key) is None
+
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_one_call():
+    flight = SingleFlight()
+    calls = []
+
+    async def read():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return b"project"
+
+    results = await asyncio.gather(*[flight.do("p0", read) for _ in range(10)])
+
+    assert results == [b"project"] * 10
+    assert len(calls) == 1
+    assert flight.stats()["deduplicated"] == 9
+    assert flight.stats()["in_flight"] == 0
+
+    # finished calls are not reused
+    await flight.do("p0", read)
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_single_flight_raises_to_all_callers_and_survives_cancellation():
+    flight = SingleFlight()
+    started = asyncio.Event()
+
+    async def fail():
+        started.set()
+        await asyncio.sleep(0.01)
+        raise KeyError("missing")
+
+    first = asyncio.ensure_future(flight.do("p0", fail))
+    await started.wait()
+    second = asyncio.ensure_future(flight.do("p0", fail))
+    first.cancel()
+
+    with pytest.raises(KeyError):
+        await second
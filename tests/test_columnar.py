@@ -0,0 +1,135 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+myPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, myPath + "/../")
+
+from pephub.columnar import (
+    ColumnTypes,
+    collect_column_types,
+    encode_columnar,
+    stream_columnar,
+)
+
+ROWS = [
+    {"sample_name": "a", "count": 1, "ratio": 1, "flag": True, "tags": [1, 2]},
+    {"sample_name": "b", "count": 2, "ratio": 2.5, "flag": False, "mixed": 1},
+    {"sample_name": "c", "count": None, "ratio": None, "mixed": "x", "meta": {"k": 1}},
+]
+
+
+def read_table(data: bytes, format: str) -> "pa.Table":
+    if format == "arrow":
+        return pa.ipc.open_stream(data).read_all()
+    return pq.read_table(pa.BufferReader(data))
+
+
+def test_column_types():
+    types = ColumnTypes()
+    types.update(ROWS[:1])
+    types.update(ROWS[1:])
+
+    assert types.schema() == pa.schema(
+        [
+            ("sample_name", pa.string()),
+            ("count", pa.int64()),
+            ("ratio", pa.float64()),
+            ("flag", pa.bool_()),
+            ("tags", pa.string()),
+            ("mixed", pa.string()),
+            ("meta", pa.string()),
+        ]
+    )
+
+
+def test_column_types_of_selected_columns():
+    types = ColumnTypes(["count", "missing"])
+    types.update(ROWS)
+
+    assert types.schema().names == ["count", "missing"]
+
+
+@pytest.mark.parametrize("format", ["arrow", "parquet"])
+def test_rows_are_encoded(format):
+    table = read_table(encode_columnar(ROWS, format), format)
+
+    assert table.to_pylist() == [
+        {
+            "sample_name": "a",
+            "count": 1,
+            "ratio": 1.0,
+            "flag": True,
+            "tags": "[1, 2]",
+            "mixed": None,
+            "meta": None,
+        },
+        {
+            "sample_name": "b",
+            "count": 2,
+            "ratio": 2.5,
+            "flag": False,
+            "tags": None,
+            "mixed": "1",
+            "meta": None,
+        },
+        {
+            "sample_name": "c",
+            "count": None,
+            "ratio": None,
+            "flag": None,
+            "tags": None,
+            "mixed": "x",
+            "meta": '{"k": 1}',
+        },
+    ]
+
+
+@pytest.mark.parametrize("format", ["arrow", "parquet"])
+def test_empty_table_is_encoded(format):
+    assert read_table(encode_columnar([], format), format).num_rows == 0
+
+
+@pytest.mark.parametrize("format", ["arrow", "parquet"])
+def test_chunks_are_streamed(format):
+    rows = [{"sample_name": f"s{i}", "value": i} for i in range(10)]
+    # a float only in the last chunk makes the whole column float
+    rows[-1]["value"] = 0.5
+
+    async def read_chunks():
+        for start in range(0, len(rows), 3):
+            yield rows[start : start + 3]
+
+    async def collect():
+        return [part async for part in stream_columnar(read_chunks, format)]
+
+    parts = asyncio.run(collect())
+    table = read_table(b"".join(parts), format)
+
+    assert len(parts) > 2
+    assert table.schema.field("value").type == pa.float64()
+    assert table.column("value").to_pylist() == list(map(float, range(9))) + [0.5]
+
+
+def test_collected_column_types_are_reused():
+    passes = []
+
+    async def read_chunks():
+        passes.append(1)
+        yield ROWS
+
+    async def collect():
+        types = await collect_column_types(read_chunks)
+        return [
+            part async for part in stream_columnar(read_chunks, "arrow", types=types)
+        ]
+
+    table = read_table(b"".join(asyncio.run(collect())), "arrow")
+
+    assert len(passes) == 2
+    assert table.schema.field("count").type == pa.int64()
@@ -0,0 +1,88 @@
+import gzip
+import os
+import sys
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+myPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, myPath + "/../")
+
+from pephub.middleware import CompressionMiddleware, negotiate_encoding
+
+BODY = "sample_name,protocol\n" + "".join(f"s{i},ATAC\n" for i in range(1000))
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=500, encodings=["gzip"])
+
+    @app.get("/csv")
+    async def csv():
+        return PlainTextResponse(BODY, media_type="text/csv", headers={"ETag": '"a"'})
+
+    @app.get("/small")
+    async def small():
+        return {"sample_name": "s0"}
+
+    @app.get("/stream")
+    async def stream():
+        async def lines():
+            for i in range(1000):
+                yield f'{{"sample_name": "s{i}"}}\n'
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    @app.get("/zip")
+    async def zip():
+        return Response(b"PK" + b"\0" * 5000, media_type="application/zip")
+
+    return TestClient(app)
+
+
+def test_negotiate_encoding():
+    assert negotiate_encoding("gzip, deflate, br", ["zstd", "br", "gzip"]) == "br"
+    assert negotiate_encoding("gzip;q=1.0, br;q=0.5", ["br", "gzip"]) == "gzip"
+    assert negotiate_encoding("*;q=0.1", ["zstd", "gzip"]) == "zstd"
+    assert negotiate_encoding("gzip;q=0, identity", ["gzip"]) is None
+    assert negotiate_encoding(None, ["gzip"]) is None
+
+
+def test_large_response_is_compressed(client):
+    response = client.get("/csv", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert response.headers["ETag"] == 'W/"a"'
+    assert response.text == BODY
+
+
+def test_streamed_response_is_compressed(client):
+    response = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert len(response.text.splitlines()) == 1000
+
+
+def test_small_incompressible_and_unaccepted_responses_are_not_compressed(client):
+    assert "Content-Encoding" not in client.get("/small").headers
+    for path in ["/zip", "/csv"]:
+        response = client.get(
+            path,
+            headers={"Accept-Encoding": "gzip" if path == "/zip" else "identity"},
+        )
+        assert "Content-Encoding" not in response.headers
+
+    response = client.get("/zip", headers={"Accept-Encoding": "gzip"})
+    assert response.content.startswith(b"PK")
+
+
+def test_compressed_bytes_are_gzip(client):
+    with client.stream("GET", "/csv", headers={"Accept-Encoding": "gzip"}) as response:
+        raw = b"".join(response.iter_raw())
+
+    assert len(raw) < len(BODY) / 4
+    assert gzip.decompress(raw).decode() == BODY
@@ -0,0 +1,91 @@
+import asyncio
+import os
+import sys
+
+import peppy
+import pytest
+
+myPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, myPath + "/../")
+
+from pephub.conversion import ConversionCache, FilterRegistry
+
+PROJECT = {
+    "_config": {"pep_version": "2.1.0", "name": "example"},
+    "_sample_dict": [{"sample_name": "a"}, {"sample_name": "b"}],
+    "_subsample_list": [],
+}
+
+
+@pytest.fixture
+def registry():
+    discovered = []
+
+    def discover():
+        discovered.append(1)
+        return {
+            "names": lambda prj, **kwargs: {
+                "names": ",".join(s.sample_name for s in prj.samples)
+            }
+        }
+
+    registry = FilterRegistry(discover)
+    registry.discovered = discovered
+    return registry
+
+
+def test_filters_are_discovered_once(registry):
+    assert "names" in registry
+    assert "basic" not in registry
+    assert registry.names == ["names"]
+    assert len(registry.discovered) == 1
+
+
+def test_installed_eido_filters_are_found():
+    assert "basic" in FilterRegistry()
+
+
+def test_conversion_is_cached_by_digest_and_filter(tmp_path):
+    cache = ConversionCache(str(tmp_path))
+    runs = []
+
+    async def run_filter():
+        runs.append(1)
+        project = peppy.Project.from_dict(PROJECT)
+        return {"names": ",".join(s.sample_name for s in project.samples)}
+
+    async def convert_all():
+        return [
+            await cache.convert(digest, "names", run_filter)
+            for digest in ["digest1", "digest1", "digest2"]
+        ]
+
+    first, second, _ = asyncio.run(convert_all())
+
+    assert first == second == {"names": "a,b"}
+    assert len(runs) == 2
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 2
+    assert stats["conversion_seconds"]["names"]["count"] == 2
+    # results survive restarts
+    assert ConversionCache(str(tmp_path)).get("digest1", "names") == first
+
+
+def test_least_recently_used_results_are_evicted(tmp_path):
+    cache = ConversionCache(str(tmp_path), max_bytes=250)
+    for i in range(5):
+        cache.set(f"digest{i}", "basic", {"out": "x" * 80})
+        # deterministic access order
+        os.utime(tmp_path / f"digest{i}-basic.json", (i, i))
+
+    assert cache.stats()["bytes"] <= 250
+    assert cache.get("digest0", "basic") is None
+    assert cache.get("digest4", "basic") is not None
+
+
+def test_overwritten_results_are_counted_once(tmp_path):
+    cache = ConversionCache(str(tmp_path))
+    cache.set("digest", "basic", {"out": "x" * 80})
+    cache.set("digest", "basic", {"out": "x" * 40})
+
+    assert cache.stats()["bytes"] == os.path.getsize(tmp_path / "digest-basic.json")
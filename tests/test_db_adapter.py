@@ -0,0 +1,29 @@
+import os
+import sys
+
+import pytest
+from pepdbagent.db_utils import Samples
+from sqlalchemy import Integer
+
+myPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, myPath + "/../")
+
+from pephub import db_adapter
+from pephub.db_adapter import check_schema
+
+
+def test_schema_of_installed_pepdbagent():
+    check_schema()
+
+
+@pytest.mark.parametrize(
+    "columns",
+    [
+        {"guid": Integer},
+        {"previous_guid": Integer},
+    ],
+)
+def test_schema_change_is_detected(monkeypatch, columns):
+    monkeypatch.setitem(db_adapter.EXPECTED_COLUMNS, Samples, columns)
+    with pytest.raises(RuntimeError):
+        check_schema()
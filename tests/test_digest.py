@@ -0,0 +1,125 @@
+import os
+import sys
+
+from pepdbagent.exceptions import ProjectNotFoundError
+from pepdbagent.models import AnnotationList, AnnotationModel
+
+myPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, myPath + "/../")
+
+from pephub.digest import (
+    DigestCache,
+    canonical_digest,
+    compute_digests,
+    read_digests,
+    update_digests,
+)
+
+from .test_samples import FakeAgent, add_project
+
+CONFIG = {"pep_version": "2.1.0", "name": "example"}
+SAMPLES = [{"sample_name": "a", "file": "a.txt"}, {"sample_name": "b", "file": "b.txt"}]
+
+
+def test_canonical_digest_ignores_key_order():
+    assert canonical_digest({"a": 1, "b": [1, 2]}) == canonical_digest(
+        {"b": [1, 2], "a": 1}
+    )
+    assert canonical_digest({"a": 1}) != canonical_digest({"a": "1"})
+
+
+def test_digests_track_changed_parts():
+    digests = compute_digests(CONFIG, SAMPLES, [])
+    changed_sample = compute_digests(
+        CONFIG, [SAMPLES[0], {**SAMPLES[1], "file": "c.txt"}], []
+    )
+    reordered = compute_digests(CONFIG, SAMPLES[::-1], [])
+
+    assert changed_sample.config == digests.config
+    assert changed_sample.sample_digests[0] == digests.sample_digests[0]
+    assert changed_sample.sample_digests[1] != digests.sample_digests[1]
+    assert changed_sample.project != digests.project
+    # sample order is part of the project
+    assert reordered.samples != digests.samples
+
+
+class Project:
+    def get_config(self, namespace, name, tag):
+        return CONFIG
+
+    def get_subsamples(self, namespace, name, tag):
+        return []
+
+
+class Annotation:
+    def __init__(self, last_update_date):
+        self.last_update_date = last_update_date
+
+    def get(self, namespace, name, tag, admin=None):
+        if name != "big":
+            raise ProjectNotFoundError()
+        annotation = AnnotationModel(
+            namespace=namespace,
+            name=name,
+            tag=tag,
+            last_update_date=self.last_update_date,
+        )
+        return AnnotationList(count=1, limit=1, offset=0, results=[annotation])
+
+
+def test_read_digests_from_database_matches_in_memory_digests():
+    agent = FakeAgent()
+    add_project(agent, "big", 25)
+    agent.project = Project()
+    samples = [
+        {"sample_name": f"s{i}", "index": i, "genome": "hg38" if i % 2 else "mm10"}
+        for i in range(25)
+    ]
+
+    assert read_digests(agent, "databio", "big", chunk_size=7) == compute_digests(
+        CONFIG, samples, []
+    )
+
+
+def test_digest_cache_is_keyed_by_update_date():
+    cache = DigestCache(maxsize=2)
+    digests = compute_digests(CONFIG, SAMPLES, [])
+    registry = ("databio", "example", "default")
+
+    cache.set(registry, "2024-01-01", digests)
+
+    assert cache.get(registry, "2024-01-01") == digests
+    assert cache.get(registry, "2024-01-02") is None
+    assert cache.stats()["hits"] == 1
+
+
+def test_digests_are_saved_to_disk(tmp_path):
+    digests = compute_digests(CONFIG, SAMPLES, [])
+    registry = DigestCache.key("Databio", "example", "default")
+    DigestCache(cache_path=str(tmp_path)).set(registry, "2024-01-01", digests)
+
+    # e.g. after a restart, or in another worker
+    cache = DigestCache(cache_path=str(tmp_path))
+
+    assert cache.get(registry, "2024-01-01") == digests
+    assert cache.get(registry, "2024-01-02") is None
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_digests_are_computed_on_write(tmp_path):
+    agent = FakeAgent()
+    add_project(agent, "big", 5)
+    agent.project = Project()
+    agent.annotation = Annotation("2024-01-01")
+    cache = DigestCache(cache_path=str(tmp_path))
+
+    update_digests(agent, cache, "databio", "big", "default")
+
+    registry = cache.key("databio", "big", "default")
+    assert cache.get(registry, "2024-01-01") == read_digests(agent, "databio", "big")
+
+    # digests of deleted projects are dropped
+    missing = cache.key("databio", "missing", "default")
+    cache.set(missing, "2024-01-01", cache.get(registry, "2024-01-01"))
+    update_digests(agent, cache, "databio", "missing", "default")
+    assert cache.get(missing, "2024-01-01") is None
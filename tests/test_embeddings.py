@@ -0,0 +1,255 @@
+import asyncio
+import os
+import sys
+import threading
+
+import pytest
+
+myPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, myPath + "/../")
+
+from pephub.embeddings import (
+    MODELS_FAILED,
+    MODELS_NOT_LOADED,
+    MODELS_READY,
+    EmbeddingBatcher,
+    EmbeddingModels,
+    QueryEmbeddingCache,
+    normalize_query,
+    sparse_vectors_from_tensor,
+)
+
+
+class FakeLoader:
+    def __init__(self, fail: bool = False):
+        self.calls = []
+        self.fail = fail
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, model_name: str):
+        self.release.wait(5)
+        self.calls.append(model_name)
+        if self.fail:
+            raise RuntimeError("no model")
+        return f"model:{model_name}"
+
+
+def test_models_are_not_loaded_on_init():
+    dense, sparse = FakeLoader(), FakeLoader()
+    models = EmbeddingModels("dense", "sparse", dense, sparse)
+
+    assert models.status()["state"] == MODELS_NOT_LOADED
+    assert dense.calls == [] and sparse.calls == []
+
+
+def test_models_are_loaded_once_on_first_use():
+    dense, sparse = FakeLoader(), FakeLoader()
+    models = EmbeddingModels("dense", "sparse", dense, sparse)
+
+    assert models.dense == "model:dense"
+    assert models.sparse == "model:sparse"
+    assert dense.calls == ["dense"] and sparse.calls == ["sparse"]
+    assert models.is_ready
+
+
+def test_sparse_model_can_be_disabled():
+    dense, sparse = FakeLoader(), FakeLoader()
+    models = EmbeddingModels("dense", None, dense, sparse)
+
+    assert models.sparse is None
+    assert sparse.calls == []
+
+
+def test_warm_up_loads_in_background():
+    dense, sparse = FakeLoader(), FakeLoader()
+    dense.release.clear()
+    models = EmbeddingModels("dense", "sparse", dense, sparse)
+
+    thread = models.warm_up()
+    assert not models.is_ready
+
+    dense.release.set()
+    thread.join(5)
+    assert models.is_ready
+    assert models.status()["state"] == MODELS_READY
+
+
+def test_failed_load_is_reported_and_retried():
+    dense = FakeLoader(fail=True)
+    models = EmbeddingModels("dense", None, dense, FakeLoader())
+
+    models.warm_up().join(5)
+    assert models.status()["state"] == MODELS_FAILED
+    assert models.status()["error"] == "no model"
+
+    dense.fail = False
+    assert models.dense == "model:dense"
+    assert models.is_ready
+
+
+class FakeList(list):
+    def tolist(self):
+        return list(self)
+
+
+class FakeSparseTensor:
+    """
+    Mimics the part of torch sparse COO tensor API used by pephub
+    """
+
+    def __init__(self, indices, values, shape):
+        self._indices, self._values, self.shape = indices, values, shape
+
+    def coalesce(self):
+        return self
+
+    def indices(self):
+        return FakeList(self._indices)
+
+    def values(self):
+        return FakeList(self._values)
+
+
+class FakeDenseModel:
+    def __init__(self):
+        self.texts = []
+        self.calls = 0
+
+    def embed(self, texts):
+        self.calls += 1
+        for text in texts:
+            self.texts.append(text)
+            yield [float(len(text)), 1.0]
+
+
+class FakeSparseModel:
+    def __init__(self):
+        self.texts = []
+
+    def encode(self, texts):
+        if isinstance(texts, str):
+            self.texts.append(texts)
+            return FakeSparseTensor([[len(texts)]], [0.5], (30522,))
+        self.texts.extend(texts)
+        return FakeSparseTensor(
+            [list(range(len(texts))), [len(t) for t in texts]],
+            [0.5] * len(texts),
+            (len(texts), 30522),
+        )
+
+
+@pytest.fixture
+def fake_models():
+    dense, sparse = FakeDenseModel(), FakeSparseModel()
+    models = EmbeddingModels(
+        "dense", "sparse", lambda _: dense, lambda _: sparse, QueryEmbeddingCache()
+    )
+    return models, dense, sparse
+
+
+def test_normalize_query():
+    assert normalize_query("  ATAC   seq\t") == "ATAC seq"
+
+
+def test_sparse_vectors_from_batched_tensor():
+    tensor = FakeSparseTensor([[0, 0, 2], [5, 7, 1]], [0.1, 0.2, 0.3], (3, 10))
+    vectors = sparse_vectors_from_tensor(tensor)
+
+    assert [v.indices for v in vectors] == [[5, 7], [], [1]]
+    assert [v.values for v in vectors] == [[0.1, 0.2], [], [0.3]]
+
+
+def test_query_embedding_is_cached(fake_models):
+    models, dense, sparse = fake_models
+
+    first = models.embed_query("hg38")
+    second = models.embed_query("  hg38 ")
+
+    assert first[0] == second[0] == [4.0, 1.0]
+    assert first[1].indices == second[1].indices == [4]
+    assert dense.texts == ["hg38"] and sparse.texts == ["hg38"]
+    assert models.query_cache.stats()["hits"] == 1
+    assert models.query_cache.stats()["misses"] == 1
+
+
+def test_query_embedding_cache_is_keyed_by_model(fake_models):
+    models, dense, _ = fake_models
+    models.embed_query("ATAC")
+
+    other_models = EmbeddingModels(
+        "other-dense",
+        None,
+        lambda _: dense,
+        lambda _: None,
+        models.query_cache,
+    )
+    dense_vector, sparse_vector = other_models.embed_query("ATAC")
+
+    assert sparse_vector is None
+    assert dense.texts == ["ATAC", "ATAC"]
+
+
+def test_query_embedding_cache_is_bounded():
+    cache = QueryEmbeddingCache(maxsize=2, ttl=60)
+    for i in range(3):
+        cache.set(i, i)
+
+    assert cache.stats()["size"] == 2
+    assert cache.get(0) is None
+
+
+@pytest.mark.asyncio
+async def test_batcher_embeds_concurrent_queries_together(fake_models):
+    models, dense, sparse = fake_models
+    batcher = EmbeddingBatcher(models, max_batch_size=8, max_wait_ms=50)
+
+    queries = ["a", "bb", "ccc", "bb", "dddd"]
+    results = await asyncio.gather(*[batcher.embed(q) for q in queries])
+
+    assert [r[0] for r in results] == [[float(len(q)), 1.0] for q in queries]
+    assert [r[1].indices for r in results] == [[len(q)] for q in queries]
+    assert dense.calls == 1
+    assert sorted(dense.texts) == ["a", "bb", "ccc", "dddd"]
+    assert batcher.stats()["batches"] == 1
+
+
+@pytest.mark.asyncio
+async def test_batcher_respects_max_batch_size(fake_models):
+    models, dense, _ = fake_models
+    batcher = EmbeddingBatcher(models, max_batch_size=2, max_wait_ms=50)
+
+    await asyncio.gather(*[batcher.embed(str(i)) for i in range(5)])
+
+    assert dense.calls == 3
+    assert batcher.stats()["embedded_queries"] == 5
+
+
+@pytest.mark.asyncio
+async def test_batcher_serves_cached_queries_without_batching(fake_models):
+    models, dense, _ = fake_models
+    models.embed_query("hg38")
+    batcher = EmbeddingBatcher(models)
+
+    assert (await batcher.embed("hg38"))[0] == [4.0, 1.0]
+    assert dense.calls == 1
+    assert batcher.stats()["batches"] == 0
+
+
+@pytest.mark.asyncio
+async def test_batcher_propagates_errors_to_every_query(fake_models):
+    models, dense, _ = fake_models
+
+    def broken_embed(texts):
+        raise RuntimeError("inference failed")
+
+    dense.embed = broken_embed
+    batcher = EmbeddingBatcher(models, max_wait_ms=50)
+
+    results = await asyncio.gather(
+        batcher.embed("a"), batcher.embed("b"), return_exceptions=True
+    )
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+    dense.embed = FakeDenseModel().embed
+    assert (await batcher.embed("a"))[0] == [1.0, 1.0]
@@ -0,0 +1,55 @@
+import os
+import sys
+
+from pepdbagent.models import AnnotationModel
+
+myPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, myPath + "/../")
+
+from pephub.etag import etag_matches, project_etag
+
+PATH = "/api/v1/projects/databio/example"
+
+
+def annotation(**kwargs) -> AnnotationModel:
+    return AnnotationModel(
+        **{
+            "namespace": "databio",
+            "name": "example",
+            "tag": "default",
+            "digest": "a" * 32,
+            "last_update_date": "2024-01-01 10:00:00.123456+00:00",
+            **kwargs,
+        }
+    )
+
+
+def test_etag_is_stable_and_quoted():
+    etag = project_etag(annotation(), PATH, [("raw", "true"), ("format", "csv")])
+
+    assert etag.startswith('"') and etag.endswith('"')
+    # order of query parameters doesn't matter
+    assert etag == project_etag(
+        annotation(), PATH, [("format", "csv"), ("raw", "true")]
+    )
+
+
+def test_etag_changes_with_project_and_representation():
+    etag = project_etag(annotation(), PATH)
+
+    assert etag != project_etag(annotation(digest="b" * 32), PATH)
+    assert etag != project_etag(
+        annotation(last_update_date="2024-01-01 10:00:00.654321+00:00"), PATH
+    )
+    assert etag != project_etag(annotation(), PATH + "/config")
+    assert etag != project_etag(annotation(), PATH, [("raw", "false")])
+
+
+def test_etag_matches_if_none_match():
+    etag = project_etag(annotation(), PATH)
+
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches('"other"', etag)
@@ -0,0 +1,239 @@
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import httpx
+import peppy
+import pytest
+from fastapi import FastAPI
+
+myPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, myPath + "/../")
+
+from pephub import workers
+from pephub.cache import ProjectCache
+from pephub.executor import (
+    DatabaseExecutor,
+    ExecutorBusyError,
+    ExecutorTimeoutError,
+    ProcessExecutor,
+)
+
+SLOW_QUERY_SECONDS = 0.5
+
+
+def build_app(executor: DatabaseExecutor) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/slow")
+    async def slow():
+        await executor.run(time.sleep, SLOW_QUERY_SECONDS)
+        return {"slow": True}
+
+    @app.get("/fast")
+    async def fast():
+        return await executor.run(lambda: {"fast": True})
+
+    return app
+
+
+async def timed_get(client: httpx.AsyncClient, url: str) -> float:
+    start = time.perf_counter()
+    res = await client.get(url)
+    assert res.status_code == 200
+    return time.perf_counter() - start
+
+
+async def run_concurrently(app: FastAPI, urls: list) -> list:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+        return await asyncio.gather(*[timed_get(c, url) for url in urls])
+
+
+def test_fast_request_is_not_blocked_by_slow_query():
+    executor = DatabaseExecutor(max_workers=4)
+    app = build_app(executor)
+
+    slow_time, fast_time = asyncio.run(run_concurrently(app, ["/slow", "/fast"]))
+
+    assert slow_time >= SLOW_QUERY_SECONDS
+    assert fast_time < SLOW_QUERY_SECONDS / 2
+    executor.shutdown()
+
+
+def test_slow_queries_do_not_serialize():
+    executor = DatabaseExecutor(max_workers=4)
+    app = build_app(executor)
+
+    start = time.perf_counter()
+    asyncio.run(run_concurrently(app, ["/slow"] * 4))
+    total = time.perf_counter() - start
+
+    # serialized, this would take 4 * SLOW_QUERY_SECONDS
+    assert total < 2 * SLOW_QUERY_SECONDS
+    assert executor.stats()["peak_active"] == 4
+    executor.shutdown()
+
+
+def test_executor_reports_saturation():
+    executor = DatabaseExecutor(max_workers=1)
+    app = build_app(executor)
+
+    asyncio.run(run_concurrently(app, ["/slow"] * 3))
+
+    stats = executor.stats()
+    assert stats["completed"] == 3
+    assert stats["saturated_submissions"] == 2
+    assert stats["active"] == 0
+    assert stats["queued"] == 0
+    executor.shutdown()
+
+
+def test_cancelled_queued_call_is_not_counted_as_queued():
+    executor = DatabaseExecutor(max_workers=1)
+
+    async def run():
+        slow = asyncio.create_task(executor.run(time.sleep, SLOW_QUERY_SECONDS))
+        queued = asyncio.create_task(executor.run(time.sleep, SLOW_QUERY_SECONDS))
+        await asyncio.sleep(0.1)
+        queued.cancel()
+        await slow
+
+    asyncio.run(run())
+
+    stats = executor.stats()
+    assert stats["queued"] == 0
+    assert stats["completed"] == 1
+    executor.shutdown()
+
+
+PROJECT = {
+    "_config": {
+        "pep_version": "2.1.0",
+        "sample_modifiers": {"append": {"genome": "hg38"}},
+    },
+    "_sample_dict": [{"sample_name": "a"}, {"sample_name": "b"}],
+    "_subsample_list": [],
+}
+
+
+def test_project_is_processed_in_worker_process():
+    executor = ProcessExecutor(max_workers=1)
+
+    samples = asyncio.run(
+        executor.run(workers.process_project, ProjectCache.encode(PROJECT))
+    )
+
+    expected = [s.to_dict() for s in peppy.Project.from_dict(PROJECT).samples]
+    assert samples == expected
+    assert samples[0]["genome"] == "hg38"
+    assert executor.stats()["completed"] == 1
+    executor.shutdown()
+
+
+def test_validation_errors_are_returned():
+    executor = ProcessExecutor(max_workers=0)
+    schema = {
+        "properties": {
+            "samples": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {"protocol": {"type": "string"}},
+                    "required": ["protocol"],
+                },
+            }
+        }
+    }
+
+    errors = asyncio.run(
+        executor.run(workers.validate_project, ProjectCache.encode(PROJECT), schema)
+    )
+
+    assert list(errors) == ["'protocol' is a required property"]
+    assert [e["sample_name"] for e in errors["'protocol' is a required property"]] == [
+        "a",
+        "b",
+    ]
+    executor.shutdown()
+
+
+def test_stuck_task_times_out_and_pool_is_replaced():
+    executor = ProcessExecutor(max_workers=1, timeout=5)
+
+    async def run():
+        with pytest.raises(ExecutorTimeoutError):
+            await executor.run(time.sleep, 30, timeout=0.5)
+        # the new pool doesn't wait for the stuck worker
+        return await executor.run(workers.process_project, ProjectCache.encode(PROJECT))
+
+    start = time.perf_counter()
+    assert len(asyncio.run(run())) == 2
+    assert time.perf_counter() - start < 10
+    stats = executor.stats()
+    assert stats["timed_out"] == 1
+    assert stats["restarts"] == 1
+    assert stats["pending"] == 0
+    executor.shutdown()
+
+
+def test_task_waiting_for_a_worker_does_not_replace_the_pool():
+    executor = ProcessExecutor(max_workers=1, max_queue=1, timeout=10)
+
+    async def run():
+        slow = asyncio.create_task(executor.run(time.sleep, 2))
+        await asyncio.sleep(0.1)
+        pool = executor._pool
+        with pytest.raises(ExecutorBusyError):
+            await executor.run(
+                workers.process_project, ProjectCache.encode(PROJECT), timeout=0.5
+            )
+        await slow
+        assert executor._pool is pool
+        return await executor.run(workers.process_project, ProjectCache.encode(PROJECT))
+
+    assert len(asyncio.run(run())) == 2
+    stats = executor.stats()
+    assert stats["queue_timed_out"] == 1
+    assert stats["timed_out"] == 0
+    assert stats["restarts"] == 0
+    assert stats["completed"] == 2
+    executor.shutdown()
+
+
+def test_tasks_over_queue_limit_are_rejected():
+    executor = ProcessExecutor(max_workers=0, max_queue=2)
+
+    async def run():
+        return await asyncio.gather(
+            *[executor.run(time.sleep, SLOW_QUERY_SECONDS) for _ in range(3)],
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(run())
+
+    assert [isinstance(r, ExecutorBusyError) for r in results] == [False, False, True]
+    stats = executor.stats()
+    assert stats["rejected"] == 1
+    assert stats["completed"] == 2
+    assert stats["peak_pending"] == 2
+    executor.shutdown()
+
+
+def test_broken_pool_is_replaced():
+    executor = ProcessExecutor(max_workers=1)
+
+    async def run():
+        await executor.run(len, [])
+        pool = executor._pool
+        with pytest.raises(BrokenProcessPool):
+            await executor.run(os._exit, 1)
+        # the broken pool is shut down, releasing its queues
+        assert pool._call_queue is None
+        return await executor.run(workers.process_project, ProjectCache.encode(PROJECT))
+
+    assert len(asyncio.run(run())) == 2
+    assert executor.stats()["restarts"] == 1
+    executor.shutdown()
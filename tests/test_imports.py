@@ -0,0 +1,39 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+myPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, myPath + "/../")
+
+# modules are imported in a new interpreter, with the database agent mocked, so that
+# errors of module-level code are caught without a database
+IMPORT_SCRIPT = """
+from unittest import mock
+
+with mock.patch("pepdbagent.PEPDatabaseAgent"):
+    import {module}
+"""
+
+
+@pytest.mark.parametrize("module", ["pephub.dependencies", "pephub.main"])
+def test_module_imports(module):
+    env = {
+        **os.environ,
+        "GH_CLIENT_ID": "client_id",
+        "GH_CLIENT_SECRET": "client_secret",
+        "BASE_URI": "http://localhost:8000",
+        "QDRANT_ENABLED": "false",
+        "WARM_UP_MODELS": "false",
+    }
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT.format(module=module)],
+        cwd=os.path.join(myPath, ".."),
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=300,
+    )
+
+    assert result.returncode == 0, result.stderr
@@ -0,0 +1,207 @@
+import json
+import os
+import sys
+
+import peppy
+import pytest
+
+myPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, myPath + "/../")
+
+from pephub.modifiers import Unsupported, apply_sample_modifiers
+from pephub.samples import process_samples
+
+CONFIG = {"pep_version": "2.1.0", "name": "example"}
+
+SAMPLES = [
+    {"sample_name": "a", "organism": "human", "file": "src", "reads": 1, "unused": 1},
+    {"sample_name": "b", "organism": "mouse", "file": "src", "reads": 2.5},
+    {"sample_name": "c", "organism": "human", "file": "other", "flag": True},
+    {"sample_name": "d", "organism": None, "file": "src", "reads": 3, "count": 4},
+    {"sample_name": "e", "organism": "mouse", "file": "none", "tags": [1, 2]},
+    {"sample_name": "f", "organism": "rat", "file": "", "meta": {"k": "v", "_p": 1}},
+]
+
+MODIFIERS = [
+    {},
+    {"remove": ["unused", "reads"]},
+    {"remove": "flag"},
+    {"append": {"genome": "hg38", "organism": "ignored", "n": 1}},
+    {"duplicate": {"organism": "species", "missing": "nothing"}},
+    {
+        "imply": [
+            {"if": {"organism": ["human"]}, "then": {"genome": "hg19"}},
+            {"if": {"genome": ["hg19"]}, "then": {"build": 19}},
+            {"if": {"organism": ["mouse", "rat"], "file": ["src"]}, "then": {"x": 1}},
+            {"if": {"reads": [1, 3.0]}, "then": {"has_reads": True}},
+            {"if": {"tags": [[1, 2]]}, "then": {"tagged": "yes"}},
+            {"if": {"lacking": ["a"]}, "then": {"never": "set"}},
+            {"if": {"organism": "humans"}, "then": {"substring": True}},
+        ]
+    },
+    {
+        "derive": {
+            "attributes": ["file"],
+            "sources": {
+                "src": "data/{sample_name}_{organism}.fastq",
+                "other": "{missing}/{reads}/{{literal}}",
+            },
+        }
+    },
+    {
+        "derive": {
+            "attributes": "file",
+            "sources": {"src": "data/{{braces}}", "other": "$HOME/{sample_name}"},
+        }
+    },
+    {
+        "derive": {
+            "attributes": ["sample_name", "file"],
+            "sources": {"a": "x_{organism}", "src": "{sample_name}.txt"},
+        }
+    },
+    {
+        "append": {"genome": "hg38", "source": "src"},
+        "duplicate": {"organism": "species"},
+        "imply": [
+            {"if": {"species": ["human"]}, "then": {"genome": "hg19", "lab": "l1"}},
+            {"if": {"genome": ["hg38"]}, "then": {"source": "other"}},
+        ],
+        "derive": {
+            "attributes": ["source", "file", "lab"],
+            "sources": {
+                "src": "data/{genome}/{sample_name}.fastq",
+                "other": "other/{genome}/{lab}",
+                "l1": "labs/{species}",
+            },
+        },
+        "remove": ["unused"],
+    },
+]
+
+
+def process_with_peppy(config: dict, samples: list) -> str:
+    project = peppy.Project.from_dict(
+        {"_config": config, "_sample_dict": samples, "_subsample_list": []}
+    )
+    return json.dumps([sample.to_dict() for sample in project.samples])
+
+
+def process_with_columns(config: dict, samples: list) -> str:
+    return json.dumps(apply_sample_modifiers(config, samples))
+
+
+@pytest.mark.parametrize("modifiers", MODIFIERS)
+def test_modifiers_are_applied_like_peppy(modifiers):
+    config = {**CONFIG, "sample_modifiers": modifiers}
+
+    # compared as JSON, to compare types (e.g. int vs float) and order of attributes
+    assert process_with_columns(config, SAMPLES) == process_with_peppy(config, SAMPLES)
+
+
+def test_samples_without_modifiers_section_are_processed_like_peppy():
+    assert process_with_columns(CONFIG, SAMPLES) == process_with_peppy(CONFIG, SAMPLES)
+
+
+def test_custom_index_is_processed_like_peppy():
+    config = {
+        **CONFIG,
+        "sample_table_index": "id",
+        "sample_modifiers": {"append": {"x": "y"}},
+    }
+    samples = [{"id": "s1", "v": "1"}, {"id": "s2", "v": None}]
+
+    assert process_with_columns(config, samples) == process_with_peppy(config, samples)
+
+
+def test_derived_globs_are_expanded_like_peppy(tmp_path):
+    for name in ["a_1.txt", "a_2.txt", "b_1.txt"]:
+        (tmp_path / name).write_text("")
+    config = {
+        **CONFIG,
+        "sample_modifiers": {
+            "derive": {
+                "attributes": ["file"],
+                "sources": {"src": str(tmp_path / "{sample_name}_*.txt")},
+            }
+        },
+    }
+    samples = [{"sample_name": name, "file": "src"} for name in ["a", "b", "c"]]
+
+    assert process_with_columns(config, samples) == process_with_peppy(config, samples)
+
+
+def test_test_pep_is_processed_like_peppy():
+    path = os.path.join(myPath, "data", "peps", "test_pep", "test_cfg.yaml")
+    project = peppy.Project(path).to_dict(extended=True, orient="records")
+    config, samples = project["_config"], project["_sample_dict"]
+    config["sample_modifiers"]["imply"].append(
+        {"if": {"protocol": ["GRO"]}, "then": {"x": "y"}}
+    )
+
+    assert process_with_columns(config, samples) == process_with_peppy(config, samples)
+
+
+def test_large_sample_table_is_processed_like_peppy():
+    config = {**CONFIG, "sample_modifiers": MODIFIERS[-1]}
+    samples = [
+        {**SAMPLES[i % len(SAMPLES)], "sample_name": f"s{i}"} for i in range(500)
+    ]
+
+    assert process_with_columns(config, samples) == process_with_peppy(config, samples)
+
+
+@pytest.mark.parametrize(
+    "config, samples",
+    [
+        # merged by peppy
+        (CONFIG, SAMPLES + [{"sample_name": "a"}]),
+        # names are duplicated after deriving
+        (
+            {
+                **CONFIG,
+                "sample_modifiers": {
+                    "derive": {"attributes": ["sample_name"], "sources": {"a": "b"}}
+                },
+            },
+            SAMPLES,
+        ),
+        # peppy raises
+        ({**CONFIG, "sample_modifiers": {"imply": {"if": {}}}}, SAMPLES),
+        ({**CONFIG, "sample_table_index": "id"}, SAMPLES),
+        # substring of a non-string value
+        (
+            {
+                **CONFIG,
+                "sample_modifiers": {
+                    "imply": [{"if": {"reads": "123"}, "then": {"x": 1}}]
+                },
+            },
+            SAMPLES,
+        ),
+        # formatted for every value of a list
+        (
+            {
+                **CONFIG,
+                "sample_modifiers": {
+                    "derive": {"attributes": ["file"], "sources": {"none": "{tags}"}}
+                },
+            },
+            SAMPLES,
+        ),
+    ],
+)
+def test_unsupported_projects_are_processed_by_peppy(config, samples):
+    with pytest.raises(Unsupported):
+        apply_sample_modifiers(config, samples)
+
+    try:
+        expected = process_with_peppy(config, samples)
+    except Exception as e:
+        with pytest.raises(type(e)):
+            process_samples(config, samples, [])
+    else:
+        processed = process_samples(config, samples, [])
+        assert sorted(json.dumps(s) for s in processed) == sorted(
+            json.dumps(s) for s in json.loads(expected)
+        )
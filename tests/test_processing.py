@@ -0,0 +1,277 @@
+import asyncio
+import json
+import os
+import sys
+
+import eido
+import peppy
+import pytest
+
+myPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, myPath + "/../")
+
+from pephub import workers
+from pephub.processing import (
+    describe_samples,
+    iter_list_chunks,
+    iter_processed_samples,
+    process_first_chunk,
+    process_page,
+    profile_samples,
+    sample_table_context,
+    stream_json_samples,
+)
+
+CONFIG = {"pep_version": "2.1.0", "name": "example"}
+
+MODIFIERS = {
+    "append": {"genome": "hg38"},
+    "duplicate": {"organism": "species"},
+    "imply": [{"if": {"organism": "human"}, "then": {"genome": "hg19"}}],
+    "derive": {
+        "attributes": ["file"],
+        "sources": {"src": "data/{sample_name}.fastq"},
+    },
+    "remove": ["unused"],
+}
+
+SAMPLES = [
+    {"sample_name": "a", "organism": "human", "file": "src", "reads": 1, "unused": 1},
+    {"sample_name": "b", "organism": "mouse", "file": "src", "reads": 2.5},
+    {"sample_name": "c", "organism": "human", "file": "src", "flag": True},
+    {"sample_name": "d", "organism": None, "file": "src", "reads": 3, "count": 4},
+    {"sample_name": "e", "organism": "mouse", "file": "src", "count": 5, "tags": [1]},
+]
+
+
+def process_in_chunks(project: dict, chunk_size: int = 2) -> list:
+    config = project["_config"]
+    subsamples = project.get("_subsample_list")
+
+    def read_chunks():
+        return iter_list_chunks(project["_sample_dict"], chunk_size)
+
+    async def run():
+        profile = await profile_samples(read_chunks, config, subsamples)
+        chunks = iter_processed_samples(read_chunks, config, subsamples, profile)
+        return [sample async for chunk in chunks for sample in chunk]
+
+    return asyncio.run(run())
+
+
+def process_whole(project: dict) -> list:
+    return [s.to_dict() for s in peppy.Project.from_dict(project).samples]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 100])
+@pytest.mark.parametrize("modifiers", [None, MODIFIERS])
+def test_chunks_are_processed_like_whole_project(chunk_size, modifiers):
+    config = {**CONFIG, "sample_modifiers": modifiers} if modifiers else CONFIG
+    project = {"_config": config, "_sample_dict": SAMPLES, "_subsample_list": []}
+
+    assert process_in_chunks(project, chunk_size) == process_whole(project)
+
+
+def test_subsamples_are_merged_like_whole_project():
+    project = {
+        "_config": CONFIG,
+        "_sample_dict": SAMPLES,
+        "_subsample_list": [
+            [
+                {"sample_name": "a", "subsample_name": "1", "lane": 1},
+                {"sample_name": "a", "subsample_name": "2", "lane": 2.0},
+                {"sample_name": "d", "subsample_name": "1"},
+            ]
+        ],
+    }
+
+    assert process_in_chunks(project) == process_whole(project)
+
+
+MIXED_SAMPLES = [
+    {"sample_name": "a", "v": 2.5, "w": 1, "x": True, "y": 1},
+    {"sample_name": "b", "v": 2, "w": 2.0, "x": 1, "y": 2},
+    {"sample_name": "c", "v": "x", "w": None, "x": 2, "y": 3},
+    {"sample_name": "d", "v": 3, "w": 4, "x": 0.5, "y": "4"},
+    {"sample_name": "e", "v": 1.5, "w": 5, "x": 3},
+]
+
+MIXED_SUBSAMPLES = [
+    [
+        {"sample_name": "a", "path": 1.5, "lane": 1},
+        {"sample_name": "a", "path": 2, "lane": "x"},
+        {"sample_name": "b", "path": 3, "lane": 2},
+        {"sample_name": "c", "path": 4, "lane": 2.5},
+        {"sample_name": "c", "path": "f", "lane": 3},
+        {"sample_name": "e", "path": 5.0},
+    ],
+    [
+        {"sample_name": "b", "subsample_name": "s1", "read": 1},
+        {"sample_name": "d", "subsample_name": "s2", "read": 2.5},
+        {"sample_name": "d", "read": 3},
+    ],
+]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3])
+@pytest.mark.parametrize("modifiers", [None, MODIFIERS])
+def test_mixed_columns_are_processed_like_whole_project(chunk_size, modifiers):
+    config = {**CONFIG, "sample_modifiers": modifiers} if modifiers else CONFIG
+    project = {"_config": config, "_sample_dict": MIXED_SAMPLES, "_subsample_list": []}
+
+    # compared as JSON, to compare types (e.g. int vs float)
+    assert json.dumps(process_in_chunks(project, chunk_size)) == json.dumps(
+        process_whole(project)
+    )
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3])
+def test_subsample_tables_are_merged_like_whole_project(chunk_size):
+    project = {
+        "_config": CONFIG,
+        "_sample_dict": MIXED_SAMPLES,
+        "_subsample_list": MIXED_SUBSAMPLES,
+    }
+
+    assert json.dumps(process_in_chunks(project, chunk_size)) == json.dumps(
+        process_whole(project)
+    )
+
+
+def test_pages_are_processed_like_slices_of_whole_project():
+    config = {**CONFIG, "sample_modifiers": MODIFIERS}
+    project = {
+        "_config": config,
+        "_sample_dict": MIXED_SAMPLES,
+        "_subsample_list": MIXED_SUBSAMPLES,
+    }
+    passes = []
+
+    def read_chunks():
+        passes.append(1)
+        return iter_list_chunks(MIXED_SAMPLES, 2)
+
+    async def process_pages():
+        # the context is collected once for all pages
+        context = await sample_table_context(read_chunks, config, MIXED_SUBSAMPLES)
+        return [
+            await process_page(MIXED_SAMPLES[offset : offset + limit], context)
+            for offset, limit in [(0, 2), (1, 2), (2, 3), (4, 1)]
+        ]
+
+    pages = asyncio.run(process_pages())
+
+    whole = process_whole(project)
+    assert [json.dumps(page) for page in pages] == [
+        json.dumps(whole[offset : offset + limit])
+        for offset, limit in [(0, 2), (1, 2), (2, 3), (4, 1)]
+    ]
+    assert len(passes) == 1
+
+
+def test_duplicated_names_are_merged_like_whole_project():
+    samples = SAMPLES + [{"sample_name": "a", "file": "other"}]
+    project = {"_config": CONFIG, "_sample_dict": samples, "_subsample_list": []}
+
+    chunked = process_in_chunks(project)
+
+    # peppy merges duplicates at the end, in no particular order
+    assert chunked[:4] == process_whole(project)[:4]
+    assert chunked[-1]["file"] == ["src", "other"]
+
+
+def test_duplicated_names_and_subsamples_are_rejected():
+    project = {
+        "_config": CONFIG,
+        "_sample_dict": SAMPLES + [{"sample_name": "a"}],
+        "_subsample_list": [[{"sample_name": "a", "subsample_name": "1"}]],
+    }
+
+    with pytest.raises(ValueError):
+        process_in_chunks(project)
+
+
+@pytest.mark.parametrize("n_samples", [3, 20, 21, 50])
+def test_description_matches_basic_filter(n_samples):
+    config = {**CONFIG, "sample_modifiers": {"append": {"genome": "hg38"}}}
+    samples = [{"sample_name": f"s{i}"} for i in range(n_samples)]
+
+    def read_chunks():
+        return iter_list_chunks(samples, 7)
+
+    async def run():
+        profile = await profile_samples(read_chunks, config, [])
+        chunks = iter_processed_samples(read_chunks, config, [], profile)
+        return await describe_samples(chunks, config, profile)
+
+    project = peppy.Project.from_dict(
+        {"_config": config, "_sample_dict": samples, "_subsample_list": []}
+    )
+    assert asyncio.run(run()) == eido.convert_project(project, "basic")
+
+
+@pytest.mark.parametrize("n_samples", [0, 1, 21])
+def test_description_of_config_matches_basic_filter(n_samples):
+    config = {
+        **CONFIG,
+        "description": "ATAC-seq samples",
+        "project_modifiers": {"amend": {"mouse": {"sample_modifiers": {}}}},
+    }
+    names = [f"s{i}" for i in range(n_samples)]
+
+    project = peppy.Project.from_dict(
+        {
+            "_config": config,
+            "_sample_dict": [{"sample_name": name} for name in names],
+            "_subsample_list": [],
+        }
+    )
+    assert workers.describe_project(config, names, n_samples) == (
+        eido.convert_project(project, "basic")
+    )
+
+
+def test_samples_are_streamed_as_json():
+    async def chunks():
+        yield [{"a": 1}, {"a": 2}]
+        yield []
+        yield [{"a": 3}]
+
+    async def collect():
+        return "".join(
+            [part async for part in stream_json_samples(chunks(), '{"samples":[', "]}")]
+        )
+
+    assert asyncio.run(collect()) == '{"samples":[{"a": 1},{"a": 2},{"a": 3}]}'
+
+
+def test_first_chunk_is_processed_before_streaming():
+    processed = []
+
+    async def chunks():
+        for chunk in [[{"a": 1}], [{"a": 2}]]:
+            processed.append(chunk)
+            yield chunk
+
+    async def run():
+        started = await process_first_chunk(chunks())
+        assert processed == [[{"a": 1}]]
+        return [chunk async for chunk in started]
+
+    assert asyncio.run(run()) == [[{"a": 1}], [{"a": 2}]]
+
+
+def test_invalid_config_fails_before_streaming():
+    config = {**CONFIG, "sample_modifiers": {"imply": [{"if": "x"}]}}
+
+    def read_chunks():
+        return iter_list_chunks(SAMPLES, 2)
+
+    async def run():
+        profile = await profile_samples(read_chunks, config, [])
+        await process_first_chunk(
+            iter_processed_samples(read_chunks, config, [], profile)
+        )
+
+    with pytest.raises(peppy.exceptions.InvalidConfigFileException):
+        asyncio.run(run())
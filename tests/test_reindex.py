@@ -0,0 +1,186 @@
+import os
+import sys
+import warnings
+
+import pytest
+from pepdbagent.models import AnnotationList, AnnotationModel
+from qdrant_client import QdrantClient
+
+myPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, myPath + "/../")
+
+from pephub.reindex import (
+    BatchEncoder,
+    build_text,
+    load_checkpoint,
+    point_id,
+    reindex,
+)
+
+COLLECTION = "pephub_test"
+
+
+class FakeAnnotations:
+    """
+    Mimics `agent.annotation.get` paging, ordering and date filtering
+    """
+
+    def __init__(self, annotations):
+        self.annotations = annotations
+        self.calls = []
+
+    def get(self, limit, offset, order_by, order_desc, **date_filter):
+        self.calls.append(date_filter)
+        annotations = sorted(self.annotations, key=lambda a: a.last_update_date)
+        if date_filter:
+            start = date_filter["filter_start_date"].replace("/", "-")
+            annotations = [a for a in annotations if a.last_update_date >= start]
+        return AnnotationList(
+            count=len(annotations),
+            limit=limit,
+            offset=offset,
+            results=annotations[offset : offset + limit],
+        )
+
+
+class FakeAgent:
+    def __init__(self, annotations):
+        self.annotation = FakeAnnotations(annotations)
+
+
+class FakeDenseModel:
+    def __init__(self):
+        self.texts = []
+
+    def embed(self, texts):
+        for text in texts:
+            self.texts.append(text)
+            yield [float(len(text)), 1.0, 0.5]
+
+
+def annotation(name: str, date: str, description: str = "") -> AnnotationModel:
+    return AnnotationModel(
+        namespace="databio",
+        name=name,
+        tag="default",
+        description=description,
+        last_update_date=date,
+    )
+
+
+@pytest.fixture
+def qdrant():
+    warnings.filterwarnings("ignore", message="Local mode")
+    return QdrantClient(":memory:")
+
+
+@pytest.fixture
+def dense_model():
+    return FakeDenseModel()
+
+
+@pytest.fixture
+def encoder(dense_model):
+    return BatchEncoder("dense", None, workers=0, dense_loader=lambda _: dense_model)
+
+
+@pytest.fixture
+def checkpoint(tmp_path):
+    return str(tmp_path / "checkpoint.json")
+
+
+def test_build_text_and_stable_point_id():
+    assert build_text(annotation("atac", "2024-01-01", "ATAC-seq")) == "atac. ATAC-seq"
+    assert point_id("databio/atac:default") == point_id("databio/atac:default")
+
+
+def test_reindex_upserts_all_projects_in_batches(qdrant, encoder, checkpoint):
+    agent = FakeAgent(
+        [annotation(f"p{i}", f"2024-01-0{i + 1} 10:00:00+00:00") for i in range(5)]
+    )
+
+    result = reindex(
+        agent,
+        qdrant,
+        encoder,
+        COLLECTION,
+        checkpoint_path=checkpoint,
+        page_size=2,
+        encode_batch_size=1,
+        upsert_batch_size=2,
+    )
+
+    assert result["indexed"] == 5
+    assert qdrant.count(COLLECTION).count == 5
+    point = qdrant.retrieve(COLLECTION, [point_id("databio/p0:default")])[0]
+    assert point.payload["registry"] == "databio/p0:default"
+    assert load_checkpoint(checkpoint) == (
+        "2024-01-05 10:00:00+00:00",
+        {"databio/p4:default"},
+    )
+
+
+def test_incremental_reindex_only_embeds_updated_projects(
+    qdrant, encoder, dense_model, checkpoint
+):
+    projects = [
+        annotation(f"p{i}", f"2024-01-0{i + 1} 10:00:00+00:00") for i in range(3)
+    ]
+    agent = FakeAgent(projects)
+    reindex(agent, qdrant, encoder, COLLECTION, checkpoint_path=checkpoint)
+    dense_model.texts.clear()
+
+    projects[0].last_update_date = "2024-01-03 12:00:00+00:00"
+    projects[0].description = "updated"
+    result = reindex(agent, qdrant, encoder, COLLECTION, checkpoint_path=checkpoint)
+
+    assert dense_model.texts == ["p0. updated"]
+    assert result["indexed"] == 1
+    assert agent.annotation.calls[-1]["filter_start_date"] == "2024/01/03"
+    assert qdrant.count(COLLECTION).count == 3
+
+
+def test_projects_with_the_checkpoint_date_are_not_skipped(
+    qdrant, encoder, dense_model, checkpoint
+):
+    projects = [annotation("p0", "2024-01-01 10:00:00+00:00")]
+    agent = FakeAgent(projects)
+    reindex(agent, qdrant, encoder, COLLECTION, checkpoint_path=checkpoint)
+    dense_model.texts.clear()
+
+    # saved in the same transaction as p0, but read after the first run
+    projects.append(annotation("p1", "2024-01-01 10:00:00+00:00"))
+    result = reindex(agent, qdrant, encoder, COLLECTION, checkpoint_path=checkpoint)
+
+    assert dense_model.texts == ["p1."]
+    assert result["indexed"] == 1
+    assert qdrant.count(COLLECTION).count == 2
+    assert load_checkpoint(checkpoint)[1] == {
+        "databio/p0:default",
+        "databio/p1:default",
+    }
+
+
+def test_full_reindex_deletes_removed_projects(qdrant, encoder, checkpoint):
+    projects = [
+        annotation(f"p{i}", f"2024-01-0{i + 1} 10:00:00+00:00") for i in range(3)
+    ]
+    reindex(
+        FakeAgent(projects), qdrant, encoder, COLLECTION, checkpoint_path=checkpoint
+    )
+
+    result = reindex(
+        FakeAgent(projects[1:]),
+        qdrant,
+        encoder,
+        COLLECTION,
+        checkpoint_path=checkpoint,
+        full=True,
+    )
+
+    assert result == {
+        "indexed": 2,
+        "deleted": 1,
+        "checkpoint": "2024-01-03 10:00:00+00:00",
+    }
+    assert qdrant.count(COLLECTION).count == 2
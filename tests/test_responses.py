@@ -0,0 +1,53 @@
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+myPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, myPath + "/../")
+
+from pephub.responses import FastJSONResponse, raw_project_content, samples_content
+from pephub.routers.models import (
+    ProjectRawModel,
+    ProjectRawRequest,
+    SamplesResponseModel,
+)
+
+PROJECT = {
+    "_config": {"pep_version": "2.1.0", "name": "example", "description": "ü"},
+    "_sample_dict": [
+        {"sample_name": "a", "file": "a.txt"},
+        {"sample_name": "b", "protocol": "ATAC"},
+    ],
+    "_subsample_list": [[{"sample_name": "a", "subsample_name": "1"}]],
+}
+
+
+def test_raw_project_content_matches_validated_response():
+    validated = ProjectRawRequest.model_validate(
+        ProjectRawModel(**PROJECT).model_dump()
+    ).model_dump()
+
+    assert raw_project_content(PROJECT) == validated
+
+
+def test_samples_content_matches_sample_table_response():
+    df = pd.DataFrame(PROJECT["_sample_dict"])
+    validated = SamplesResponseModel(
+        count=df.shape[0],
+        items=df.replace({np.nan: None}).to_dict(orient="records"),
+    ).model_dump()
+
+    assert samples_content(PROJECT["_sample_dict"]) == validated
+
+
+def test_fast_response_renders_json():
+    response = FastJSONResponse(
+        {"value": np.float32(0.5), "missing": None, 1: "x"}, headers={"ETag": '"a"'}
+    )
+
+    assert json.loads(response.body) == {"value": 0.5, "missing": None, "1": "x"}
+    assert response.headers["ETag"] == '"a"'
+    assert response.media_type == "application/json"
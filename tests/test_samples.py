@@ -0,0 +1,261 @@
+import csv
+import datetime
+import io
+import json
+import os
+import sys
+import uuid
+
+import pytest
+from pepdbagent.db_utils import Base, Projects, Samples
+from pepdbagent.exceptions import ProjectNotFoundError
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+myPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, myPath + "/../")
+
+from pephub.samples import (
+    decode_cursor,
+    encode_cursor,
+    get_sample_guids,
+    get_samples_page,
+    parse_filter,
+    process_samples,
+    select_columns,
+    stream_samples_csv,
+    stream_samples_ndjson,
+)
+
+
+class FakeAgent:
+    """
+    pepdbagent connection backed by in-memory sqlite
+    """
+
+    def __init__(self):
+        # one shared connection, samples are read from database executor threads
+        self.connection = create_engine(
+            "sqlite://",
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool,
+        )
+        Base.metadata.create_all(self.connection)
+
+
+def add_project(agent: FakeAgent, name: str, n_samples: int) -> None:
+    with Session(agent.connection) as session:
+        project = Projects(
+            namespace="databio",
+            name=name,
+            tag="default",
+            digest="0" * 32,
+            config={"pep_version": "2.1.0", "name": name},
+            private=False,
+            number_of_samples=n_samples,
+            submission_date=datetime.datetime.now(),
+        )
+        session.add(project)
+        session.flush()
+        parent = None
+        # insert in reverse order, so that table order differs from project order
+        guids = [str(uuid.uuid4()) for _ in range(n_samples)]
+        for i in reversed(range(n_samples)):
+            session.add(
+                Samples(
+                    sample={
+                        "sample_name": f"s{i}",
+                        "index": i,
+                        "genome": "hg38" if i % 2 else "mm10",
+                    },
+                    project_id=project.id,
+                    sample_name=f"s{i}",
+                    guid=guids[i],
+                    parent_guid=guids[i - 1] if i > 0 else parent,
+                )
+            )
+        session.commit()
+
+
+@pytest.fixture
+def agent():
+    agent = FakeAgent()
+    add_project(agent, "big", 25)
+    add_project(agent, "empty", 0)
+    return agent
+
+
+def test_page_with_limit_and_offset(agent):
+    page = get_samples_page(agent, "databio", "big", limit=10, offset=5)
+
+    assert [s["index"] for s in page.items] == list(range(5, 15))
+    assert page.total == 25
+    assert page.next_guid is not None
+
+
+def test_cursor_walks_through_all_samples(agent):
+    indices, after = [], None
+    while True:
+        page = get_samples_page(agent, "databio", "big", limit=10, after=after)
+        indices.extend(s["index"] for s in page.items)
+        if page.next_guid is None:
+            break
+        after = decode_cursor(encode_cursor(page.next_guid))
+
+    assert indices == list(range(25))
+
+
+def test_empty_project_and_offset_past_the_end(agent):
+    assert get_samples_page(agent, "databio", "empty").items == []
+    page = get_samples_page(agent, "databio", "big", offset=100)
+    assert page.items == [] and page.next_guid is None
+
+
+def test_sample_ids_are_added_on_request(agent):
+    page = get_samples_page(agent, "databio", "big", limit=1, with_id=True)
+    assert page.items[0]["ph_id"] == page.next_guid
+
+
+def test_missing_project_and_invalid_cursor(agent):
+    with pytest.raises(ProjectNotFoundError):
+        get_samples_page(agent, "databio", "missing")
+    with pytest.raises(ValueError):
+        get_samples_page(agent, "databio", "big", after="not-a-sample")
+    with pytest.raises(ValueError):
+        decode_cursor("garbage")
+
+
+def test_process_samples_merges_only_subsamples_of_the_page():
+    config = {"pep_version": "2.1.0", "name": "example"}
+    subsamples = [
+        [
+            {"sample_name": "a", "subsample_name": "1", "file": "a1"},
+            {"sample_name": "a", "subsample_name": "2", "file": "a2"},
+            {"sample_name": "b", "subsample_name": "1", "file": "b1"},
+        ]
+    ]
+
+    samples = process_samples(config, [{"sample_name": "a"}], subsamples)
+
+    assert samples == [
+        {"sample_name": "a", "subsample_name": ["1", "2"], "file": ["a1", "a2"]}
+    ]
+
+
+async def collect(stream) -> str:
+    return "".join([part async for part in stream])
+
+
+def test_sample_guids_are_in_project_order(agent):
+    guids = get_sample_guids(agent, "databio", "big")
+    page = get_samples_page(agent, "databio", "big", limit=3, with_id=True)
+
+    assert len(guids) == 25
+    assert guids[:3] == [sample["ph_id"] for sample in page.items]
+
+
+@pytest.mark.asyncio
+async def test_stream_samples_ndjson(agent):
+    guids = get_sample_guids(agent, "databio", "big")
+
+    lines = (await collect(stream_samples_ndjson(agent, guids, 7))).splitlines()
+
+    assert [json.loads(line)["index"] for line in lines] == list(range(25))
+
+
+@pytest.mark.asyncio
+async def test_stream_samples_csv_has_columns_of_all_samples(agent):
+    with Session(agent.connection) as session:
+        sample = session.query(Samples).filter(Samples.sample_name == "s20").one()
+        sample.sample = {**sample.sample, "extra": [1, 2]}
+        session.commit()
+    guids = get_sample_guids(agent, "databio", "big")
+
+    rows = list(
+        csv.DictReader(io.StringIO(await collect(stream_samples_csv(agent, guids, 7))))
+    )
+
+    assert len(rows) == 25
+    assert rows[0] == {
+        "sample_name": "s0",
+        "index": "0",
+        "genome": "mm10",
+        "extra": "",
+    }
+    assert rows[20]["extra"] == "[1, 2]"
+
+
+@pytest.mark.asyncio
+async def test_stream_samples_of_empty_project(agent):
+    guids = get_sample_guids(agent, "databio", "empty")
+
+    assert await collect(stream_samples_ndjson(agent, guids)) == ""
+
+
+def test_parse_filter():
+    assert parse_filter("genome==hg38") == ("genome", "==", ["hg38"])
+    assert parse_filter("genome=in=hg38,mm10") == ("genome", "=in=", ["hg38", "mm10"])
+    assert parse_filter("sample_name=prefix=s1") == ("sample_name", "=prefix=", ["s1"])
+    # value may contain other operators
+    assert parse_filter("url==http://x?a==b").values == ["http://x?a==b"]
+    with pytest.raises(ValueError):
+        parse_filter("genome")
+    with pytest.raises(ValueError):
+        parse_filter("==hg38")
+
+
+def test_page_is_filtered_by_the_database(agent):
+    page = get_samples_page(
+        agent,
+        "databio",
+        "big",
+        limit=3,
+        offset=1,
+        filters=[parse_filter("genome==hg38")],
+    )
+
+    assert [s["index"] for s in page.items] == [3, 5, 7]
+    assert page.total == 12
+    assert page.next_guid is not None
+
+
+def test_filters_are_combined(agent):
+    filters = [parse_filter("sample_name=prefix=s1"), parse_filter("genome=in=mm10")]
+
+    page = get_samples_page(agent, "databio", "big", limit=None, filters=filters)
+
+    assert [s["sample_name"] for s in page.items] == ["s10", "s12", "s14", "s16", "s18"]
+    assert page.next_guid is None
+
+
+def test_page_with_selected_columns(agent):
+    page = get_samples_page(
+        agent, "databio", "big", limit=2, columns=["sample_name", "missing"]
+    )
+
+    assert page.items == [
+        {"sample_name": "s0", "missing": None},
+        {"sample_name": "s1", "missing": None},
+    ]
+
+
+def test_filter_and_select_columns_of_processed_samples():
+    samples = [{"sample_name": "a", "paired": True}, {"sample_name": "b"}]
+    sample_filter = parse_filter("paired==true")
+
+    assert [s for s in samples if sample_filter.matches(s)] == samples[:1]
+    assert select_columns(samples, ["paired"]) == [{"paired": True}, {"paired": None}]
+
+
+@pytest.mark.asyncio
+async def test_stream_filtered_csv_with_columns(agent):
+    guids = get_sample_guids(
+        agent, "databio", "big", filters=[parse_filter("genome==hg38")]
+    )
+
+    stream = stream_samples_csv(agent, guids, 4, columns=["index", "genome"])
+    rows = list(csv.reader(io.StringIO(await collect(stream))))
+
+    assert rows[0] == ["index", "genome"]
+    assert rows[1:] == [[str(i), "hg38"] for i in range(1, 25, 2)]
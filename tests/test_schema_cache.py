@@ -0,0 +1,123 @@
+import json
+import os
+import sys
+
+import pytest
+
+myPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, myPath + "/../")
+
+from pephub.schema_cache import SchemaCache, fetch_schema, fetch_schema_list
+
+SCHEMA_LIST = {
+    "test/test_schema": {
+        "name": "test schema",
+        "schema": "http://schema.databio.org/test/test_schema.yaml",
+    }
+}
+
+
+@pytest.fixture
+def schema_source(tmp_path, schema_file_path):
+    """
+    Local mirror of the schema server
+    """
+    (tmp_path / "test").mkdir()
+    with open(schema_file_path) as f:
+        (tmp_path / "test" / "test_schema.yaml").write_text(f.read())
+    (tmp_path / "list.json").write_text(json.dumps(SCHEMA_LIST))
+    return str(tmp_path)
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "cache" / "eido_schemas.json")
+
+
+def build_cache(
+    schema_source: str, cache_path: str, ttl: int = 60, retry_interval: int = 300
+) -> SchemaCache:
+    return SchemaCache(
+        cache_path=cache_path,
+        ttl=ttl,
+        retry_interval=retry_interval,
+        list_fetcher=lambda: fetch_schema_list(schema_source),
+        schema_fetcher=lambda namespace, name: fetch_schema(
+            schema_source, namespace, name
+        ),
+    )
+
+
+def test_cache_falls_back_to_bundled_snapshot(schema_source, cache_path):
+    cache = build_cache(schema_source, cache_path)
+
+    assert cache.is_stale
+    assert cache.has_schema("pep", "2.0.0")
+
+
+def test_refresh_fetches_list_and_schemas(schema_source, cache_path):
+    cache = build_cache(schema_source, cache_path)
+    cache.refresh()
+
+    assert not cache.is_stale
+    assert cache.get_schema_list() == SCHEMA_LIST
+    assert "properties" in cache.get_schema("test", "test_schema")
+    assert os.path.exists(cache_path)
+
+
+def test_cache_is_read_from_disk_without_fetching(
+    schema_source, cache_path, requests_get_mock
+):
+    build_cache(schema_source, cache_path).refresh()
+
+    def fail():
+        raise AssertionError("schema server should not be contacted")
+
+    cache = SchemaCache(
+        cache_path=cache_path,
+        ttl=60,
+        list_fetcher=fail,
+        schema_fetcher=lambda namespace, name: fail(),
+    )
+    assert cache.get_schema_list() == SCHEMA_LIST
+    assert cache.get_schema("test", "test_schema") is not None
+    requests_get_mock.assert_not_called()
+
+
+def test_stale_cache_is_refreshed_in_background(schema_source, cache_path):
+    cache = build_cache(schema_source, cache_path, ttl=0)
+
+    # request path returns the bundled snapshot right away...
+    assert cache.get_schema("test", "test_schema") is None
+    cache._refresh_thread.join(5)
+
+    # ...and the background refresh fills the cache
+    assert cache.get_schema("test", "test_schema") is not None
+
+
+def test_failed_refresh_keeps_cached_schemas(schema_source, cache_path):
+    cache = build_cache(schema_source, cache_path)
+    cache.refresh()
+    fetched_at = cache._fetched_at
+
+    os.remove(os.path.join(schema_source, "list.json"))
+    cache._refresh()
+
+    assert cache._fetched_at == fetched_at
+    assert cache.get_schema_list() == SCHEMA_LIST
+
+
+def test_refresh_is_not_retried_right_after_a_failure(tmp_path, cache_path):
+    cache = build_cache(str(tmp_path / "unreachable"), cache_path, ttl=0)
+
+    cache.get_schema_list()
+    failed_refresh = cache._refresh_thread
+    failed_refresh.join(5)
+    assert cache._failed_at
+
+    cache.get_schema_list()
+    assert cache._refresh_thread is failed_refresh
+
+    cache.retry_interval = 0
+    cache.get_schema_list()
+    assert cache._refresh_thread is not failed_refresh
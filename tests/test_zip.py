@@ -0,0 +1,99 @@
+import io
+import os
+import sys
+import zipfile
+
+import pandas as pd
+import pytest
+import yaml
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+myPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, myPath + "/../")
+
+from pephub.helpers import iter_csv, iter_zip, zip_conv_result, zip_pep
+
+
+def make_project(n_samples: int) -> dict:
+    return {
+        "_config": {"pep_version": "2.1.0", "name": "example"},
+        "_sample_dict": [
+            {"sample_name": f"s{i}", "protocol": "ATAC", "read_count": i}
+            for i in range(n_samples)
+        ],
+        "_subsample_list": [
+            [{"sample_name": "s0", "subsample_name": "1"}],
+            [{"sample_name": "s1", "file": "a.txt"}],
+        ],
+    }
+
+
+def download(response_factory) -> zipfile.ZipFile:
+    app = FastAPI()
+    app.get("/zip")(response_factory)
+    response = TestClient(app).get("/zip")
+    assert response.headers["Content-Type"] == "application/x-zip-compressed"
+    return zipfile.ZipFile(io.BytesIO(response.content))
+
+
+def test_zip_pep_contains_tables_and_config():
+    archive = download(lambda: zip_pep(make_project(2500)))
+
+    assert archive.namelist() == [
+        "sample_table.csv",
+        "subsample_table1.csv",
+        "subsample_table2.csv",
+        "example_config.yaml",
+    ]
+    samples = pd.read_csv(archive.open("sample_table.csv"))
+    assert samples.shape == (2500, 3)
+    assert samples["read_count"].tolist() == list(range(2500))
+    config = yaml.safe_load(archive.read("example_config.yaml"))
+    assert config["sample_table"] == "sample_table.csv"
+    assert config["subsample_table"] == ["subsample_table1.csv", "subsample_table2.csv"]
+
+
+def test_zip_conv_result():
+    archive = download(lambda: zip_conv_result({"a.txt": "a", "b.yaml": "b: 1"}))
+
+    assert archive.read("a.txt") == b"a"
+    assert archive.read("b.yaml") == b"b: 1"
+
+
+def test_zip_is_streamed_in_chunks():
+    chunks = list(
+        iter_zip([("big.csv", iter_csv(make_project(20000)["_sample_dict"]))])
+    )
+
+    assert len([c for c in chunks if c]) > 2
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+    assert archive.testzip() is None
+
+
+def test_csv_has_all_columns_and_is_chunked():
+    rows = [{"a": 1, "b": "x,y"}, {"a": 2, "c": None}, {"b": "z"}]
+
+    chunks = list(iter_csv(rows, chunk_size=2))
+
+    assert len(chunks) == 2
+    assert "".join(chunks) == 'a,b,c\n1,"x,y",\n2,,\n,z,\n'
+
+
+def test_zip_pep_with_columnar_tables():
+    pq = pytest.importorskip("pyarrow.parquet")
+    archive = download(lambda: zip_pep(make_project(2500), columnar="parquet"))
+
+    assert archive.namelist() == [
+        "sample_table.csv",
+        "subsample_table1.csv",
+        "subsample_table2.csv",
+        "sample_table.parquet",
+        "subsample_table1.parquet",
+        "subsample_table2.parquet",
+        "example_config.yaml",
+    ]
+    samples = pq.read_table(io.BytesIO(archive.read("sample_table.parquet")))
+    assert samples.column("read_count").to_pylist() == list(range(2500))
+    config = yaml.safe_load(archive.read("example_config.yaml"))
+    assert config["sample_table"] == "sample_table.csv"
@@ -13,6 +13,7 @@ export interface SearchResult {
   limit: number;
   offset: number;
   total: number;
+  partial: boolean;
 }
 
 export const search = (